@@ -0,0 +1,210 @@
+"""
+Local stand-ins for the external services the agents talk to, for offline
+benchmarks. Each fake has a configurable latency (mean plus jitter) and error
+rate, and counts its calls:
+
+    FakePubSubSubscriber  Pub/Sub streaming pull (honours FlowControl.max_messages)
+    FakeGeminiBackend     LLM backend answering classification and reasoning prompts
+    FakeHTTPSession       requests.Session stand-in for OPA and the Slack webhook
+    FakeBigQueryClient    streaming inserts and validation queries
+"""
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.llm import LLMBackend
+
+
+class FakeServiceError(Exception):
+    pass
+
+
+class FakeService:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stats = {"calls": 0, "errors": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _simulate(self, what: str):
+        with self._lock:
+            self.stats["calls"] += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.stats["errors"] += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise FakeServiceError(f"injected {what} failure")
+
+
+class FakeMessage:
+    def __init__(self, data: bytes, on_done: Callable[[bool], None]):
+        self.data = data
+        self.publish_time = time.time()
+        self._on_done = on_done
+        self._done = False
+
+    def ack(self):
+        self._settle(True)
+
+    def nack(self):
+        self._settle(False)
+
+    def _settle(self, acked: bool):
+        if not self._done:
+            self._done = True
+            self._on_done(acked)
+
+
+class FakePubSubSubscriber(FakeService):
+    """
+    Delivers a scheduled stream of (offset_seconds, alert) pairs to the subscribe
+    callback. Like the real client, at most flow_control.max_messages messages are
+    outstanding (delivered but not acked/nacked) at a time.
+    """
+    def __init__(self, schedule: Iterable[Tuple[float, Dict[str, Any]]], callback_threads: int = 8, **kwargs):
+        super().__init__(**kwargs)
+        self.schedule = schedule
+        self.callback_threads = callback_threads
+        self.stats.update({"published": 0, "acked": 0, "nacked": 0})
+        self.publish_times: Dict[str, float] = {}
+
+    def subscribe(self, subscription_path: str, callback: Callable, flow_control=None) -> Future:
+        future = Future()
+        max_outstanding = getattr(flow_control, "max_messages", 1000) or 1000
+        threading.Thread(target=self._stream, args=(callback, max_outstanding, future),
+                         name="fake-pubsub", daemon=True).start()
+        return future
+
+    def _stream(self, callback: Callable, max_outstanding: int, future: Future):
+        outstanding = threading.BoundedSemaphore(max_outstanding)
+        pool = ThreadPoolExecutor(max_workers=self.callback_threads, thread_name_prefix="fake-pubsub-cb")
+
+        def settle(acked: bool):
+            with self._lock:
+                self.stats["acked" if acked else "nacked"] += 1
+            outstanding.release()
+
+        def deliver(message):
+            try:
+                self._simulate("pubsub delivery")
+                callback(message)
+            except Exception:
+                message.nack()
+
+        started = time.monotonic()
+        for offset, alert in self.schedule:
+            wait = started + offset - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            outstanding.acquire()
+            message = FakeMessage(json.dumps(alert).encode(), settle)
+            with self._lock:
+                self.stats["published"] += 1
+                self.publish_times[alert["incident_id"]] = message.publish_time
+            pool.submit(deliver, message)
+        pool.shutdown(wait=True)
+        for _ in range(max_outstanding):
+            outstanding.acquire()  # wait for every message to be settled
+        future.set_result(None)
+
+
+class FakeGeminiBackend(LLMBackend, FakeService):
+    """
+    Answers classification prompts with a class name, batched classification prompts
+    with a per-item JSON array, and reasoning prompts with proposal JSON.
+    """
+    name = "fake-gemini"
+
+    def __init__(self, action: str = "restart", confidence: int = 85, **kwargs):
+        FakeService.__init__(self, **kwargs)
+        self.action = action
+        self.confidence = confidence
+
+    def complete(self, prompt: str, timeout: Optional[float] = None) -> str:
+        self._simulate("gemini")
+        if "Classify this incident" in prompt:
+            return self.action
+        if "Classify each incident" in prompt:
+            ids = re.findall(r'^\{"id": (\d+),', prompt, re.MULTILINE)
+            return json.dumps([{"id": int(i), "class": self.action, "certainty": self.confidence} for i in ids])
+        # Target the alert's resource, so executor idempotency doesn't collapse distinct incidents
+        resource = re.search(r'"resource": "([^"]*)"', prompt)
+        return json.dumps({"action": self.action, "reason": "Matches runbook for this alert",
+                           "confidence": self.confidence,
+                           "params": {"service": resource.group(1) if resource else "unknown"}})
+
+
+class FakeResponse:
+    def __init__(self, status_code: int = 200, payload: Any = None, headers: Optional[Dict[str, str]] = None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = headers or {}
+        self.text = json.dumps(payload) if payload is not None else "ok"
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise FakeServiceError(f"HTTP {self.status_code}")
+
+
+class FakeHTTPSession(FakeService):
+    """requests.Session stand-in; `handler(url, json)` returns the response payload."""
+    def __init__(self, handler: Optional[Callable[[str, Any], Any]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.handler = handler or (lambda url, body: {})
+
+    def post(self, url: str, json: Any = None, **kwargs) -> FakeResponse:
+        self._simulate(f"POST {url}")
+        return FakeResponse(200, self.handler(url, json))
+
+    def mount(self, prefix, adapter):
+        pass
+
+
+def opa_allow_all(url: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    return {"result": {"admit": True, "reason": "allowed by benchmark policy", "confidence": 100}}
+
+
+class _FakeQueryJob:
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+
+    def result(self):
+        return self.rows
+
+
+class FakeBigQueryClient(FakeService):
+    def __init__(self, healthy: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.healthy = healthy
+        self.stats["rows_inserted"] = 0
+
+    def get_table(self, table_id: str):
+        return table_id
+
+    def insert_rows_json(self, table, rows: List[Dict[str, Any]]):
+        self._simulate("bigquery insert")
+        with self._lock:
+            self.stats["rows_inserted"] += len(rows)
+        return []
+
+    def query(self, query: str, job_config=None):
+        self._simulate("bigquery query")
+        return _FakeQueryJob([{"count": 1 if self.healthy else 0}])
+
+
+class NullLogWriter:
+    """Discards shaped log batches, so benchmarks pay the logging cost without the output."""
+    def write(self, batch):
+        pass
@@ -0,0 +1,84 @@
+"""
+Recall@k and query latency of the ANN grounding indexes against exact search.
+
+Uses synthetic clustered vectors so large corpora can be benchmarked without
+embedding real documents:
+
+    python -m benchmarks.grounding_ann --size 200000 --dim 384 --queries 200 --k 5
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.vector_index import VectorIndex, IVFIndex, HNSWIndex, hnswlib
+
+
+def synthetic_corpus(size: int, dim: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((size, dim)).astype(np.float32)
+    return vectors, rng
+
+
+def measure(index: VectorIndex, queries: np.ndarray, k: int):
+    latencies, ids = [], []
+    for q in queries:
+        start = time.perf_counter()
+        hits = index.search_vectors(q[None, :], k)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append({h["id"] for h in hits})
+    return ids, np.percentile(latencies, [50, 99])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--n-lists", type=int, default=0, help="IVF lists (default: sqrt(size))")
+    args = parser.parse_args()
+
+    vectors, rng = synthetic_corpus(args.size, args.dim, args.clusters)
+    metadata = [{"id": i} for i in range(args.size)]
+    queries = vectors[rng.choice(args.size, args.queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact = VectorIndex(dim=args.dim)
+    exact.add_vectors(vectors, metadata)
+    truth, (p50, p99) = measure(exact, queries, args.k)
+    print(f"{'index':<24}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p99 ms':>10}{'build s':>10}")
+    print(f"{'exact':<24}{1.0:>10.3f}{p50:>10.2f}{p99:>10.2f}{0.0:>10.1f}")
+
+    def report(name, index, build_s):
+        found, (p50, p99) = measure(index, queries, args.k)
+        recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+        print(f"{name:<24}{recall:>10.3f}{p50:>10.2f}{p99:>10.2f}{build_s:>10.1f}")
+
+    start = time.perf_counter()
+    ivf = IVFIndex(dim=args.dim, n_lists=args.n_lists or int(np.sqrt(args.size)))
+    ivf.add_vectors(vectors, metadata)
+    ivf.train()
+    build_s = time.perf_counter() - start
+    for nprobe in (1, 4, 8, 16, 32):
+        ivf.nprobe = nprobe
+        report(f"ivf nprobe={nprobe}", ivf, build_s)
+
+    if hnswlib is not None:
+        start = time.perf_counter()
+        hnsw = HNSWIndex(dim=args.dim)
+        hnsw.add_vectors(vectors, metadata)
+        build_s = time.perf_counter() - start
+        for ef in (16, 64, 128):
+            hnsw.ef_search = ef
+            report(f"hnsw ef_search={ef}", hnsw, build_s)
+    else:
+        print("hnswlib not installed; skipping HNSW")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+End-to-end load test of the incident pipeline against local stand-ins.
+
+Drives WatcherAgent -> ClassifierAgent -> GroundingAgent -> PersonalizationAgent
+-> ReasoningAgent -> PolicyAgent -> ExecutorAgent -> ValidatorAgent ->
+NotificationAgent with a synthetic alert stream delivered by a fake Pub/Sub
+subscription. Gemini, OPA, Slack and BigQuery are replaced by the fakes in
+benchmarks/fakes.py, each with configurable latency and error rate, so the run
+is fully offline. Reports throughput, end-to-end and per-stage p50/p95/p99
+latency and peak memory:
+
+    python -m benchmarks.pipeline_e2e --profile steady --rate 50 --duration 20
+    python -m benchmarks.pipeline_e2e --profile storm --batch-size 50 --json out.json
+    python -m benchmarks.pipeline_e2e --baseline out.json --tolerance 0.2   # exit 1 on regression
+
+Profiles: steady (constant rate), bursty (5x bursts for 1s every 5s) and storm
+(a 10x spike mid-run, 90% of it repeats of a few alerts).
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.fakes import (FakeBigQueryClient, FakeGeminiBackend, FakeHTTPSession, FakePubSubSubscriber,
+                              NullLogWriter, opa_allow_all)
+from src.agents.classifier_agent import ClassifierAgent
+from src.agents.executor_agent import ExecutorAgent
+from src.agents.grounding_agent import GroundingAgent
+from src.agents.notification_agent import NotificationAgent
+from src.agents.orchestrator_agent import OrchestratorAgent
+from src.agents.personalization_agent import PersonalizationAgent
+from src.agents.policy_agent import PolicyAgent
+from src.agents.reasoning_agent import ReasoningAgent
+from src.agents.validator_agent import ValidatorAgent
+from src.agents.watcher_agent import WatcherAgent
+from src.llm import LLMPool
+from src.outbox import SlackOutbox
+from src.pipeline import IncidentPipeline
+from src.registry import AgentRegistry
+from src.sinks import BigQueryRowSink
+from src.structured_log import LogPipeline, StructLogger
+
+SERVICES = {
+    # name: (default latency seconds, default error rate)
+    "pubsub": (0.001, 0.0),
+    "gemini": (0.8, 0.0),
+    "opa": (0.005, 0.0),
+    "slack": (0.05, 0.0),
+    "bigquery": (0.05, 0.0),
+    "tools": (0.2, 0.0),
+}
+
+ALERT_KINDS = [
+    ("HighCPU", "CPU usage above 90% on {r}"),
+    ("PodCrashLoop", "Pod {r} is in CrashLoopBackOff"),
+    ("HighLatency", "p99 latency above SLO for {r}"),
+    ("MemoryPressure", "Memory usage above 95% on {r}"),
+]
+
+
+def make_alert(i: int, resource_id: int, rng: random.Random) -> Dict[str, Any]:
+    kind, template = ALERT_KINDS[resource_id % len(ALERT_KINDS)]
+    name = f"checkout-{resource_id}"
+    return {
+        "source": "prometheus",
+        "type": kind,
+        "message": template.format(r=name),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "resource": f"pod/{name}",
+        "labels": {"cluster": f"gke-prod-{resource_id % 3}", "namespace": "payments", "alertname": kind},
+        "incident_id": f"inc-{i}",
+        "severity": rng.choice(["critical", "warning"]),
+        "environment": "prod",
+    }
+
+
+def alert_schedule(profile: str, rate: float, duration: float, seed: int = 0) -> List[Tuple[float, Dict[str, Any]]]:
+    rng = random.Random(seed)
+    schedule, t, i = [], 0.0, 0
+    while t < duration:
+        if profile == "bursty":
+            current = rate * 5 if t % 5 < 1 else rate * 0.5
+        elif profile == "storm":
+            current = rate * 10 if duration * 0.4 <= t < duration * 0.6 else rate
+        else:
+            current = rate
+        in_storm = profile == "storm" and current > rate and rng.random() < 0.9
+        resource_id = rng.randrange(10) if in_storm else 1000 + i
+        schedule.append((t, make_alert(i, resource_id, rng)))
+        t += 1.0 / current
+        i += 1
+    return schedule
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50": round(pick(0.50), 2), "p95": round(pick(0.95), 2), "p99": round(pick(0.99), 2)}
+
+
+class Harness:
+    def __init__(self, args):
+        self.args = args
+        fake = lambda name, cls, **kw: cls(latency=getattr(args, f"{name}_latency"),
+                                           jitter=getattr(args, f"{name}_latency") * 0.2,
+                                           error_rate=getattr(args, f"{name}_error_rate"), seed=args.seed, **kw)
+        self.gemini = fake("gemini", FakeGeminiBackend)
+        self.opa = fake("opa", FakeHTTPSession, handler=opa_allow_all)
+        self.slack = fake("slack", FakeHTTPSession)
+        self.bigquery = fake("bigquery", FakeBigQueryClient)
+        self.pubsub = fake("pubsub", FakePubSubSubscriber,
+                           schedule=alert_schedule(args.profile, args.rate, args.duration, args.seed),
+                           callback_threads=args.callback_threads)
+        tools = fake("tools", FakeHTTPSession)
+        self.tmp = tempfile.TemporaryDirectory(prefix="pipeline-bench-")
+        self.log_pipeline = LogPipeline(NullLogWriter())
+        log = lambda name: StructLogger(name, self.log_pipeline)
+
+        pool = LLMPool(self.gemini, max_concurrency=args.llm_concurrency, timeout=60.0)
+        self.orchestrator = OrchestratorAgent(logger=log("orchestrator-agent"), bq_client=self.bigquery,
+                                              sink=BigQueryRowSink(self.bigquery, "sre_agent.mcp_envelopes",
+                                                                   spool_dir=self.tmp.name),
+                                              timings_sink=BigQueryRowSink(self.bigquery,
+                                                                           "sre_agent.mcp_envelope_timings",
+                                                                           spool_dir=self.tmp.name))
+        policy = PolicyAgent(opa_url="http://opa.local/v1/data/sre/policy", logger=log("policy-agent"))
+        policy.session = self.opa
+        outbox = SlackOutbox("https://hooks.slack.local/bench", journal_path=f"{self.tmp.name}/outbox.jsonl",
+                             rate_per_second=50, burst=50)
+        outbox.session = self.slack
+        self.outbox = outbox
+        tool = lambda params: tools.post("tool", params).json()
+        self.pipeline = IncidentPipeline(
+            ClassifierAgent(logger=log("classifier-agent"), llm_pool=pool),
+            GroundingAgent(logger=log("grounding-agent")),
+            PersonalizationAgent(logger=log("personalization-agent")),
+            self.orchestrator,
+            ReasoningAgent(logger=log("reasoning-agent"), llm_pool=pool),
+            policy,
+            ExecutorAgent(logger=log("executor-agent"), max_concurrency=args.callback_threads,
+                          toolset={kind: tool for kind in ("restart", "scale", "investigate", "other")}),
+            ValidatorAgent(logger=log("validator-agent"), bq_client=self.bigquery),
+            NotificationAgent("https://hooks.slack.local/bench", logger=log("notification-agent"), outbox=outbox),
+            registry=AgentRegistry(),
+        )
+        self.watcher = WatcherAgent(
+            "bench", "local", downstream_callback=self.handle_one, logger=log("watcher-agent"),
+            batch_size=args.batch_size, batch_window_seconds=args.batch_window,
+            downstream_batch_callback=self.handle_batch if args.batch_size > 1 else None,
+            max_outstanding_messages=args.max_outstanding, subscriber=self.pubsub, dedup_enabled=True,
+        )
+        self.results: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="stage"))
+        threading.Thread(target=self.loop.run_forever, name="pipeline-loop", daemon=True).start()
+
+    async def _run(self, signal, context):
+        result = await self.pipeline.run(signal, context, deadline_seconds=self.args.deadline)
+        done = time.time()
+        published = self.pubsub.publish_times.get(context.incident_id, done)
+        with self._lock:
+            self.results.append({"e2e_ms": (done - published) * 1000, "done": done,
+                                 "success": result["success"], "timings": result["timings"]})
+
+    def handle_one(self, signal, context):
+        asyncio.run_coroutine_threadsafe(self._run(signal, context), self.loop).result()
+
+    def handle_batch(self, alerts):
+        async def run_all():
+            await asyncio.gather(*(self._run(signal, context) for signal, context in alerts))
+        asyncio.run_coroutine_threadsafe(run_all(), self.loop).result()
+
+    def run(self) -> Dict[str, Any]:
+        if self.args.tracemalloc:
+            tracemalloc.start()
+        rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.time()
+        self.watcher.listen()  # returns when the fake subscription has delivered and settled every message
+        wall = time.time() - started
+        heap_peak = tracemalloc.get_traced_memory()[1] if self.args.tracemalloc else None
+        if self.args.tracemalloc:
+            tracemalloc.stop()
+        self.orchestrator.shutdown()
+        self.outbox.close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        return self.report(wall, rss_start, heap_peak)
+
+    def report(self, wall: float, rss_start: int, heap_peak) -> Dict[str, Any]:
+        stages: Dict[str, List[float]] = {}
+        statuses: Dict[str, int] = {}
+        for r in self.results:
+            for name, timing in r["timings"].items():
+                if timing["status"] == "ok":
+                    stages.setdefault(name, []).append(timing["duration_ms"])
+                elif timing["status"] != "skipped":
+                    statuses[f"{name}:{timing['status']}"] = statuses.get(f"{name}:{timing['status']}", 0) + 1
+        completed = len(self.results)
+        rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {
+            "profile": self.args.profile,
+            "published": self.pubsub.stats["published"],
+            "collapsed": self.pubsub.stats["published"] - completed,
+            "completed": completed,
+            "succeeded": sum(1 for r in self.results if r["success"]),
+            "wall_s": round(wall, 2),
+            "throughput_per_s": round(completed / wall, 2) if wall else 0.0,
+            "e2e_ms": percentiles([r["e2e_ms"] for r in self.results]),
+            "stages_ms": {name: percentiles(values) for name, values in stages.items()},
+            "failures": statuses,
+            "memory": {
+                "rss_peak_mb": round(rss_peak / 1024, 1),
+                "rss_growth_mb": round((rss_peak - rss_start) / 1024, 1),
+                "heap_peak_mb": round(heap_peak / 2 ** 20, 1) if heap_peak is not None else None,
+            },
+            "fakes": {name: svc.stats for name, svc in (("gemini", self.gemini), ("opa", self.opa),
+                                                         ("slack", self.slack), ("bigquery", self.bigquery))},
+            "logging": dict(self.log_pipeline.stats),
+        }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"profile={report['profile']} published={report['published']} collapsed={report['collapsed']} "
+          f"completed={report['completed']} succeeded={report['succeeded']} wall={report['wall_s']}s "
+          f"throughput={report['throughput_per_s']}/s")
+    print(f"{'stage':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, p in [("end-to-end", report["e2e_ms"])] + list(report["stages_ms"].items()):
+        print(f"{name:<14}{p['p50']:>10.1f}{p['p95']:>10.1f}{p['p99']:>10.1f}")
+    memory = report["memory"]
+    print(f"memory: rss peak {memory['rss_peak_mb']} MB (+{memory['rss_growth_mb']} MB)"
+          + (f", python heap peak {memory['heap_peak_mb']} MB" if memory["heap_peak_mb"] is not None else ""))
+    if report["failures"]:
+        print(f"failures: {report['failures']}")
+
+
+def regressions(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    found = []
+    if report["throughput_per_s"] < baseline["throughput_per_s"] * (1 - tolerance):
+        found.append(f"throughput {report['throughput_per_s']}/s < baseline {baseline['throughput_per_s']}/s")
+    for name, current in [("end-to-end", report["e2e_ms"])] + list(report["stages_ms"].items()):
+        base = baseline["e2e_ms"] if name == "end-to-end" else baseline["stages_ms"].get(name)
+        if base and current["p95"] > base["p95"] * (1 + tolerance) + 1.0:
+            found.append(f"{name} p95 {current['p95']}ms > baseline {base['p95']}ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profile", choices=["steady", "bursty", "storm"], default="steady")
+    parser.add_argument("--rate", type=float, default=20.0, help="base alerts per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of alerts to publish")
+    parser.add_argument("--batch-size", type=int, default=1, help="WatcherAgent micro-batch size")
+    parser.add_argument("--batch-window", type=float, default=0.2)
+    parser.add_argument("--max-outstanding", type=int, default=1000, help="Pub/Sub flow control")
+    parser.add_argument("--callback-threads", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=64, help="threads for blocking agent calls")
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--deadline", type=float, default=30.0, help="per-incident pipeline deadline")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tracemalloc", action="store_true", help="also track the Python heap peak (slower)")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="compare against a previous --json report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression vs baseline")
+    for name, (latency, error_rate) in SERVICES.items():
+        parser.add_argument(f"--{name}-latency", type=float, default=latency, help=f"{name} latency in seconds")
+        parser.add_argument(f"--{name}-error-rate", type=float, default=error_rate)
+    args = parser.parse_args()
+
+    report = Harness(args).run()
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for message in found:
+            print(f"REGRESSION: {message}")
+        sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Per-alert cost of the hot-path schema layer versus plain Pydantic models.
+
+Compares construction (validated, and trusted for envelopes with large
+payloads), repeated dict conversion (as done for logging at every hop) vs the
+cached wire form, json vs the fast codec, and the memory held by many in-flight
+signals with and without label interning:
+
+    python -m benchmarks.schemas_hotpath --alerts 20000 --dumps 4
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+from src.schemas import Signal, Context, MCPEnvelope, as_model, dumps, orjson
+
+
+class PlainSignal(BaseModel):
+    source: str
+    type: str
+    message: str
+    timestamp: str
+    resource: Optional[str] = None
+    labels: Optional[Dict[str, Any]] = None
+
+
+class PlainEnvelope(BaseModel):
+    envelope_id: str
+    created_at: str
+    agent: str
+    payload: Dict[str, Any]
+    signature: Optional[str] = None
+
+
+class PlainContext(BaseModel):
+    incident_id: str
+    severity: str
+    environment: str
+    detected_at: str
+    additional_info: Optional[Dict[str, Any]] = None
+
+
+def synthetic_alerts(n: int):
+    # Labels are decoded per message, so equal strings are distinct objects as they would be off the wire.
+    for i in range(n):
+        raw = json.dumps({
+            "source": "prometheus",
+            "type": "HighCPU",
+            "message": f"CPU above 90% on pod checkout-{i % 500}",
+            "timestamp": "2024-01-01T00:00:00Z",
+            "resource": f"pod/checkout-{i % 500}",
+            "labels": {"cluster": f"gke-prod-{i % 4}", "namespace": "payments", "team": "sre",
+                       "alertname": "HighCPU", "pod": f"checkout-{i % 500}"},
+        })
+        context = {"incident_id": f"inc-{i}", "severity": "critical", "environment": "prod",
+                   "detected_at": "2024-01-01T00:00:00Z"}
+        yield json.loads(raw), json.loads(json.dumps(context))
+
+
+def timed(fn, repeat: int = 5) -> float:
+    """Best of `repeat` runs, in ms, with the GC paused so collections don't land on one side."""
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best * 1000
+
+
+def held_kib(build) -> float:
+    tracemalloc.start()
+    kept = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=20000)
+    parser.add_argument("--dumps", type=int, default=4, help="dict conversions per alert (one per logging hop)")
+    args = parser.parse_args()
+
+    alerts = list(synthetic_alerts(args.alerts))
+    plain = [(PlainSignal(**s), PlainContext(**c)) for s, c in alerts]
+    hot = [(Signal(**s), Context(**c)) for s, c in alerts]
+
+    def dump_plain():
+        for s, c in plain:
+            for _ in range(args.dumps):
+                s.model_dump(), c.model_dump()
+
+    def dump_hot():
+        for s, c in hot:
+            for _ in range(args.dumps):
+                s.wire(), c.wire()
+
+    payloads = [{"signal": s, "context": c, "query_class": "scale",
+                 "grounding": [{"doc_id": f"runbook-{j}", "snippet": "x" * 200, "score": 0.9} for j in range(20)]}
+                for s, c in alerts]
+
+    rows = [
+        ("construct (+interning)", timed(lambda: [(PlainSignal(**s), PlainContext(**c)) for s, c in alerts]),
+         timed(lambda: [(as_model(Signal, s), as_model(Context, c)) for s, c in alerts])),
+        ("envelope (trusted)",
+         timed(lambda: [PlainEnvelope(envelope_id="e", created_at="t", agent="a", payload=p) for p in payloads]),
+         timed(lambda: [MCPEnvelope.trusted(envelope_id="e", created_at="t", agent="a", payload=p)
+                        for p in payloads])),
+        (f"to dict x{args.dumps}", timed(dump_plain), timed(dump_hot)),
+        ("to JSON", timed(lambda: [json.dumps(s.model_dump()) for s, _ in plain]),
+         timed(lambda: [dumps(s.wire()) for s, _ in hot])),
+    ]
+    print(f"{args.alerts} alerts; fast codec: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'operation':<24}{'plain ms':>12}{'hot ms':>12}{'speedup':>10}")
+    for name, baseline, optimized in rows:
+        print(f"{name:<24}{baseline:>12.1f}{optimized:>12.1f}{baseline / max(optimized, 1e-9):>9.1f}x")
+
+    plain_kib = held_kib(lambda: [PlainSignal(**s) for s, _ in synthetic_alerts(args.alerts)])
+    hot_kib = held_kib(lambda: [Signal(**s) for s, _ in synthetic_alerts(args.alerts)])
+    print(f"{'in-flight signals KiB':<24}{plain_kib:>12.0f}{hot_kib:>12.0f}{plain_kib / max(hot_kib, 1e-9):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,118 @@
-from a2a_sdk import Agent, expose
-import logging
-from typing import Dict, Any
+from a2a_sdk import Agent
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Optional
+from src.cache import TTLCache, fingerprint
+from src.structured_log import get_logger
+from src.metrics import observed, watch_cache
+from src.runtime import expose, serve
 # Import Google Cloud SDKs and Kafka clients as needed
 # from google.cloud import container_v1, run_v2, spanner_v1
 # from kafka import KafkaAdminClient
 import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import json
+
+class _PlanTask:
+    """
+    Run state of one execute_plan action. It moves from pending to running when
+    its handler starts, or to cancelled if it times out first, so a cancelled
+    action never runs.
+    """
+    def __init__(self, action_id: str, action: dict, timeout: float):
+        self.action_id = action_id
+        self.action = action
+        self.timeout = timeout
+        self.wait_deadline = time.monotonic() + timeout
+        self.started_at: Optional[float] = None
+        self.state = "pending"
+        self._lock = threading.Lock()
+
+    @property
+    def deadline(self) -> float:
+        started_at = self.started_at
+        return self.wait_deadline if started_at is None else started_at + self.timeout
+
+    def start(self) -> bool:
+        with self._lock:
+            if self.state != "pending":
+                return False
+            self.state, self.started_at = "running", time.monotonic()
+            return True
+
+    def cancel(self) -> bool:
+        with self._lock:
+            if self.state != "pending":
+                return False
+            self.state = "cancelled"
+            return True
+
 
 class ExecutorAgent(Agent):
     """
     A2A-enabled ExecutorAgent for production SRE workflows.
     Exposes execute as a JSON-RPC method for agentic interoperability.
     Securely invokes GKE, Cloud Run, Spanner, Kafka tools, logs all actions, and handles errors.
+    execute_plan runs a batch of dependent actions concurrently, never running two
+    actions against the same resource at once.
+    Actions are idempotent by default: identical concurrent requests share one in-flight
+    execution, and successful results are replayed for `result_ttl_seconds`.
     """
-    def __init__(self, logger=None, toolset=None):
+    # Param keys naming the target an action touches, coarsest first. Plan actions lock the
+    # first one present, so one target described in more or less detail (a node pool of a
+    # cluster, with or without its project) always takes the same lock; same-named targets
+    # in different projects are merely serialized.
+    RESOURCE_KEYS = ("cluster", "instance", "service", "topic", "database", "project", "region", "location")
+
+    def __init__(self, logger=None, toolset=None, max_concurrency: int = 8, default_action_timeout: float = 300.0,
+                 result_ttl_seconds: float = 300.0):
         super().__init__()
-        self.logger = logger or logging.getLogger("executor-agent")
+        self.logger = logger or get_logger("executor-agent")
         self.toolset = toolset or {}
         # toolset: dict mapping action types to handler functions
+        self.max_concurrency = max_concurrency
+        self.default_action_timeout = default_action_timeout
+        self._resource_locks: Dict[str, threading.Lock] = {}
+        self._resource_locks_guard = threading.Lock()
+        self.result_store = TTLCache(ttl_seconds=result_ttl_seconds)
+        watch_cache("executor_results", self.result_store)
+        self._in_flight: Dict[str, Future] = {}
+        self._in_flight_lock = threading.Lock()
 
     @expose
+    @observed()
     def execute(self, action: dict) -> Dict[str, Any]:
+        """
+        Run an action at most once per idempotency key: an explicit action["idempotency_key"],
+        or the action type plus canonical params. Set action["idempotent"] = False to force a re-run.
+        """
+        if action.get("idempotent") is False:
+            return self._execute_action(action)
+        key = action.get("idempotency_key") or fingerprint(action.get("type"), action.get("params", {}))
+        stored = self.result_store.get(key)
+        if stored is not None:
+            self._log_idempotent_replay(action, key, "result_store")
+            return dict(stored, idempotency_key=key, replayed=True)
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            self._log_idempotent_replay(action, key, "in_flight")
+            return dict(future.result(), idempotency_key=key, replayed=True)
+        try:
+            result = self._execute_action(action)
+            if result["success"]:
+                self.result_store.set(key, result)
+            future.set_result(result)
+        except BaseException as e:
+            future.set_result({"success": False, "action_type": action.get("type"), "details": str(e)})
+            raise
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.pop(key, None)
+        return dict(result, idempotency_key=key, replayed=False)
+
+    def _execute_action(self, action: dict) -> Dict[str, Any]:
         action_type = action.get("type")
         handler = self.toolset.get(action_type)
         result = {"success": False, "action_type": action_type, "details": None}
@@ -42,6 +133,141 @@ class ExecutorAgent(Agent):
             result["details"] = str(e)
         return result
 
+    @expose
+    @observed()
+    def execute_plan(self, plan: dict) -> Dict[str, Any]:
+        """
+        Execute a batch of actions: {"actions": [{"id", "type", "params", "depends_on", "timeout"}],
+        "max_concurrency": n}. Actions start once their dependencies succeed; dependents of
+        failed or timed-out actions are skipped. Returns per-action status and results.
+        An action's timeout bounds its run from when its handler starts; waiting for a worker
+        or for its resource is bounded separately by the same amount, and an action that
+        times out while waiting is cancelled and never runs ("started": False in its report).
+        A handler that overruns cannot be interrupted and may still complete.
+        """
+        actions = {a.get("id") or f"action-{i}": a for i, a in enumerate(plan.get("actions", []))}
+        report = {action_id: {"status": "pending"} for action_id in actions}
+        unknown = {d for a in actions.values() for d in a.get("depends_on", []) if d not in actions}
+        if unknown:
+            return {"success": False, "error": f"Unknown dependencies: {sorted(unknown)}", "results": report}
+        started = time.monotonic()
+        running = {}  # future -> _PlanTask
+        pool = ThreadPoolExecutor(max_workers=plan.get("max_concurrency", self.max_concurrency),
+                                  thread_name_prefix="executor-plan")
+        try:
+            while True:
+                for action_id, action in actions.items():
+                    if report[action_id]["status"] != "pending":
+                        continue
+                    dep_statuses = [report[d]["status"] for d in action.get("depends_on", [])]
+                    if any(status in ("failed", "timeout", "skipped") for status in dep_statuses):
+                        report[action_id] = {"status": "skipped", "reason": "dependency did not succeed"}
+                    elif all(status == "succeeded" for status in dep_statuses):
+                        task = _PlanTask(action_id, action, action.get("timeout", self.default_action_timeout))
+                        report[action_id] = {"status": "running"}
+                        running[pool.submit(self._run_task, task)] = task
+                if not running:
+                    break
+                next_deadline = min(task.deadline for task in running.values())
+                done, _ = wait(running, timeout=max(next_deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+                now = time.monotonic()
+                for future in list(running):
+                    task = running[future]
+                    action_id = task.action_id
+                    if future in done:
+                        result = future.result()
+                        if result is None:
+                            report[action_id] = {"status": "timeout", "started": False,
+                                                 "reason": "action did not start within its timeout"}
+                        else:
+                            report[action_id] = {"status": "succeeded" if result["success"] else "failed",
+                                                 "result": result}
+                    elif now >= task.deadline:
+                        if task.cancel():
+                            future.cancel()
+                            report[action_id] = {"status": "timeout", "started": False,
+                                                 "reason": "action did not start within its timeout"}
+                        elif task.started_at is not None:
+                            # The handler thread cannot be interrupted; stop waiting and fail its dependents.
+                            report[action_id] = {"status": "timeout", "started": True,
+                                                 "reason": "action exceeded its timeout and may still complete"}
+                        else:
+                            continue  # cancelled by its worker; reported once the future completes
+                    else:
+                        continue
+                    del running[future]
+        finally:
+            pool.shutdown(wait=False)
+        for action_id, r in report.items():
+            if r["status"] == "pending":
+                report[action_id] = {"status": "skipped", "reason": "dependency cycle"}
+        failed = [a for a, r in report.items() if r["status"] in ("failed", "timeout")]
+        skipped = [a for a, r in report.items() if r["status"] == "skipped"]
+        summary = {
+            "success": not failed and not skipped,
+            "results": report,
+            "failed": failed,
+            "skipped": skipped,
+            "duration_ms": round((time.monotonic() - started) * 1000, 2),
+        }
+        self._log_plan(summary)
+        return summary
+
+    def _resource_key(self, action: dict) -> Optional[str]:
+        if action.get("resource"):
+            return str(action["resource"])
+        params = action.get("params", {}) or {}
+        if params.get("resource"):
+            return str(params["resource"])
+        for key in self.RESOURCE_KEYS:
+            if params.get(key):
+                return f"{key}={params[key]}"
+        return None
+
+    def _run_task(self, task: "_PlanTask") -> Optional[Dict[str, Any]]:
+        """Execute a plan action under its resource lock; None when it was cancelled before starting."""
+        key = self._resource_key(task.action)
+        lock = None
+        if key is not None:
+            with self._resource_locks_guard:
+                lock = self._resource_locks.setdefault(key, threading.Lock())
+            if not lock.acquire(timeout=max(task.wait_deadline - time.monotonic(), 0)):
+                task.cancel()
+                return None
+        try:
+            if not task.start():
+                return None
+            return self.execute(task.action)
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def _log_plan(self, summary):
+        log_entry = {
+            "event": "plan_executed",
+            "success": summary["success"],
+            "num_actions": len(summary["results"]),
+            "failed": summary["failed"],
+            "skipped": summary["skipped"],
+            "duration_ms": summary["duration_ms"],
+        }
+        if hasattr(self.logger, "log_struct"):
+            self.logger.log_struct(log_entry, severity="INFO" if summary["success"] else "ERROR")
+        else:
+            self.logger.info(log_entry) if summary["success"] else self.logger.error(log_entry)
+
+    def _log_idempotent_replay(self, action, key, source):
+        log_entry = {
+            "event": "action_deduplicated",
+            "action_type": action.get("type"),
+            "idempotency_key": key,
+            "source": source,
+        }
+        if hasattr(self.logger, "log_struct"):
+            self.logger.log_struct(log_entry, severity="INFO")
+        else:
+            self.logger.info(log_entry)
+
     def _log_execution(self, action, success, details):
         log_entry = {
             "event": "action_executed",
@@ -95,25 +321,6 @@ def kafka_tool(params):
 #     "kafka_action": kafka_tool,
 # }
 
-class AgentCardHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/agent_card":
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            # Dynamically get the agent card from the running agent instance
-            card = self.server.agent.get_agent_card()
-            self.wfile.write(json.dumps(card).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
-
-def serve_agent_card(agent, port=9007):
-    server = HTTPServer(("0.0.0.0", port), AgentCardHandler)
-    server.agent = agent
-    threading.Thread(target=server.serve_forever, daemon=True).start()
-    print(f"Agent Card HTTP endpoint running at http://0.0.0.0:{port}/agent_card")
-
 if __name__ == "__main__":
     toolset = {
         "gke_scale": gke_scale_tool,
@@ -122,5 +329,4 @@ if __name__ == "__main__":
         "kafka_action": kafka_tool,
     }
     agent = ExecutorAgent(toolset=toolset)
-    serve_agent_card(agent, port=9007)  # Agent Card HTTP endpoint
-    agent.run(host="0.0.0.0", port=8007)  # A2A JSON-RPC server
+    serve({agent.get_agent_card()["id"]: agent}, port=8007)  # A2A JSON-RPC + Agent Card on one listener
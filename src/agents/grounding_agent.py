@@ -1,27 +1,38 @@
-from a2a_sdk import Agent, expose
-import logging
+from a2a_sdk import Agent
+import os
 from typing import List, Dict, Any
 # from google.cloud import discoveryengine_v1beta as cloud_search  # For Google Cloud Search (if used)
 # import faiss  # For FAISS vector search (if used)
-import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import json
+from src.vector_index import VectorIndex, load_index
+from src.structured_log import get_logger
+from src.metrics import observed
+from src.runtime import expose, serve
 
 class GroundingAgent(Agent):
     """
     A2A-enabled GroundingAgent for production SRE workflows.
     Exposes ground as a JSON-RPC method for agentic interoperability.
+    Retrieves from an injected vector_search_fn, or the built-in VectorIndex
+    (exact, IVF or HNSW, loaded memory-mapped from GROUNDING_INDEX_PATH when set).
     """
-    def __init__(self, logger=None, vector_search_fn=None):
+    def __init__(self, logger=None, vector_search_fn=None, index: VectorIndex = None, top_k: int = 3):
         super().__init__()
-        self.logger = logger or logging.getLogger("grounding-agent")
+        self.logger = logger or get_logger("grounding-agent")
         self.vector_search_fn = vector_search_fn
+        self.top_k = top_k
+        index_path = os.getenv("GROUNDING_INDEX_PATH")
+        if index is None and index_path:
+            index = load_index(index_path)
+        self.index = index
 
     @expose
+    @observed()
     def ground(self, signal: dict, query_class: str) -> List[Dict[str, Any]]:
         try:
             if self.vector_search_fn:
                 results = self.vector_search_fn(signal, query_class)
+            elif self.index is not None and len(self.index):
+                results = self.index.search(self._build_query(signal, query_class), self.top_k)
             else:
                 results = [
                     {"doc_id": "runbook-123", "snippet": "Restart the affected pod...", "score": 0.95},
@@ -33,6 +44,29 @@ class GroundingAgent(Agent):
             self.logger.error(f"Grounding failed: {e}")
             return []
 
+    @expose
+    @observed()
+    def ground_batch(self, requests: list) -> List[List[Dict[str, Any]]]:
+        """
+        Ground many {signal, query_class} requests at once; with the built-in index
+        all queries are scored in a single matrix multiply.
+        """
+        if self.vector_search_fn or self.index is None or not len(self.index):
+            return [self.ground(r["signal"], r["query_class"]) for r in requests]
+        try:
+            queries = [self._build_query(r["signal"], r["query_class"]) for r in requests]
+            batch_results = self.index.search_batch(queries, self.top_k)
+            for r, results in zip(requests, batch_results):
+                self._log_grounding(r["signal"], r["query_class"], results)
+            return batch_results
+        except Exception as e:
+            self.logger.error(f"Batch grounding failed: {e}")
+            return [[] for _ in requests]
+
+    @staticmethod
+    def _build_query(signal: dict, query_class: str) -> str:
+        return f"{query_class} {signal.get('type') or ''} {signal.get('resource') or ''} {signal.get('message') or ''}"
+
     def _log_grounding(self, signal, query_class, results):
         log_entry = {
             "event": "grounding_retrieved",
@@ -61,26 +95,6 @@ class GroundingAgent(Agent):
     def get_agent_card_rpc(self, params=None):
         return self.get_agent_card()
 
-class AgentCardHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/agent_card":
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            # Dynamically get the agent card from the running agent instance
-            card = self.server.agent.get_agent_card()
-            self.wfile.write(json.dumps(card).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
-
-def serve_agent_card(agent, port=9002):
-    server = HTTPServer(("0.0.0.0", port), AgentCardHandler)
-    server.agent = agent
-    threading.Thread(target=server.serve_forever, daemon=True).start()
-    print(f"Agent Card HTTP endpoint running at http://0.0.0.0:{port}/agent_card")
-
 if __name__ == "__main__":
     agent = GroundingAgent()
-    serve_agent_card(agent, port=9002)  # Agent Card HTTP endpoint
-    agent.run(host="0.0.0.0", port=8002)  # A2A JSON-RPC server
+    serve({agent.get_agent_card()["id"]: agent}, port=8002)  # A2A JSON-RPC + Agent Card on one listener
@@ -1,9 +1,8 @@
-from a2a_sdk import Agent, expose
-import logging
+from a2a_sdk import Agent
+from src.structured_log import get_logger
+from src.metrics import observed
+from src.runtime import expose, serve
 from typing import Dict, Any
-import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import json
 
 class LLMJudgeAgent(Agent):
     """
@@ -13,9 +12,10 @@ class LLMJudgeAgent(Agent):
     """
     def __init__(self, logger=None):
         super().__init__()
-        self.logger = logger or logging.getLogger("llmjudge-agent")
+        self.logger = logger or get_logger("llmjudge-agent")
 
     @expose
+    @observed()
     def judge(self, flow: dict) -> Dict[str, Any]:
         # TODO: Implement LLM-based evaluation logic
         # For now, return a mock result
@@ -37,26 +37,6 @@ class LLMJudgeAgent(Agent):
     def get_agent_card_rpc(self, params=None):
         return self.get_agent_card()
 
-class AgentCardHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/agent_card":
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            # Dynamically get the agent card from the running agent instance
-            card = self.server.agent.get_agent_card()
-            self.wfile.write(json.dumps(card).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
-
-def serve_agent_card(agent, port=9011):
-    server = HTTPServer(("0.0.0.0", port), AgentCardHandler)
-    server.agent = agent
-    threading.Thread(target=server.serve_forever, daemon=True).start()
-    print(f"Agent Card HTTP endpoint running at http://0.0.0.0:{port}/agent_card")
-
 if __name__ == "__main__":
     agent = LLMJudgeAgent()
-    serve_agent_card(agent, port=9011)  # Agent Card HTTP endpoint
-    agent.run(host="0.0.0.0", port=8011)  # A2A JSON-RPC server 
\ No newline at end of file
+    serve({agent.get_agent_card()["id"]: agent}, port=8011)  # A2A JSON-RPC + Agent Card on one listener 
\ No newline at end of file
@@ -1,40 +1,35 @@
-from a2a_sdk import Agent, expose
-import logging
+from a2a_sdk import Agent
 import requests
 from typing import Any
-import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import json
+from src.outbox import SlackOutbox
+from src.structured_log import get_logger
+from src.metrics import observed
+from src.runtime import expose, serve
 
 class NotificationAgent(Agent):
     """
     A2A-enabled NotificationAgent for production SRE workflows.
     Exposes notify as a JSON-RPC method for agentic interoperability.
     Sends escalations to Slack using the Slack API, with structured logging and error handling.
+    By default messages go through a durable SlackOutbox (coalesced per incident, rate
+    limited, retried with backoff and dead-lettered after repeated failures) and callers
+    get an immediate enqueue acknowledgement.
     """
-    def __init__(self, slack_webhook_url: str, logger=None):
+    def __init__(self, slack_webhook_url: str, logger=None, outbox: SlackOutbox = None, async_delivery: bool = True):
         super().__init__()
         self.slack_webhook_url = slack_webhook_url
-        self.logger = logger or logging.getLogger("notification-agent")
+        self.logger = logger or get_logger("notification-agent")
+        self.session = requests.Session()
+        self.outbox = outbox or (SlackOutbox(slack_webhook_url, logger=self.logger) if async_delivery else None)
 
     @expose
+    @observed()
     def notify(self, incident: dict, reason: str) -> bool:
         message = self._build_slack_message(incident, reason)
-        try:
-            response = requests.post(
-                self.slack_webhook_url,
-                json={"text": message},
-                timeout=5
-            )
-            response.raise_for_status()
-            self._log_notification(incident, reason, True, response.text)
-            return True
-        except Exception as e:
-            self.logger.error(f"Slack notification failed: {e}")
-            self._log_notification(incident, reason, False, str(e))
-            return False
+        return self._send(incident, reason, message, "Slack notification failed")
 
     @expose
+    @observed()
     def notify_with_solution(self, incident: dict, action_proposal: dict, policy_result: dict) -> bool:
         """
         Sends a Slack notification with the LLM-proposed solution when execution is denied by policy.
@@ -46,18 +41,26 @@ class NotificationAgent(Agent):
             f"❌ Action NOT auto-executed (policy: {policy_result.get('reason', 'N/A')})\n"
             "👤 Please review and approve or escalate."
         )
+        return self._send(incident, action_proposal.get('reason', ''), message,
+                          "Slack notification with solution failed")
+
+    def _send(self, incident: dict, reason: str, message: str, error_prefix: str) -> bool:
         try:
-            response = requests.post(
+            if self.outbox:
+                message_id = self.outbox.enqueue(message, incident_id=incident.get('incident_id'))
+                self._log_notification(incident, reason, True, f"queued:{message_id}")
+                return True
+            response = self.session.post(
                 self.slack_webhook_url,
                 json={"text": message},
                 timeout=5
             )
             response.raise_for_status()
-            self._log_notification(incident, action_proposal.get('reason', ''), True, response.text)
+            self._log_notification(incident, reason, True, response.text)
             return True
         except Exception as e:
-            self.logger.error(f"Slack notification with solution failed: {e}")
-            self._log_notification(incident, action_proposal.get('reason', ''), False, str(e))
+            self.logger.error(f"{error_prefix}: {e}")
+            self._log_notification(incident, reason, False, str(e))
             return False
 
     @staticmethod
@@ -98,26 +101,6 @@ class NotificationAgent(Agent):
         else:
             self.logger.info(log_entry) if success else self.logger.error(log_entry)
 
-class AgentCardHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/agent_card":
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            # Dynamically get the agent card from the running agent instance
-            card = self.server.agent.get_agent_card()
-            self.wfile.write(json.dumps(card).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
-
-def serve_agent_card(agent, port=9008):
-    server = HTTPServer(("0.0.0.0", port), AgentCardHandler)
-    server.agent = agent
-    threading.Thread(target=server.serve_forever, daemon=True).start()
-    print(f"Agent Card HTTP endpoint running at http://0.0.0.0:{port}/agent_card")
-
 if __name__ == "__main__":
     agent = NotificationAgent(slack_webhook_url="https://hooks.slack.com/services/your/webhook/url")
-    serve_agent_card(agent, port=9008)  # Agent Card HTTP endpoint
-    agent.run(host="0.0.0.0", port=8008)  # A2A JSON-RPC server
+    serve({agent.get_agent_card()["id"]: agent}, port=8008)  # A2A JSON-RPC + Agent Card on one listener
@@ -1,46 +1,98 @@
-from a2a_sdk import Agent, expose
-import logging
+from a2a_sdk import Agent
 import time
 from typing import Dict, Any
-from google.cloud import bigquery
-from src.schemas import MCPEnvelope
-import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import json
+try:
+    from google.cloud import bigquery
+except ImportError:  # Only needed when no bq_client is given
+    bigquery = None
+from src.schemas import MCPEnvelope, as_model
+from src.sinks import BigQueryRowSink
+from src.structured_log import get_logger
+from src.metrics import new_trace_context, observed
+from src.runtime import expose, serve
 
 class OrchestratorAgent(Agent):
     """
     A2A-enabled OrchestratorAgent for production SRE workflows.
     Exposes orchestrate as a JSON-RPC method for agentic interoperability.
     Handles MCP envelope creation, signing, and BigQuery persistence.
+    Envelopes are persisted write-behind by a BigQueryRowSink, off the request path.
+    Co-located callers use create_envelope() via the agent registry and get the MCPEnvelope model.
+    The envelope carries the trace context (payload["trace"]) that downstream agents' spans join.
+    finalize() adds an incident's stage timings once it has run and re-signs the envelope.
+    Envelope rows are append-only, so the envelope is persisted once, when created; the
+    timings go to their own table (one row per envelope_id, with the new signature):
+
+        SELECT e.*, t.timings, t.total_ms, t.signature AS final_signature
+        FROM sre_agent.mcp_envelopes e
+        LEFT JOIN sre_agent.mcp_envelope_timings t USING (envelope_id)
     """
-    def __init__(self, logger=None, bq_client=None, signer_fn=None):
+    local_methods = {"orchestrate": "create_envelope", "finalize": "finalize_envelope"}
+
+    def __init__(self, logger=None, bq_client=None, signer_fn=None, sink=None, timings_sink=None):
         super().__init__()
-        self.logger = logger or logging.getLogger("orchestrator-agent")
+        if bq_client is None and bigquery is None:
+            raise ImportError("google-cloud-bigquery is required unless a bq_client is given")
+        self.logger = logger or get_logger("orchestrator-agent")
         self.bq_client = bq_client or bigquery.Client()
         self.signer_fn = signer_fn
         self.bq_table = "sre_agent.mcp_envelopes"
+        self.bq_timings_table = "sre_agent.mcp_envelope_timings"
+        self.sink = sink or BigQueryRowSink(self.bq_client, self.bq_table, logger=self.logger)
+        self.timings_sink = timings_sink or BigQueryRowSink(self.bq_client, self.bq_timings_table, logger=self.logger)
 
     @expose
     def orchestrate(self, envelope_data: dict) -> dict:
+        return self.create_envelope(envelope_data).dict()
+
+    @observed("orchestrate")
+    def create_envelope(self, envelope_data: dict) -> MCPEnvelope:
         try:
-            envelope = MCPEnvelope(
-                envelope_id=envelope_data.get("envelope_id", f"env-{int(time.time())}"),
-                created_at=envelope_data.get("created_at", time.strftime("%Y-%m-%dT%H:%M:%SZ")),
-                agent=envelope_data.get("agent", "orchestrator"),
-                payload=envelope_data.get("payload", {}),
+            payload = dict(envelope_data.get("payload") or {})
+            payload.setdefault("trace", new_trace_context())
+            # Built from fields we generate or coerce here, so validation is skipped
+            envelope = MCPEnvelope.trusted(
+                envelope_id=str(envelope_data.get("envelope_id", f"env-{int(time.time())}")),
+                created_at=str(envelope_data.get("created_at", time.strftime("%Y-%m-%dT%H:%M:%SZ"))),
+                agent=str(envelope_data.get("agent", "orchestrator")),
+                payload=payload,
+                signature=None,
             )
-            if self.signer_fn:
-                envelope.signature = self.signer_fn(envelope.dict())
-            else:
-                envelope.signature = f"signed-{envelope.envelope_id}"
+            self._sign(envelope)
             self._log_envelope(envelope)
             self._persist_to_bigquery(envelope)
-            return envelope.dict()
+            return envelope
         except Exception as e:
             self.logger.error(f"Orchestration failed: {e}")
             raise
 
+    @expose
+    def finalize(self, mcp_envelope: dict, timings: dict, total_ms: float) -> dict:
+        return self.finalize_envelope(mcp_envelope, timings, total_ms).dict()
+
+    @observed("finalize")
+    def finalize_envelope(self, mcp_envelope, timings: dict, total_ms: float) -> MCPEnvelope:
+        """Add the pipeline timings to the envelope and re-sign it; the timings are persisted separately."""
+        envelope = as_model(MCPEnvelope, mcp_envelope)
+        envelope.payload["timings"] = timings
+        envelope.payload["total_ms"] = total_ms
+        self._sign(envelope)
+        self.timings_sink.enqueue({
+            "envelope_id": envelope.envelope_id,
+            "timings": timings,
+            "total_ms": total_ms,
+            "signature": envelope.signature,
+            "finalized_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        })
+        return envelope
+
+    def _sign(self, envelope: MCPEnvelope):
+        envelope.signature = None
+        if self.signer_fn:
+            envelope.signature = self.signer_fn(envelope.dict())
+        else:
+            envelope.signature = f"signed-{envelope.envelope_id}"
+
     def _log_envelope(self, envelope: MCPEnvelope):
         log_entry = {
             "event": "mcp_envelope_created",
@@ -48,6 +100,7 @@ class OrchestratorAgent(Agent):
             "agent": envelope.agent,
             "created_at": envelope.created_at,
             "signature": envelope.signature,
+            "trace_id": envelope.payload["trace"].get("trace_id"),
         }
         if hasattr(self.logger, "log_struct"):
             self.logger.log_struct(log_entry, severity="INFO")
@@ -55,12 +108,13 @@ class OrchestratorAgent(Agent):
             self.logger.info(log_entry)
 
     def _persist_to_bigquery(self, envelope: MCPEnvelope):
-        try:
-            table = self.bq_client.get_table(self.bq_table)
-            row = envelope.dict()
-            self.bq_client.insert_rows_json(table, [row])
-        except Exception as e:
-            self.logger.error(f"BigQuery persistence failed: {e}")
+        # Enqueue only; the sink batches, retries and spools to disk in the background.
+        self.sink.enqueue(envelope.dict())
+
+    def shutdown(self):
+        """Flush pending envelopes and timings to BigQuery before exit."""
+        self.sink.close()
+        self.timings_sink.close()
 
     @staticmethod
     def get_agent_card():
@@ -77,26 +131,6 @@ class OrchestratorAgent(Agent):
     def get_agent_card_rpc(self, params=None):
         return self.get_agent_card()
 
-class AgentCardHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/agent_card":
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            # Dynamically get the agent card from the running agent instance
-            card = self.server.agent.get_agent_card()
-            self.wfile.write(json.dumps(card).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
-
-def serve_agent_card(agent, port=9004):
-    server = HTTPServer(("0.0.0.0", port), AgentCardHandler)
-    server.agent = agent
-    threading.Thread(target=server.serve_forever, daemon=True).start()
-    print(f"Agent Card HTTP endpoint running at http://0.0.0.0:{port}/agent_card")
-
 if __name__ == "__main__":
     agent = OrchestratorAgent()
-    serve_agent_card(agent, port=9004)  # Agent Card HTTP endpoint
-    agent.run(host="0.0.0.0", port=8004)  # A2A JSON-RPC server
+    serve({agent.get_agent_card()["id"]: agent}, port=8004)  # A2A JSON-RPC + Agent Card on one listener
@@ -1,9 +1,8 @@
-from a2a_sdk import Agent, expose
-import logging
+from a2a_sdk import Agent
+from src.structured_log import get_logger
+from src.metrics import observed
+from src.runtime import expose, serve
 from typing import List, Dict, Any
-import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import json
 
 class PersonalizationAgent(Agent):
     """
@@ -12,10 +11,11 @@ class PersonalizationAgent(Agent):
     """
     def __init__(self, logger=None, example_fetch_fn=None):
         super().__init__()
-        self.logger = logger or logging.getLogger("personalization-agent")
+        self.logger = logger or get_logger("personalization-agent")
         self.example_fetch_fn = example_fetch_fn
 
     @expose
+    @observed()
     def personalize(self, context: dict, grounding_snippets: list) -> List[Dict[str, Any]]:
         try:
             if self.example_fetch_fn:
@@ -59,26 +59,6 @@ class PersonalizationAgent(Agent):
     def get_agent_card_rpc(self, params=None):
         return self.get_agent_card()
 
-class AgentCardHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/agent_card":
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            # Dynamically get the agent card from the running agent instance
-            card = self.server.agent.get_agent_card()
-            self.wfile.write(json.dumps(card).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
-
-def serve_agent_card(agent, port=9003):
-    server = HTTPServer(("0.0.0.0", port), AgentCardHandler)
-    server.agent = agent
-    threading.Thread(target=server.serve_forever, daemon=True).start()
-    print(f"Agent Card HTTP endpoint running at http://0.0.0.0:{port}/agent_card")
-
 if __name__ == "__main__":
     agent = PersonalizationAgent()
-    serve_agent_card(agent, port=9003)  # Agent Card HTTP endpoint
-    agent.run(host="0.0.0.0", port=8003)  # A2A JSON-RPC server
+    serve({agent.get_agent_card()["id"]: agent}, port=8003)  # A2A JSON-RPC + Agent Card on one listener
@@ -1,44 +1,96 @@
-from a2a_sdk import Agent, expose
-import requests
-import logging
-from typing import Dict, Any
-from src.schemas import ActionProposal
+from a2a_sdk import Agent
 import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import json
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Callable, List, Optional
+from src.schemas import ActionProposal, as_model, dumps
+from src.cache import TTLCache
+from src.structured_log import get_logger
+from src.metrics import observed, watch_cache
+from src.runtime import expose, serve
 
 class PolicyAgent(Agent):
     """
     A2A-enabled PolicyAgent for production SRE workflows.
     Exposes policy_check as a JSON-RPC method for agentic interoperability.
     Integrates with OPA Gatekeeper for policy gating.
+    OPA is queried over a pooled keep-alive session, and verdicts are cached per
+    canonical ActionProposal until the TTL expires or the bundle revision changes.
+    Cached verdicts are tagged with the revision they were decided under; at most
+    every `revision_check_seconds` a cache hit is re-decided by OPA instead, which
+    refreshes the revision, so a policy change is picked up within that interval.
+    Optional embedded_rules answer hot cases in-process before OPA is consulted.
+    Proposals reused from a past incident instead of generated by the LLM carry
+    `case_reuse` (case id, similarity, validated successes) in the rule/OPA input,
+    so policies can treat them differently. It comes from the proposal's
+    metadata["case_reuse"], which the ReasoningAgent sets on reused proposals and
+    strips from LLM output, so a generated proposal cannot claim it.
     """
-    def __init__(self, opa_url: str, logger=None):
+    def __init__(self, opa_url: str, logger=None, cache_ttl_seconds: float = 60.0,
+                 cache_max_entries: int = 10000, pool_size: int = 20,
+                 embedded_rules: Optional[List[Callable[[dict], Optional[dict]]]] = None,
+                 revision_check_seconds: float = 5.0):
         super().__init__()
         self.opa_url = opa_url
-        self.logger = logger or logging.getLogger("policy-agent")
+        self.logger = logger or get_logger("policy-agent")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.decision_cache = TTLCache(max_entries=cache_max_entries, ttl_seconds=cache_ttl_seconds)
+        watch_cache("policy_decisions", self.decision_cache)
+        self.bundle_revision = None
+        self.revision_check_seconds = revision_check_seconds
+        self._next_revision_check = 0.0
+        self._revision_lock = threading.Lock()
+        # Each rule takes the proposal dict and returns a verdict dict or None to defer to OPA
+        self.embedded_rules = embedded_rules or []
 
     @expose
+    @observed()
     def policy_check(self, action_proposal: dict) -> Dict[str, Any]:
-        action_proposal = ActionProposal(**action_proposal)
-        payload = {"input": action_proposal.dict()}
+        action_proposal = as_model(ActionProposal, action_proposal)
+        proposal = action_proposal.wire()
+        case_reuse = self._case_reuse(action_proposal)
+        if case_reuse:
+            proposal = dict(proposal, case_reuse=case_reuse)
+        for rule in self.embedded_rules:
+            verdict = rule(proposal)
+            if verdict is not None:
+                self._log_policy_verdict(action_proposal, verdict["admit"], verdict["reason"],
+                                         verdict.get("confidence", 0), {}, source="embedded", case_reuse=case_reuse)
+                return dict(verdict, opa_result={})
+        cache_key = dumps(proposal, sort_keys=True)
+        cached = self.decision_cache.get(cache_key)
+        if cached is not None and cached["bundle_revision"] == self.bundle_revision \
+                and not self._revision_check_due():
+            verdict = {k: v for k, v in cached.items() if k != "bundle_revision"}
+            self._log_policy_verdict(action_proposal, verdict["admit"], verdict["reason"],
+                                     verdict["confidence"], verdict["opa_result"], source="cache",
+                                     case_reuse=case_reuse)
+            return verdict
+        payload = {"input": proposal}
         try:
-            response = requests.post(self.opa_url, json=payload, timeout=5)
+            response = self.session.post(self.opa_url, json=payload, params={"provenance": "true"}, timeout=5)
             response.raise_for_status()
             result = response.json()
+            self._track_bundle_revision(result)
             admit = result.get("result", {}).get("admit", False)
             reason = result.get("result", {}).get("reason", "No reason provided")
             confidence = result.get("result", {}).get("confidence", 0)
-            self._log_policy_verdict(action_proposal, admit, reason, confidence, result)
-            return {
+            self._log_policy_verdict(action_proposal, admit, reason, confidence, result, case_reuse=case_reuse)
+            verdict = {
                 "admit": admit,
                 "reason": reason,
                 "confidence": confidence,
                 "opa_result": result
             }
+            self.decision_cache.set(cache_key, dict(verdict, bundle_revision=self.bundle_revision))
+            return dict(verdict)
         except Exception as e:
             self.logger.error(f"Policy check failed: {e}")
-            self._log_policy_verdict(action_proposal, False, str(e), 0, {})
+            self._log_policy_verdict(action_proposal, False, str(e), 0, {}, case_reuse=case_reuse)
             return {
                 "admit": False,
                 "reason": str(e),
@@ -46,6 +98,34 @@ class PolicyAgent(Agent):
                 "opa_result": {}
             }
 
+    @staticmethod
+    def _case_reuse(action_proposal: ActionProposal) -> Optional[dict]:
+        return (action_proposal.metadata or {}).get("case_reuse") or None
+
+    @expose
+    def invalidate_policy_cache(self) -> dict:
+        self.decision_cache.clear()
+        return {"status": "invalidated"}
+
+    def _revision_check_due(self) -> bool:
+        """True for one caller per interval, whose cache hit then goes to OPA."""
+        now = time.monotonic()
+        with self._revision_lock:
+            if now < self._next_revision_check:
+                return False
+            self._next_revision_check = now + self.revision_check_seconds
+            return True
+
+    def _track_bundle_revision(self, opa_result: dict):
+        """Drop cached verdicts when OPA reports a different policy bundle revision."""
+        bundles = opa_result.get("provenance", {}).get("bundles", {})
+        revision = tuple(sorted((name, b.get("revision")) for name, b in bundles.items())) or None
+        if revision and revision != self.bundle_revision:
+            if self.bundle_revision is not None:
+                self.logger.info(f"OPA bundle revision changed to {revision}, clearing decision cache")
+                self.decision_cache.clear()
+            self.bundle_revision = revision
+
     @staticmethod
     def get_agent_card():
         return {
@@ -61,7 +141,8 @@ class PolicyAgent(Agent):
     def get_agent_card_rpc(self, params=None):
         return self.get_agent_card()
 
-    def _log_policy_verdict(self, action_proposal, admit, reason, confidence, opa_result):
+    def _log_policy_verdict(self, action_proposal, admit, reason, confidence, opa_result, source="opa",
+                            case_reuse=None):
         log_entry = {
             "event": "policy_verdict",
             "action": action_proposal.action,
@@ -69,32 +150,41 @@ class PolicyAgent(Agent):
             "reason": reason,
             "confidence": confidence,
             "opa_result": opa_result,
+            "source": source,
+            "case_reuse": case_reuse,
+            "cache": self.decision_cache.stats(),
         }
         if hasattr(self.logger, "log_struct"):
             self.logger.log_struct(log_entry, severity="INFO")
         else:
             self.logger.info(log_entry)
 
-class AgentCardHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/agent_card":
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            # Dynamically get the agent card from the running agent instance
-            card = self.server.agent.get_agent_card()
-            self.wfile.write(json.dumps(card).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
+# Example embedded rules for hot, static policy decisions:
+def deny_below_confidence(threshold: int):
+    def rule(proposal: dict) -> Optional[dict]:
+        if proposal.get("confidence", 0) < threshold:
+            return {"admit": False, "reason": f"Confidence below {threshold}", "confidence": proposal.get("confidence", 0)}
+        return None
+    return rule
+
+def deny_actions(actions: List[str]):
+    denied = frozenset(actions)
+    def rule(proposal: dict) -> Optional[dict]:
+        if proposal.get("action") in denied:
+            return {"admit": False, "reason": f"Action '{proposal.get('action')}' is not auto-executable", "confidence": 100}
+        return None
+    return rule
 
-def serve_agent_card(agent, port=9006):
-    server = HTTPServer(("0.0.0.0", port), AgentCardHandler)
-    server.agent = agent
-    threading.Thread(target=server.serve_forever, daemon=True).start()
-    print(f"Agent Card HTTP endpoint running at http://0.0.0.0:{port}/agent_card")
+def admit_proven_cases(actions: List[str], min_successes: int = 3):
+    allowed = frozenset(actions)
+    def rule(proposal: dict) -> Optional[dict]:
+        case_reuse = proposal.get("case_reuse") or {}
+        if proposal.get("action") in allowed and case_reuse.get("successes", 0) >= min_successes:
+            return {"admit": True, "reason": f"Reuses case {case_reuse.get('case_id')} validated "
+                                             f"{case_reuse['successes']} times", "confidence": proposal.get("confidence", 0)}
+        return None
+    return rule
 
 if __name__ == "__main__":
     agent = PolicyAgent(opa_url="http://opa-gatekeeper/v1/data/sre/policy")
-    serve_agent_card(agent, port=9006)  # Agent Card HTTP endpoint
-    agent.run(host="0.0.0.0", port=8006)  # A2A JSON-RPC server
+    serve({agent.get_agent_card()["id"]: agent}, port=8006)  # A2A JSON-RPC + Agent Card on one listener
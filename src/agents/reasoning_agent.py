@@ -1,39 +1,78 @@
-from a2a_sdk import Agent, expose
-import subprocess
-import json
-import logging
-from typing import Dict, Any
-from src.schemas import MCPEnvelope, ActionProposal
-import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from a2a_sdk import Agent
+import os
+import time
+from typing import Dict, Any, Callable, Optional
+from src.schemas import MCPEnvelope, ActionProposal, as_model
+from src.llm import LLMPool, GeminiCLIBackend, LLMTimeoutError
+from src.cascade import ModelCascade, get_default_tiers
+from src.case_memory import CaseMemory, get_default_case_memory
+from src.jsonstream import JSONObjectStream, StreamParseError
+from src.prompts import AssembledPrompt, PromptAssembler
+from src.structured_log import get_logger
+from src.metrics import observed
+from src.runtime import expose, serve
 
 class ReasoningAgent(Agent):
     """
     A2A-enabled ReasoningAgent for production SRE workflows.
     Exposes reason as a JSON-RPC method for agentic interoperability.
-    Uses Gemini CLI for LLM-based reasoning.
+    Uses a model cascade over the shared LLM pools (Gemini by default): a small model
+    proposes first, and the incident escalates to a larger one when the proposal's
+    confidence is below REASONING_CASCADE_THRESHOLD (see src/cascade.py).
+    Co-located callers use propose() via the agent registry and get the ActionProposal model.
+    Prompts are assembled within a token budget (REASONING_MAX_PROMPT_TOKENS) behind a
+    stable instruction prefix that prefix-caching backends can reuse (see src/prompts.py).
+    The response is streamed and parsed incrementally: generation stops as soon as the
+    proposal object is complete, and local callers can pass `on_progress` to see its
+    fields as they arrive (an escalated tier's fields are superseded by the next tier's).
+    An envelope payload["deadline_at"] (set by the incident pipeline) caps each LLM call.
+    Incidents that closely match a past incident whose remediation was validated as
+    successful reuse that proposal without an LLM call (see src/case_memory.py); such
+    proposals carry metadata["case_reuse"] for the PolicyAgent, which LLM output cannot set.
     """
-    def __init__(self, logger=None, gemini_cmd="gemini"):
+    local_methods = {"reason": "propose"}
+
+    def __init__(self, logger=None, gemini_cmd="gemini", llm_pool: LLMPool = None,
+                 prompt_assembler: PromptAssembler = None, cascade: ModelCascade = None,
+                 case_memory: CaseMemory = None):
         super().__init__()
-        self.logger = logger or logging.getLogger("reasoning-agent")
+        self.logger = logger or get_logger("reasoning-agent")
         self.gemini_cmd = gemini_cmd
+        if llm_pool is None and gemini_cmd != "gemini":
+            llm_pool = LLMPool(GeminiCLIBackend(gemini_cmd))
+        if cascade is None:
+            cascade = ModelCascade.single(llm_pool, name="reasoning") if llm_pool else ModelCascade(
+                get_default_tiers(), threshold=float(os.getenv("REASONING_CASCADE_THRESHOLD", "70")),
+                name="reasoning")
+        self.cascade = cascade
+        self.prompt_assembler = prompt_assembler or PromptAssembler(
+            max_tokens=int(os.getenv("REASONING_MAX_PROMPT_TOKENS", "2000")))
+        self.case_memory = case_memory or get_default_case_memory()
 
     @expose
     def reason(self, mcp_envelope: dict, grounding_snippets: list, personalization_examples: list) -> dict:
-        mcp_envelope = MCPEnvelope(**mcp_envelope)
+        return self.propose(mcp_envelope, grounding_snippets, personalization_examples).dict()
+
+    @observed("reason")
+    def propose(self, mcp_envelope, grounding_snippets: list, personalization_examples: list,
+                on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> ActionProposal:
+        """`on_progress` receives the proposal fields parsed so far, each time one completes."""
+        mcp_envelope = as_model(MCPEnvelope, mcp_envelope)
+        reused = self._reuse_case(mcp_envelope)
+        if reused is not None:
+            if on_progress:
+                on_progress(dict(reused.metadata))
+            return reused
         prompt = self._build_prompt(mcp_envelope, grounding_snippets, personalization_examples)
         try:
-            result = subprocess.run(
-                [self.gemini_cmd, "prompt", prompt],
-                capture_output=True, text=True, check=True
-            )
-            response = result.stdout.strip()
-            action_proposal = self._parse_response(response)
-            self._log_reasoning(mcp_envelope, action_proposal, prompt, response)
-            return action_proposal.dict()
+            (action_proposal, response, stream_stats), attempts = self.cascade.run(
+                prompt.text, lambda pool, _: self._ask_tier(pool, prompt, on_progress,
+                                                            mcp_envelope.payload.get("deadline_at")))
+            self._log_reasoning(mcp_envelope, action_proposal, prompt, response, dict(stream_stats, cascade=attempts))
+            return action_proposal
         except Exception as e:
             self.logger.error(f"Reasoning failed: {e}")
-            return ActionProposal(action="none", reason=str(e), confidence=0).dict()
+            return ActionProposal.trusted(action="none", reason=str(e), confidence=0)
 
     @staticmethod
     def get_agent_card():
@@ -50,73 +89,132 @@ class ReasoningAgent(Agent):
     def get_agent_card_rpc(self, params=None):
         return self.get_agent_card()
 
-    def _build_prompt(self, mcp_envelope, grounding_snippets, personalization_examples) -> str:
-        prompt = f"""
-        You are an SRE agent.\n\n
-        Incident: {json.dumps(mcp_envelope.payload.get('signal', {}))}\n\n
-        Context: {json.dumps(mcp_envelope.payload.get('context', {}))}\n\n
-        Query Class: {mcp_envelope.payload.get('query_class', '')}\n\n
-        Relevant Docs: {json.dumps(grounding_snippets)}\n\n
-        Examples: {json.dumps(personalization_examples)}\n\n
-        Propose a safe, minimal action.\n\n
-        Respond as JSON matching schema:\n
-        {{ \"action\": \"...\", \"reason\": \"...\", \"confidence\": 0-100 }}
-        """
-        return prompt
-
-    def _parse_response(self, response: str) -> ActionProposal:
+    def _build_prompt(self, mcp_envelope, grounding_snippets, personalization_examples) -> AssembledPrompt:
+        return self.prompt_assembler.assemble(
+            mcp_envelope.payload.get("signal", {}),
+            mcp_envelope.payload.get("context", {}),
+            mcp_envelope.payload.get("query_class", ""),
+            grounding_snippets,
+            personalization_examples,
+        )
+
+    @expose
+    def cascade_stats(self) -> dict:
+        return self.cascade.stats()
+
+    @expose
+    def record_outcome(self, mcp_envelope: dict, action_proposal: dict, validated: bool) -> dict:
+        """Remember an executed proposal and whether the ValidatorAgent confirmed it."""
+        if self.case_memory is None:
+            return {"recorded": False}
+        mcp_envelope = as_model(MCPEnvelope, mcp_envelope)
+        case = self.case_memory.record(
+            mcp_envelope.payload.get("signal", {}),
+            mcp_envelope.payload.get("context", {}),
+            mcp_envelope.payload.get("query_class", ""),
+            as_model(ActionProposal, action_proposal),
+            validated,
+        )
+        return {"recorded": True, "case_id": case["case_id"], "successes": case["successes"],
+                "failures": case["failures"]}
+
+    def _reuse_case(self, mcp_envelope) -> Optional[ActionProposal]:
+        if self.case_memory is None:
+            return None
+        match = self.case_memory.lookup(
+            mcp_envelope.payload.get("signal", {}),
+            mcp_envelope.payload.get("context", {}),
+            mcp_envelope.payload.get("query_class", ""),
+        )
+        if match is None:
+            return None
+        case_reuse = {"case_id": match["case_id"], "similarity": round(match["similarity"], 4),
+                      "successes": match["successes"], "failures": match["failures"]}
+        proposal = match["proposal"]
+        # In the proposal itself, so the mark reaches remote callers of reason() too
+        action_proposal = ActionProposal(
+            action=proposal.get("action", "none"),
+            reason=proposal.get("reason", "No reason provided"),
+            confidence=proposal.get("confidence", 0),
+            metadata=dict(proposal.get("metadata") or {}, case_reuse=case_reuse),
+        )
+        log_entry = {
+            "event": "case_reused",
+            "envelope_id": mcp_envelope.envelope_id,
+            "action": action_proposal.action,
+            "confidence": action_proposal.confidence,
+            **case_reuse,
+        }
+        if hasattr(self.logger, "log_struct"):
+            self.logger.log_struct(log_entry, severity="INFO")
+        else:
+            self.logger.info(log_entry)
+        return action_proposal
+
+    def _ask_tier(self, pool: LLMPool, prompt: AssembledPrompt, on_progress=None, deadline_at=None):
+        proposed = self._stream_proposal(pool, prompt, on_progress, deadline_at)
+        return proposed, proposed[0].confidence, proposed[1]
+
+    def _stream_proposal(self, pool: LLMPool, prompt: AssembledPrompt, on_progress=None, deadline_at=None):
+        timeout = None
+        if deadline_at is not None:
+            # The pipeline's deadline, carried in the envelope, caps the LLM call
+            timeout = min(pool.timeout, deadline_at - time.time())
+            if timeout <= 0:
+                raise LLMTimeoutError("pipeline deadline passed before the LLM call")
+        started = time.perf_counter()
+        first_field_ms = []
+
+        def on_member(key, value, partial):
+            if not first_field_ms:
+                first_field_ms.append(round((time.perf_counter() - started) * 1000, 2))
+            if on_progress:
+                on_progress(dict(partial))
+
+        stream = JSONObjectStream(required=("action",), on_member=on_member)
         try:
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            if start != -1 and end != -1:
-                response_json = json.loads(response[start:end])
-                return ActionProposal(
-                    action=response_json.get("action", "none"),
-                    reason=response_json.get("reason", "No reason provided"),
-                    confidence=int(response_json.get("confidence", 0)),
-                    metadata=response_json
-                )
-            else:
-                raise ValueError("No JSON found in LLM response")
-        except Exception as e:
+            response = pool.stream(prompt.text, stream.feed, timeout=timeout)
+            action_proposal = self._to_proposal(stream.close())
+        except StreamParseError as e:
+            # Fails as soon as the output can no longer be a proposal, not when the model stops
             self.logger.error(f"Failed to parse LLM response: {e}")
-            return ActionProposal(action="none", reason="Failed to parse LLM response", confidence=0)
+            response = stream.text
+            action_proposal = ActionProposal.trusted(action="none", reason="Failed to parse LLM response", confidence=0)
+        stream_stats = {
+            "llm_ms": round((time.perf_counter() - started) * 1000, 2),
+            "first_field_ms": first_field_ms[0] if first_field_ms else None,
+            "response_chars": len(response),
+        }
+        return action_proposal, response, stream_stats
+
+    @staticmethod
+    def _to_proposal(response_json: Dict[str, Any]) -> ActionProposal:
+        # Reuse is only ever marked by _reuse_case; the model cannot claim it
+        response_json.pop("case_reuse", None)
+        return ActionProposal(
+            action=response_json.get("action", "none"),
+            reason=response_json.get("reason", "No reason provided"),
+            confidence=int(response_json.get("confidence", 0)),
+            metadata=response_json
+        )
 
-    def _log_reasoning(self, mcp_envelope, action_proposal, prompt, response):
+    def _log_reasoning(self, mcp_envelope, action_proposal, prompt, response, stream_stats=None):
         log_entry = {
             "event": "action_proposed",
             "envelope_id": mcp_envelope.envelope_id,
             "action": action_proposal.action,
             "confidence": action_proposal.confidence,
             "reason": action_proposal.reason,
-            "prompt": prompt,
+            "prompt": prompt.text,
             "llm_response": response,
+            **prompt.stats,
+            **(stream_stats or {}),
         }
         if hasattr(self.logger, "log_struct"):
             self.logger.log_struct(log_entry, severity="INFO")
         else:
             self.logger.info(log_entry)
 
-class AgentCardHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/agent_card":
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            # Dynamically get the agent card from the running agent instance
-            card = self.server.agent.get_agent_card()
-            self.wfile.write(json.dumps(card).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
-
-def serve_agent_card(agent, port=9005):
-    server = HTTPServer(("0.0.0.0", port), AgentCardHandler)
-    server.agent = agent
-    threading.Thread(target=server.serve_forever, daemon=True).start()
-    print(f"Agent Card HTTP endpoint running at http://0.0.0.0:{port}/agent_card")
-
 if __name__ == "__main__":
     agent = ReasoningAgent()
-    serve_agent_card(agent, port=9005)  # Agent Card HTTP endpoint
-    agent.run(host="0.0.0.0", port=8005)  # A2A JSON-RPC server
+    serve({agent.get_agent_card()["id"]: agent}, port=8005)  # A2A JSON-RPC + Agent Card on one listener
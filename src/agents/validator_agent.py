@@ -1,42 +1,103 @@
-from a2a_sdk import Agent, expose
-import logging
-from typing import Dict, Any
-# from google.cloud import bigquery
+from a2a_sdk import Agent
+from src.structured_log import get_logger
+from src.metrics import observed
+from src.runtime import expose, serve
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+try:
+    from google.cloud import bigquery
+except ImportError:  # Only needed with a bq_client
+    bigquery = None
 # from kubernetes import client, config
-import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import json
+try:
+    from kubernetes import watch as kube_watch
+except ImportError:
+    kube_watch = None
 
 class ValidatorAgent(Agent):
     """
     A2A-enabled ValidatorAgent for production SRE workflows.
     Exposes validate as a JSON-RPC method for agentic interoperability.
     Performs post-remediation state checks using BigQuery and Kubernetes, with structured logging and error handling.
+    Checks run concurrently; validate can optionally wait for convergence, and
+    validate_batch checks many incidents with a single BigQuery query.
+    Without a BigQuery or Kubernetes client nothing is checked, and validate reports
+    "healthy": None rather than claiming the remediation worked.
     """
-    def __init__(self, logger=None, bq_client=None, kube_client=None):
+    def __init__(self, logger=None, bq_client=None, kube_client=None, max_workers: int = 8):
         super().__init__()
-        self.logger = logger or logging.getLogger("validator-agent")
+        if bq_client is not None and bigquery is None:
+            raise ImportError("google-cloud-bigquery is required for BigQuery validation")
+        self.logger = logger or get_logger("validator-agent")
         self.bq_client = bq_client
         self.kube_client = kube_client
         self.bq_query_template = "SELECT COUNT(*) as count FROM `project.dataset.table` WHERE incident_id = @incident_id AND status = 'healthy'"
+        self.bq_batch_query_template = "SELECT incident_id, COUNT(*) as count FROM `project.dataset.table` WHERE incident_id IN UNNEST(@ids) AND status = 'healthy' GROUP BY incident_id"
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="validator")
 
     @expose
-    def validate(self, incident: dict) -> Dict[str, Any]:
+    @observed()
+    def validate(self, incident: dict, wait_for_healthy: bool = False, deadline_seconds: float = 120.0,
+                 initial_interval: float = 1.0, max_interval: float = 15.0) -> Dict[str, Any]:
+        """
+        Run the BigQuery and Kubernetes checks concurrently. With wait_for_healthy, re-poll
+        with exponential backoff until every check is healthy or the deadline passes; the
+        Kubernetes side then follows one watch stream instead of repeated list calls.
+        """
         results = {}
+        deadline = time.monotonic() + deadline_seconds
         try:
+            checks = {}
             if self.bq_client:
-                bq_result = self._check_bigquery(incident)
-                results['bigquery'] = bq_result
+                checks['bigquery'] = self._pool.submit(
+                    self._poll_until_healthy, self._check_bigquery, incident, deadline,
+                    initial_interval, max_interval) if wait_for_healthy else self._pool.submit(self._check_bigquery, incident)
             if self.kube_client:
-                kube_result = self._check_kubernetes(incident)
-                results['kubernetes'] = kube_result
+                checks['kubernetes'] = self._pool.submit(
+                    self._watch_kubernetes_until_healthy, incident, deadline
+                ) if wait_for_healthy else self._pool.submit(self._check_kubernetes, incident)
+            for name, future in checks.items():
+                results[name] = future.result()
+            # None: no checks are configured, so nothing was verified
+            healthy = all(r.get("status") == "healthy" for r in results.values()) if results else None
             self._log_validation(incident, results, True)
-            return {"success": True, "results": results}
+            return {"success": True, "healthy": healthy, "results": results}
         except Exception as e:
             self.logger.error(f"Validation failed: {e}")
             self._log_validation(incident, results, False, str(e))
             return {"success": False, "error": str(e), "results": results}
 
+    @expose
+    @observed()
+    def validate_batch(self, incidents: list) -> Dict[str, Any]:
+        """
+        Validate many incidents at once: one BigQuery query for all incident ids, and
+        one pod list per distinct namespace/label selector.
+        """
+        ids = [i.get('incident_id') for i in incidents]
+        results = {incident_id: {} for incident_id in ids}
+        try:
+            kube_futures = {}
+            if self.kube_client:
+                for key in {self._kube_target(i) for i in incidents}:
+                    kube_futures[key] = self._pool.submit(self._check_kubernetes, {"namespace": key[0], "label_selector": key[1]})
+            if self.bq_client:
+                counts = self._check_bigquery_batch(ids)
+                for incident_id in ids:
+                    count = counts.get(incident_id, 0)
+                    results[incident_id]['bigquery'] = {"status": "healthy" if count else "unhealthy", "count": count}
+            for incident in incidents:
+                if kube_futures:
+                    results[incident.get('incident_id')]['kubernetes'] = kube_futures[self._kube_target(incident)].result()
+            for incident in incidents:
+                self._log_validation(incident, results[incident.get('incident_id')], True)
+            return {"success": True, "results": results}
+        except Exception as e:
+            self.logger.error(f"Batch validation failed: {e}")
+            return {"success": False, "error": str(e), "results": results}
+
     @staticmethod
     def get_agent_card():
         return {
@@ -53,10 +114,80 @@ class ValidatorAgent(Agent):
         return self.get_agent_card()
 
     def _check_bigquery(self, incident):
-        return {"status": "healthy", "count": 1}
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter("incident_id", "STRING", incident.get('incident_id')),
+        ])
+        rows = list(self.bq_client.query(self.bq_query_template, job_config=job_config).result())
+        count = rows[0]["count"] if rows else 0
+        return {"status": "healthy" if count else "unhealthy", "count": count}
+
+    def _check_bigquery_batch(self, incident_ids: List[str]) -> Dict[str, int]:
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ArrayQueryParameter("ids", "STRING", incident_ids),
+        ])
+        rows = self.bq_client.query(self.bq_batch_query_template, job_config=job_config).result()
+        return {row["incident_id"]: row["count"] for row in rows}
+
+    @staticmethod
+    def _kube_target(incident):
+        return incident.get('namespace', 'default'), incident.get('label_selector', '')
+
+    @staticmethod
+    def _pod_ready(pod) -> bool:
+        if pod.status.phase not in ("Running", "Succeeded"):
+            return False
+        if pod.status.phase == "Succeeded":
+            return True
+        conditions = pod.status.conditions or []
+        return any(c.type == "Ready" and c.status == "True" for c in conditions)
 
     def _check_kubernetes(self, incident):
-        return {"status": "healthy", "pods": ["pod-1", "pod-2"]}
+        namespace, selector = self._kube_target(incident)
+        pods = self.kube_client.list_namespaced_pod(namespace, label_selector=selector).items
+        unready = [p.metadata.name for p in pods if not self._pod_ready(p)]
+        return {
+            "status": "healthy" if pods and not unready else "unhealthy",
+            "pods": [p.metadata.name for p in pods],
+            "unready": unready,
+        }
+
+    def _poll_until_healthy(self, check, incident, deadline, initial_interval, max_interval):
+        interval = initial_interval
+        while True:
+            result = check(incident)
+            remaining = deadline - time.monotonic()
+            if result.get("status") == "healthy" or remaining <= 0:
+                return result
+            time.sleep(min(interval * (0.5 + random.random() / 2), remaining))
+            interval = min(interval * 2, max_interval)
+
+    def _watch_kubernetes_until_healthy(self, incident, deadline):
+        """List once for the baseline, then follow a single watch stream until all pods are ready."""
+        namespace, selector = self._kube_target(incident)
+        pod_list = self.kube_client.list_namespaced_pod(namespace, label_selector=selector)
+        pods = {p.metadata.name: self._pod_ready(p) for p in pod_list.items}
+        if (pods and all(pods.values())) or kube_watch is None:
+            return self._summarize_pods(pods)
+        remaining = int(max(deadline - time.monotonic(), 1))
+        stream = kube_watch.Watch()
+        try:
+            for event in stream.stream(self.kube_client.list_namespaced_pod, namespace, label_selector=selector,
+                                       resource_version=pod_list.metadata.resource_version, timeout_seconds=remaining):
+                pod = event["object"]
+                if event["type"] == "DELETED":
+                    pods.pop(pod.metadata.name, None)
+                else:
+                    pods[pod.metadata.name] = self._pod_ready(pod)
+                if (pods and all(pods.values())) or time.monotonic() >= deadline:
+                    break
+        finally:
+            stream.stop()
+        return self._summarize_pods(pods)
+
+    @staticmethod
+    def _summarize_pods(pods: Dict[str, bool]) -> Dict[str, Any]:
+        unready = [name for name, ready in pods.items() if not ready]
+        return {"status": "healthy" if pods and not unready else "unhealthy", "pods": list(pods), "unready": unready}
 
     def _log_validation(self, incident, results, success, error=None):
         log_entry = {
@@ -71,26 +202,6 @@ class ValidatorAgent(Agent):
         else:
             self.logger.info(log_entry) if success else self.logger.error(log_entry)
 
-class AgentCardHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/agent_card":
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            # Dynamically get the agent card from the running agent instance
-            card = self.server.agent.get_agent_card()
-            self.wfile.write(json.dumps(card).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
-
-def serve_agent_card(agent, port=9009):
-    server = HTTPServer(("0.0.0.0", port), AgentCardHandler)
-    server.agent = agent
-    threading.Thread(target=server.serve_forever, daemon=True).start()
-    print(f"Agent Card HTTP endpoint running at http://0.0.0.0:{port}/agent_card")
-
 if __name__ == "__main__":
     agent = ValidatorAgent()
-    serve_agent_card(agent, port=9009)  # Agent Card HTTP endpoint
-    agent.run(host="0.0.0.0", port=8009)  # A2A JSON-RPC server
+    serve({agent.get_agent_card()["id"]: agent}, port=8009)  # A2A JSON-RPC + Agent Card on one listener
@@ -1,35 +1,95 @@
-from a2a_sdk import Agent, expose
+from a2a_sdk import Agent
 import os
 import json
 import time
-from google.cloud import pubsub_v1, logging as gcp_logging
+try:
+    from google.cloud import pubsub_v1
+except ImportError:  # Only needed when no subscriber is given
+    pubsub_v1 = None
 from src.schemas import Signal, Context
-from typing import Callable
+from src.dedup import AlertDeduplicator
+from src.structured_log import get_logger
+from src.metrics import observed
+from src.runtime import expose, serve
+from types import SimpleNamespace
+from typing import Callable, List, Optional, Tuple
 import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
 
 class WatcherAgent(Agent):
     """
     A2A-enabled WatcherAgent for production SRE workflows.
     Exposes ingest as a JSON-RPC method for agentic interoperability.
-    Listens for incoming alerts from Pub/Sub and can be triggered via A2A.
+    Listens for incoming alerts from Pub/Sub (listen(), or start() in the background,
+    which the runtime calls when serving) and can be triggered via A2A.
+    With batch_size > 1, Pub/Sub messages are micro-batched over a size/time window,
+    validated together, sent downstream as one batch and acked/nacked in bulk.
+    With dedup_enabled (or a deduplicator given), near-identical alerts are collapsed
+    before reaching downstream.
+    The default logger writes to Cloud Logging regardless of LOG_BACKEND;
+    WATCHER_LOG_BACKEND=stdout sends it to stdout with the other agents.
     """
-    def __init__(self, subscription_name: str, project_id: str, downstream_callback: Callable, logger=None):
+    def __init__(self, subscription_name: str, project_id: str, downstream_callback: Callable, logger=None,
+                 batch_size: int = 1, batch_window_seconds: float = 0.5,
+                 downstream_batch_callback: Optional[Callable] = None,
+                 max_outstanding_messages: int = 1000, max_outstanding_bytes: int = 100 * 1024 * 1024,
+                 deduplicator: Optional[AlertDeduplicator] = None, dedup_enabled: bool = False,
+                 subscriber=None):
         super().__init__()
         self.project_id = project_id
         self.subscription_path = f"projects/{project_id}/subscriptions/{subscription_name}"
-        self.subscriber = pubsub_v1.SubscriberClient()
-        self.logger = logger or gcp_logging.Client().logger("watcher-agent")
+        if subscriber is None and pubsub_v1 is None:
+            raise ImportError("google-cloud-pubsub is required unless a subscriber is given")
+        self.subscriber = subscriber or pubsub_v1.SubscriberClient()
+        # Logs to Cloud Logging as it always has (now batched off the ingest path)
+        self.logger = logger or get_logger("watcher-agent", backend=os.getenv("WATCHER_LOG_BACKEND", "cloud"))
         self.downstream_callback = downstream_callback
+        # downstream_batch_callback receives a list of (signal, context) tuples
+        self.downstream_batch_callback = downstream_batch_callback
+        self.batch_size = batch_size
+        self.batch_window_seconds = batch_window_seconds
+        flow_control = pubsub_v1.types.FlowControl if pubsub_v1 is not None else SimpleNamespace
+        self.flow_control = flow_control(
+            max_messages=max_outstanding_messages,
+            max_bytes=max_outstanding_bytes,
+        )
+        self.deduplicator = deduplicator or (AlertDeduplicator() if dedup_enabled else None)
 
     @expose
-    def ingest(self, raw_data: dict = None):
+    def ingest(self, raw_data: dict):
+        """
+        Ingest a message directly via A2A.
+        """
+        self._process_message(raw_data)
+        return {"status": "processed via A2A"}
+
+    def start(self) -> threading.Thread:
+        """Listen to Pub/Sub on a background thread."""
+        thread = threading.Thread(target=self.listen, name="watcher-listen", daemon=True)
+        thread.start()
+        return thread
+
+    def listen(self):
         """
-        Ingest a message from Pub/Sub (if raw_data is None) or directly via A2A (if raw_data is provided).
+        Ingest messages from Pub/Sub; blocks until the streaming pull ends.
         """
-        if raw_data is not None:
-            self._process_message(raw_data)
-            return {"status": "processed via A2A"}
+        if self.batch_size > 1:
+            batcher = _MessageBatcher(self._process_pubsub_batch, self.batch_size, self.batch_window_seconds)
+            streaming_pull_future = self.subscriber.subscribe(
+                self.subscription_path, callback=batcher.add, flow_control=self.flow_control
+            )
+            print(f"WatcherAgent listening for message batches on {self.subscription_path}...")
+            try:
+                streaming_pull_future.result()
+            except Exception as e:
+                self.logger.log_struct({
+                    "event": "pubsub_listener_error",
+                    "error": str(e)
+                }, severity="CRITICAL")
+                streaming_pull_future.cancel()
+                raise
+            finally:
+                batcher.stop()
+            return {"status": "listening to Pub/Sub"}
         else:
             def callback(message):
                 try:
@@ -43,7 +103,9 @@ class WatcherAgent(Agent):
                         "raw_message": message.data.decode("utf-8")
                     }, severity="ERROR")
                     message.nack()
-            streaming_pull_future = self.subscriber.subscribe(self.subscription_path, callback=callback)
+            streaming_pull_future = self.subscriber.subscribe(
+                self.subscription_path, callback=callback, flow_control=self.flow_control
+            )
             print(f"WatcherAgent listening for messages on {self.subscription_path}...")
             try:
                 streaming_pull_future.result()
@@ -56,7 +118,70 @@ class WatcherAgent(Agent):
                 raise
             return {"status": "listening to Pub/Sub"}
 
+    @expose
+    @observed()
+    def ingest_batch(self, raw_batch: list):
+        """
+        Ingest a batch of raw alerts directly via A2A.
+        """
+        alerts = [self._build_models(raw_data) for raw_data in raw_batch]
+        self._dispatch_batch(alerts)
+        return {"status": "processed via A2A", "count": len(alerts)}
+
     def _process_message(self, raw_data: dict):
+        signal, context = self._build_models(raw_data)
+        if self.deduplicator:
+            is_new, record = self.deduplicator.observe(signal, context)
+            if not is_new:
+                self._log_collapsed_alert(context, record)
+                return
+            self.deduplicator.annotate(context, record)
+        self._log_received_alert(signal, context)
+        self.downstream_callback(signal, context)
+
+    def _process_pubsub_batch(self, messages: list):
+        alerts, accepted = [], []
+        for message in messages:
+            try:
+                alerts.append(self._build_models(json.loads(message.data.decode("utf-8"))))
+                accepted.append(message)
+            except Exception as e:
+                self.logger.log_struct({
+                    "event": "alert_processing_error",
+                    "error": str(e),
+                    "raw_message": message.data.decode("utf-8", errors="replace")
+                }, severity="ERROR")
+                message.nack()
+        if not alerts:
+            return
+        try:
+            self._dispatch_batch(alerts)
+        except Exception as e:
+            self.logger.log_struct({
+                "event": "alert_batch_processing_error",
+                "error": str(e),
+                "batch_size": len(accepted)
+            }, severity="ERROR")
+            for message in accepted:
+                message.nack()
+            return
+        for message in accepted:
+            message.ack()
+
+    def _dispatch_batch(self, alerts: List[Tuple[Signal, Context]]):
+        received = len(alerts)
+        if self.deduplicator:
+            alerts = self.deduplicator.collapse(alerts)
+        self._log_received_batch(alerts, received)
+        if not alerts:
+            return
+        if self.downstream_batch_callback:
+            self.downstream_batch_callback(alerts)
+        else:
+            for signal, context in alerts:
+                self.downstream_callback(signal, context)
+
+    def _build_models(self, raw_data: dict) -> Tuple[Signal, Context]:
         signal = Signal(
             source=raw_data.get("source"),
             type=raw_data.get("type"),
@@ -72,8 +197,7 @@ class WatcherAgent(Agent):
             detected_at=raw_data.get("timestamp"),
             additional_info=raw_data.get("additional_info"),
         )
-        self._log_received_alert(signal, context)
-        self.downstream_callback(signal, context)
+        return signal, context
 
     def _log_received_alert(self, signal: Signal, context: Context):
         log_entry = {
@@ -85,9 +209,31 @@ class WatcherAgent(Agent):
             "incident_id": context.incident_id,
             "severity": context.severity,
             "environment": context.environment,
+            "dedup": self.deduplicator.stats() if self.deduplicator else None,
         }
         self.logger.log_struct(log_entry, severity="INFO")
 
+    def _log_received_batch(self, alerts: List[Tuple[Signal, Context]], received: int):
+        log_entry = {
+            "event": "received_alert_batch",
+            "batch_size": received,
+            "collapsed": received - len(alerts),
+            "incident_ids": [context.incident_id for _, context in alerts],
+            "severities": sorted({context.severity for _, context in alerts if context.severity}),
+            "dedup": self.deduplicator.stats() if self.deduplicator else None,
+        }
+        self.logger.log_struct(log_entry, severity="INFO")
+
+    def _log_collapsed_alert(self, context: Context, record: dict):
+        log_entry = {
+            "event": "alert_collapsed",
+            "incident_id": context.incident_id,
+            "merged_into": record["incident_id"],
+            "fingerprint": record["fingerprint"],
+            "occurrences": record["occurrences"],
+        }
+        self.logger.log_struct(log_entry, severity="DEBUG")
+
     @staticmethod
     def get_agent_card():
         return {
@@ -103,29 +249,58 @@ class WatcherAgent(Agent):
     def get_agent_card_rpc(self, params=None):
         return self.get_agent_card()
 
-class AgentCardHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/agent_card":
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            # Dynamically get the agent card from the running agent instance
-            card = self.server.agent.get_agent_card()
-            self.wfile.write(json.dumps(card).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
+class _MessageBatcher:
+    """
+    Collects Pub/Sub messages and flushes them to `flush_fn` when `batch_size`
+    messages are buffered or `window_seconds` have passed since the first one.
+    """
+    def __init__(self, flush_fn: Callable, batch_size: int, window_seconds: float):
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.window_seconds = window_seconds
+        self._buffer = []
+        self._deadline = None
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, message):
+        with self._cond:
+            self._buffer.append(message)
+            if self._deadline is None:
+                # Wake the flusher so it starts timing this window
+                self._deadline = time.monotonic() + self.window_seconds
+                self._cond.notify()
+            elif len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
 
-def serve_agent_card(agent, port=9000):
-    server = HTTPServer(("0.0.0.0", port), AgentCardHandler)
-    server.agent = agent
-    threading.Thread(target=server.serve_forever, daemon=True).start()
-    print(f"Agent Card HTTP endpoint running at http://0.0.0.0:{port}/agent_card")
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and (
+                    self._deadline is None
+                    or (len(self._buffer) < self.batch_size and time.monotonic() < self._deadline)
+                ):
+                    timeout = None if self._deadline is None else max(self._deadline - time.monotonic(), 0)
+                    self._cond.wait(timeout)
+                batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+                self._deadline = time.monotonic() + self.window_seconds if self._buffer else None
+                stopped = self._stopped
+            if batch:
+                self.flush_fn(batch)
+            if stopped and not batch:
+                return
 
 if __name__ == "__main__":
     # Example downstream_callback: replace with A2A client call in production
     def downstream_callback(signal, context):
         print(f"Downstream: {signal}, {context}")
     agent = WatcherAgent(subscription_name="your-subscription", project_id="your-project", downstream_callback=downstream_callback)
-    serve_agent_card(agent, port=9000)  # Agent Card HTTP endpoint
-    agent.run(host="0.0.0.0", port=8010)  # A2A JSON-RPC server
+    serve({agent.get_agent_card()["id"]: agent}, port=8010)  # A2A JSON-RPC + Agent Card on one listener
@@ -1,9 +1,13 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import uvicorn
 import os
 from datetime import datetime
 import json
+import asyncio
+from src.metrics import REGISTRY
+from src.registry import get_default_registry
 
 app = FastAPI(
     title="x-sre-agents",
@@ -42,65 +46,71 @@ async def health_check():
 
 @app.get("/agents")
 async def list_agents():
-    """List all available agents"""
+    """List all available agents with their live status, asked of the runtimes hosting them (A2A_ENDPOINTS)"""
     agents = [
         {
+            "id": "watcher-agent",
             "name": "Watcher",
             "description": "Monitors infrastructure and detects anomalies",
-            "status": "active"
         },
         {
-            "name": "Classifier", 
+            "id": "classifier-agent",
+            "name": "Classifier",
             "description": "Categorizes incidents and issues",
-            "status": "active"
         },
         {
+            "id": "grounding-agent",
             "name": "Grounding",
             "description": "Validates and grounds LLM outputs",
-            "status": "active"
         },
         {
+            "id": "personalization-agent",
             "name": "Personalization",
             "description": "Customizes responses based on context",
-            "status": "active"
         },
         {
+            "id": "orchestrator-agent",
             "name": "Orchestrator",
             "description": "Coordinates agent interactions",
-            "status": "active"
         },
         {
+            "id": "reasoning-agent",
             "name": "Reasoning",
             "description": "Performs logical analysis and decision making",
-            "status": "active"
         },
         {
+            "id": "policy-agent",
             "name": "Policy",
             "description": "Enforces security and compliance policies",
-            "status": "active"
         },
         {
+            "id": "executor-agent",
             "name": "Executor",
             "description": "Executes remediation actions",
-            "status": "active"
         },
         {
+            "id": "notification-agent",
             "name": "Notification",
             "description": "Manages alerting and notifications",
-            "status": "active"
         },
         {
+            "id": "validator-agent",
             "name": "Validator",
             "description": "Validates actions before execution",
-            "status": "active"
         },
         {
+            "id": "llmjudge-agent",
             "name": "LLMJudge",
             "description": "Evaluates LLM outputs and decisions",
-            "status": "active"
         }
     ]
-    return {"agents": agents}
+    statuses = await asyncio.to_thread(get_default_registry().statuses, [agent["id"] for agent in agents])
+    return {"agents": [dict(agent, **statuses[agent["id"]]) for agent in agents]}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/api/v1/status")
 async def api_status():
@@ -0,0 +1,155 @@
+"""
+Confidence-based model cascade for the classifier and reasoning agents.
+
+Tiers are LLM pools ordered from cheapest/fastest to largest. A request goes to
+the first tier and escalates to the next only when the answer's confidence is
+below the cascade's threshold (or the tier failed); the last tier's answer is
+always accepted. Rule-based answers (the classifier's rule engine) are settled
+before the cascade is consulted.
+
+Per-tier latency, estimated cost and outcomes (accepted / escalated / error) are
+recorded as cascade_* metrics and in `stats()`. Tiers are configured from the
+environment and shared by all co-located agents:
+
+    LLM_CASCADE_MODELS="gemini-1.5-flash-8b,gemini-1.5-pro"   # Gemini API models, small first
+    LLM_CASCADE_COSTS="0.0375/0.15,1.25/5.0"                  # USD per 1M input/output tokens
+
+Without LLM_CASCADE_MODELS the cascade is the default LLM pool alone (priced by
+LLM_COST_PER_MTOK="in/out") and never escalates.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.llm import GeminiAPIBackend, LLMPool, get_default_pool
+from src.metrics import REGISTRY, estimate_tokens
+
+TIER_DURATION = REGISTRY.histogram(
+    "cascade_tier_duration_seconds", "Latency of each cascade tier attempt", ("cascade", "tier"))
+TIER_OUTCOMES = REGISTRY.counter(
+    "cascade_tier_requests_total", "Cascade tier attempts by outcome", ("cascade", "tier", "outcome"))
+TIER_COST = REGISTRY.counter(
+    "cascade_tier_cost_usd_total", "Estimated LLM spend per cascade tier", ("cascade", "tier"))
+
+ACCEPTED = "accepted"
+ESCALATED = "escalated"
+ERROR = "error"
+
+
+class CascadeTier:
+    def __init__(self, name: str, pool: LLMPool, input_cost_per_mtok: float = 0.0, output_cost_per_mtok: float = 0.0):
+        self.name = name
+        self.pool = pool
+        self.input_cost_per_mtok = input_cost_per_mtok
+        self.output_cost_per_mtok = output_cost_per_mtok
+
+    def cost(self, prompt: str, response: str) -> float:
+        return (estimate_tokens(prompt) * self.input_cost_per_mtok
+                + estimate_tokens(response) * self.output_cost_per_mtok) / 1_000_000
+
+
+class ModelCascade:
+    """
+    `call(pool, prompt)` asks one tier and returns (result, confidence, response_text);
+    confidence is on the 0-100 scale used by ActionProposal.
+    """
+    def __init__(self, tiers: List[CascadeTier], threshold: float = 70.0, name: str = "default"):
+        if not tiers:
+            raise ValueError("A cascade needs at least one tier")
+        self.tiers = tiers
+        self.threshold = threshold
+        self.name = name
+        self._lock = threading.Lock()
+        self._stats = {tier.name: {ACCEPTED: 0, ESCALATED: 0, ERROR: 0, "latency_ms": 0.0, "cost_usd": 0.0}
+                       for tier in tiers}
+
+    @classmethod
+    def single(cls, pool: LLMPool, name: str = "default") -> "ModelCascade":
+        return cls([CascadeTier(pool.backend.name, pool)], name=name)
+
+    def run(self, prompt: str, call: Callable[[LLMPool, str], Tuple[Any, float, str]],
+            first: int = 0, last: Optional[int] = None) -> Tuple[Any, List[Dict[str, Any]]]:
+        """
+        Returns the accepted result and the attempts made, one dict per tier tried
+        ({"tier", "outcome", "confidence", "latency_ms", "cost_usd"}). If the last
+        tier raises, the exception propagates. `first`/`last` restrict the run to a
+        range of tier indexes (e.g. resume above a tier that was already asked).
+        """
+        tiers = self.tiers[min(first, len(self.tiers) - 1):None if last is None else last + 1]
+        attempts = []
+        for index, tier in enumerate(tiers):
+            last_tier = index == len(tiers) - 1
+            started = time.perf_counter()
+            try:
+                result, confidence, response = call(tier.pool, prompt)
+            except Exception as e:
+                attempts.append(self._record(tier, ERROR, None, started, tier.cost(prompt, ""), str(e)))
+                if last_tier:
+                    raise
+                continue
+            outcome = ACCEPTED if last_tier or confidence >= self.threshold else ESCALATED
+            attempts.append(self._record(tier, outcome, confidence, started, tier.cost(prompt, response)))
+            if outcome == ACCEPTED:
+                return result, attempts
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            stats = {}
+            for tier, s in self._stats.items():
+                answered = s[ACCEPTED] + s[ESCALATED]
+                stats[tier] = dict(s, latency_ms=round(s["latency_ms"], 2), cost_usd=round(s["cost_usd"], 6),
+                                   escalation_rate=round(s[ESCALATED] / answered, 4) if answered else 0.0)
+            return stats
+
+    def _record(self, tier: CascadeTier, outcome: str, confidence: Optional[float], started: float, cost: float,
+                error: Optional[str] = None) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - started
+        TIER_DURATION.observe(elapsed, cascade=self.name, tier=tier.name)
+        TIER_OUTCOMES.inc(cascade=self.name, tier=tier.name, outcome=outcome)
+        TIER_COST.inc(cost, cascade=self.name, tier=tier.name)
+        with self._lock:
+            s = self._stats[tier.name]
+            s[outcome] += 1
+            s["latency_ms"] += elapsed * 1000
+            s["cost_usd"] += cost
+        attempt = {"tier": tier.name, "outcome": outcome, "confidence": confidence,
+                   "latency_ms": round(elapsed * 1000, 2), "cost_usd": round(cost, 8)}
+        if error:
+            attempt["error"] = error
+        return attempt
+
+
+def _parse_costs(spec: str) -> List[Tuple[float, float]]:
+    costs = []
+    for part in spec.split(","):
+        if part.strip():
+            prompt_cost, _, completion_cost = part.partition("/")
+            costs.append((float(prompt_cost), float(completion_cost or 0)))
+    return costs
+
+
+_default_tiers = None
+_default_tiers_lock = threading.Lock()
+
+
+def get_default_tiers() -> List[CascadeTier]:
+    """Process-wide cascade tiers, configured from the environment."""
+    global _default_tiers
+    with _default_tiers_lock:
+        if _default_tiers is None:
+            models = [m.strip() for m in os.getenv("LLM_CASCADE_MODELS", "").split(",") if m.strip()]
+            if models:
+                costs = _parse_costs(os.getenv("LLM_CASCADE_COSTS", ""))
+                max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+                timeout = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+                _default_tiers = [
+                    CascadeTier(model, LLMPool(GeminiAPIBackend(model=model), max_concurrency, timeout),
+                                *(costs[i] if i < len(costs) else (0.0, 0.0)))
+                    for i, model in enumerate(models)
+                ]
+            else:
+                pool = get_default_pool()
+                costs = _parse_costs(os.getenv("LLM_COST_PER_MTOK", "")) or [(0.0, 0.0)]
+                _default_tiers = [CascadeTier(pool.backend.name, pool, *costs[0])]
+        return _default_tiers
@@ -0,0 +1,235 @@
+"""
+Past-incident memory for short-circuiting the ReasoningAgent.
+
+Each executed remediation is recorded against a case: the incident (signal,
+context, query class) with its resource masked, so the same failure on any
+resource lands in one case. Within a case, outcomes are counted per remediation
+(action plus params), so a proposal is only reused on the strength of its own
+validations. Distinct cases are embedded into a VectorIndex
+(src/vector_index.py) for similarity lookup.
+
+Params that name the incident's resource, any component of its path, or one of
+its label values are stored as placeholders ("{{resource.1}}",
+"{{labels.cluster}}") and filled from the new incident on reuse; a proposal
+whose placeholders the new incident cannot fill is not reused.
+
+`lookup()` returns a remediation for a new incident only when its case is in the
+same query class and environment and scores at least `similarity_threshold`,
+and the remediation has been validated successfully at least `min_successes`
+times with its most recent execution succeeding, so one that stops working is
+not reused again.
+
+Cases are appended to a JSONL journal (CASE_MEMORY_PATH) and replayed on start,
+so replicas sharing the file warm up from each other's history.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from src.cache import fingerprint, normalize_message
+from src.metrics import REGISTRY
+from src.schemas import to_wire
+from src.vector_index import VectorIndex
+
+LOOKUPS = REGISTRY.counter("case_memory_lookups_total", "Past-incident lookups by result", ("result",))
+
+_PLACEHOLDER = re.compile(r"\{\{([^{}]+)\}\}")
+
+
+class CaseMemory:
+    def __init__(self, similarity_threshold: float = 0.92, min_successes: int = 2, path: Optional[str] = None,
+                 index: Optional[VectorIndex] = None, logger=None):
+        self.similarity_threshold = similarity_threshold
+        self.min_successes = min_successes
+        self.path = path
+        self.index = index or VectorIndex()
+        self.logger = logger or logging.getLogger("case-memory")
+        self.cases: Dict[str, Dict[str, Any]] = {}  # case key -> case
+        self._lock = threading.Lock()
+        if path:
+            self._replay()
+
+    def record(self, signal: Any, context: Any, query_class: str, proposal: Any, validated: bool) -> Dict[str, Any]:
+        """
+        Record an executed proposal and its validation outcome; returns
+        {"case_id", "successes", "failures"} for that remediation within its case.
+        """
+        signal, context, proposal = to_wire(signal), to_wire(context), to_wire(proposal)
+        text = self._case_text(signal, context, query_class)
+        proposal = dict(proposal, metadata=self._template(proposal.get("metadata") or {}, self._bindings(signal)))
+        entry = {
+            "key": fingerprint(context.get("environment"), text),
+            "text": text,
+            "query_class": query_class,
+            "environment": context.get("environment"),
+            "remediation": fingerprint(proposal.get("action"), proposal["metadata"].get("params")),
+            "proposal": proposal,
+            "validated": bool(validated),
+            "recorded_at": time.time(),
+        }
+        case = self._apply(entry)
+        if self.path:
+            self._journal(entry)
+        return case
+
+    def lookup(self, signal: Any, context: Any, query_class: str) -> Optional[Dict[str, Any]]:
+        """
+        The best reusable remediation for this incident, as {"case_id", "similarity",
+        "successes", "failures", "proposal"} with the proposal re-targeted, or None.
+        """
+        signal, context = to_wire(signal), to_wire(context)
+        if not len(self.index):
+            LOOKUPS.inc(result="miss")
+            return None
+        bindings = self._bindings(signal)
+        for hit in self.index.search(self._case_text(signal, context, query_class), k=5):
+            if hit["score"] < self.similarity_threshold:
+                break
+            with self._lock:
+                case = self.cases.get(hit["key"])
+                if case is None or case["query_class"] != query_class \
+                        or case["environment"] != context.get("environment"):
+                    continue
+                remediation = self._best_remediation(case)
+                if remediation is None:
+                    continue
+                try:
+                    proposal = dict(remediation["proposal"],
+                                    metadata=self._fill(remediation["proposal"]["metadata"], bindings))
+                except KeyError:
+                    continue  # the proposal targets something this incident does not have
+                match = {
+                    "case_id": case["case_id"],
+                    "similarity": hit["score"],
+                    "successes": remediation["successes"],
+                    "failures": remediation["failures"],
+                    "proposal": proposal,
+                }
+            LOOKUPS.inc(result="hit")
+            return match
+        LOOKUPS.inc(result="miss")
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"cases": len(self.cases),
+                    "reusable": sum(1 for c in self.cases.values() if self._best_remediation(c) is not None)}
+
+    def _best_remediation(self, case: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        reusable = [r for r in case["remediations"].values()
+                    if r["successes"] >= self.min_successes and r["last_validated"]]
+        return max(reusable, key=lambda r: (r["successes"], r["updated_at"])) if reusable else None
+
+    def _apply(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            case = self.cases.get(entry["key"])
+            is_new = case is None
+            if is_new:
+                case = self.cases[entry["key"]] = {
+                    "case_id": uuid.uuid4().hex[:12],
+                    "query_class": entry["query_class"],
+                    "environment": entry["environment"],
+                    "remediations": {},
+                }
+            remediation = case["remediations"].setdefault(entry["remediation"], {"successes": 0, "failures": 0})
+            # Action and params are the same for every entry here; reason and confidence are the latest
+            remediation.update(proposal=entry["proposal"], last_validated=entry["validated"],
+                               updated_at=entry["recorded_at"])
+            remediation["successes" if entry["validated"] else "failures"] += 1
+            snapshot = {"case_id": case["case_id"], "successes": remediation["successes"],
+                        "failures": remediation["failures"]}
+        if is_new:
+            self.index.add_vectors(self.index.embedder([entry["text"]]), [{"key": entry["key"]}])
+        return snapshot
+
+    @staticmethod
+    def _bindings(signal: Dict[str, Any]) -> Dict[str, str]:
+        """Placeholder name -> value for everything that identifies the incident's target."""
+        bindings = {}
+        resource = signal.get("resource")
+        if resource:
+            bindings["resource"] = resource
+            for i, part in enumerate(resource.split("/")):
+                if part:
+                    bindings[f"resource.{i}"] = part
+        for key, value in sorted((signal.get("labels") or {}).items()):
+            if isinstance(value, str) and value:
+                bindings[f"labels.{key}"] = value
+        return bindings
+
+    @classmethod
+    def _template(cls, value: Any, bindings: Dict[str, str]) -> Any:
+        names = {}
+        for name, bound in bindings.items():
+            names.setdefault(bound, "{{" + name + "}}")
+        return cls._map_strings(value, lambda s: names.get(s) or (
+            "/".join(names.get(part, part) for part in s.split("/")) if "/" in s else s))
+
+    @classmethod
+    def _fill(cls, value: Any, bindings: Dict[str, str]) -> Any:
+        """Raises KeyError when a placeholder has no binding for this incident."""
+        return cls._map_strings(value, lambda s: _PLACEHOLDER.sub(lambda m: bindings[m.group(1)], s))
+
+    @classmethod
+    def _map_strings(cls, value: Any, fn) -> Any:
+        if isinstance(value, str):
+            return fn(value)
+        if isinstance(value, dict):
+            return {k: cls._map_strings(v, fn) for k, v in value.items()}
+        if isinstance(value, list):
+            return [cls._map_strings(v, fn) for v in value]
+        return value
+
+    @staticmethod
+    def _case_text(signal: Dict[str, Any], context: Dict[str, Any], query_class: str) -> str:
+        # The resource is masked so the same failure on another resource matches
+        message = normalize_message(signal.get("message"))
+        resource = (signal.get("resource") or "").lower()
+        for name in {resource, resource.rsplit("/", 1)[-1]} - {""}:
+            message = message.replace(name, "<resource>")
+        return " ".join(str(part) for part in (
+            query_class, signal.get("type"), context.get("severity"), message,
+        ) if part)
+
+    def _journal(self, entry: Dict[str, Any]):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self._lock, open(self.path, "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        except OSError as e:
+            self.logger.warning(f"Could not journal incident case to {self.path}: {e}")
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError):
+                    continue
+        self.logger.info(f"Replayed {len(self.cases)} incident cases from {self.path}")
+
+
+_default_memory = None
+_default_memory_lock = threading.Lock()
+
+
+def get_default_case_memory() -> Optional[CaseMemory]:
+    """Process-wide case memory shared by the pipeline and ReasoningAgent; None when CASE_MEMORY_ENABLED=0."""
+    global _default_memory
+    if os.getenv("CASE_MEMORY_ENABLED", "1") == "0":
+        return None
+    with _default_memory_lock:
+        if _default_memory is None:
+            _default_memory = CaseMemory(
+                similarity_threshold=float(os.getenv("CASE_MEMORY_THRESHOLD", "0.92")),
+                min_successes=int(os.getenv("CASE_MEMORY_MIN_SUCCESSES", "2")),
+                path=os.getenv("CASE_MEMORY_PATH") or None,
+            )
+        return _default_memory
@@ -0,0 +1,114 @@
+"""
+Alert fingerprinting and storm collapsing for the WatcherAgent.
+
+Alerts sharing a fingerprint (resource, type, severity, cluster/namespace labels
+and environment) within the TTL window are merged into the first incident, which
+carries occurrence counts and first/last-seen timestamps. A severity change is a
+new fingerprint, so escalations are forwarded; alerts with neither a resource nor
+key labels are also keyed on their normalized message, so unrelated alerts are
+not merged. Repeats extend the window, but never past `max_window_seconds` from
+the first occurrence, so a continuous storm is re-forwarded periodically.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from src.cache import normalize_message
+from src.schemas import Signal, Context
+
+
+class AlertDeduplicator:
+    """
+    Bounded, TTL-evicting in-memory index of alert fingerprints.
+    Entries expire `ttl_seconds` after they were last seen, and at the latest
+    `max_window_seconds` after they were first seen; beyond `max_entries` the
+    least recently seen fingerprint is evicted.
+    """
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 10000,
+                 key_labels: Tuple[str, ...] = ("cluster", "namespace"), max_window_seconds: float = 1800.0):
+        self.ttl_seconds = ttl_seconds
+        self.max_window_seconds = max(max_window_seconds, ttl_seconds)
+        self.max_entries = max_entries
+        self.key_labels = key_labels
+        self._index = OrderedDict()  # fingerprint -> (expires_at, window_ends_at, record)
+        self._lock = threading.Lock()
+        self._stats = {"seen": 0, "forwarded": 0, "collapsed": 0, "evicted": 0}
+
+    def fingerprint(self, signal: Signal, context: Context) -> str:
+        labels = signal.labels or {}
+        parts = [signal.resource or "", signal.type or "", context.severity or "", context.environment or ""]
+        key_labels = [str(labels.get(key, "")) for key in self.key_labels]
+        parts.extend(key_labels)
+        if not signal.resource and not any(key_labels):
+            parts.append(normalize_message(signal.message))
+        return hashlib.sha1("\x1f".join(parts).encode()).hexdigest()
+
+    def observe(self, signal: Signal, context: Context) -> Tuple[bool, Dict]:
+        """
+        Record an alert. Returns (is_new, record); is_new is False when the alert
+        was collapsed into an existing incident.
+        """
+        fp = self.fingerprint(signal, context)
+        seen_at = signal.timestamp or datetime.utcnow().isoformat()
+        now = time.monotonic()
+        with self._lock:
+            self._stats["seen"] += 1
+            self._evict(now)
+            entry = self._index.get(fp)
+            if entry is not None and entry[0] <= now:
+                # Past its window cap while newer entries are still ahead of it in eviction order
+                del self._index[fp]
+                self._stats["evicted"] += 1
+                entry = None
+            if entry is not None:
+                _, window_ends_at, record = entry
+                record["occurrences"] += 1
+                record["last_seen"] = seen_at
+                self._index[fp] = (min(now + self.ttl_seconds, window_ends_at), window_ends_at, record)
+                self._index.move_to_end(fp)
+                self._stats["collapsed"] += 1
+                return False, record
+            record = {
+                "fingerprint": fp,
+                "incident_id": context.incident_id,
+                "occurrences": 1,
+                "first_seen": seen_at,
+                "last_seen": seen_at,
+            }
+            self._index[fp] = (now + self.ttl_seconds, now + self.max_window_seconds, record)
+            self._stats["forwarded"] += 1
+            return True, record
+
+    def collapse(self, alerts: List[Tuple[Signal, Context]]) -> List[Tuple[Signal, Context]]:
+        """
+        Collapse a batch of alerts, returning only new incidents. Duplicates within
+        the batch are merged before the incidents are annotated, so downstream sees
+        their final occurrence counts.
+        """
+        incidents = []
+        for signal, context in alerts:
+            is_new, record = self.observe(signal, context)
+            if is_new:
+                incidents.append((signal, context, record))
+        for signal, context, record in incidents:
+            self.annotate(context, record)
+        return [(signal, context) for signal, context, _ in incidents]
+
+    @staticmethod
+    def annotate(context: Context, record: Dict):
+        context.additional_info = dict(context.additional_info or {}, dedup=dict(record))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, active=len(self._index))
+
+    def _evict(self, now: float):
+        while self._index:
+            fp, (expires_at, _, _) = next(iter(self._index.items()))
+            if expires_at > now and len(self._index) < self.max_entries:
+                break
+            self._index.popitem(last=False)
+            self._stats["evicted"] += 1
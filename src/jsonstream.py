@@ -0,0 +1,120 @@
+"""
+Incremental parser for the first JSON object in streamed LLM output.
+
+Chunks are scanned once as they arrive, tracking string/escape state and
+nesting depth. Each top-level member is decoded as soon as its value is
+complete, so callers see partial progress (e.g. "action" before "reason" has
+been generated), and the object is finished the moment its closing brace
+arrives, so the caller can stop generation there instead of waiting for any
+trailing prose. Output that cannot be an object of the expected shape fails
+immediately rather than after the stream ends.
+"""
+import json
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class StreamParseError(ValueError):
+    """Raised when streamed output cannot yield the expected JSON object."""
+
+
+class JSONObjectStream:
+    """
+    Feed chunks with `feed()`; it returns True once the first top-level object
+    is complete (then `result` holds it). `partial` holds the members decoded so
+    far and `on_member(key, value, partial)` is called as each one completes.
+    `required` keys must be present in the finished object. More than
+    `max_preamble_chars` before the opening brace, or `max_chars` overall,
+    fails the parse.
+    """
+    def __init__(self, required: Iterable[str] = (),
+                 on_member: Optional[Callable[[str, Any, Dict[str, Any]], None]] = None,
+                 max_preamble_chars: int = 2000, max_chars: int = 100000):
+        self.required = tuple(required)
+        self.on_member = on_member
+        self.max_preamble_chars = max_preamble_chars
+        self.max_chars = max_chars
+        self.partial: Dict[str, Any] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.text = ""
+        self._start = -1         # index of the opening brace in self.text
+        self._member_start = -1  # index where the current top-level member begins
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def feed(self, chunk: str) -> bool:
+        if self.done:
+            return True
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if self._start < 0:
+                if ch == "{":
+                    self._start = self._member_start = i + 1
+                    self._depth = 1
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pos = i + 1
+                    self._end_member(i)
+                    self._finish(text[self._start - 1:i + 1])
+                    return True
+            elif ch == "," and self._depth == 1:
+                self._end_member(i)
+        self._pos = len(text)
+        if self._start < 0 and len(text) > self.max_preamble_chars:
+            raise StreamParseError(f"no JSON object in the first {self.max_preamble_chars} chars")
+        if len(text) > self.max_chars:
+            raise StreamParseError(f"JSON object not complete within {self.max_chars} chars")
+        return False
+
+    def close(self) -> Dict[str, Any]:
+        """Signal end of stream; returns the object or raises StreamParseError."""
+        if not self.done:
+            raise StreamParseError("stream ended before a complete JSON object" if self._start >= 0
+                                   else "no JSON object in LLM response")
+        return self.result
+
+    def _end_member(self, end: int):
+        segment = self.text[self._member_start:end].strip()
+        self._member_start = end + 1
+        if not segment:
+            return
+        try:
+            member = json.loads("{" + segment + "}")
+        except ValueError as e:
+            raise StreamParseError(f"malformed JSON member: {segment[:80]!r}") from e
+        for key, value in member.items():
+            self.partial[key] = value
+            if self.on_member:
+                self.on_member(key, value, self.partial)
+
+    def _finish(self, raw: str):
+        try:
+            result = json.loads(raw)
+        except ValueError as e:
+            raise StreamParseError(f"malformed JSON object: {e}") from e
+        missing = [key for key in self.required if key not in result]
+        if missing:
+            raise StreamParseError(f"JSON object is missing {missing}")
+        self.result = result
+
@@ -0,0 +1,356 @@
+"""
+Shared LLM backend layer for the classifier and reasoning agents.
+
+Agents submit prompts to an LLMPool, which bounds concurrency and enforces
+per-call timeouts on top of a pluggable backend. `LLMPool.stream` feeds the
+response to a callback chunk by chunk and stops generation as soon as the
+callback is satisfied:
+
+- GeminiCLIBackend: spawns `gemini prompt ...` per call (legacy behaviour).
+- GeminiAPIBackend: in-process client with a warm, keep-alive connection pool.
+- FakeLLMBackend: local stand-in with configurable latency for offline runs.
+"""
+import asyncio
+import codecs
+import logging
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Iterator, Optional, Union
+
+from src.metrics import LLM_DURATION, LLM_TOKENS, estimate_tokens, watch_queue
+
+
+class LLMTimeoutError(Exception):
+    """Raised when an LLM call does not complete within its timeout."""
+
+
+class LLMBackend:
+    """Base class for LLM backends. Implementations must be thread-safe."""
+    name = "base"
+
+    def complete(self, prompt: str, timeout: Optional[float] = None) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Yield the response in chunks as it is generated. Closing the generator
+        early must stop generation. Backends without streaming yield one chunk.
+        """
+        yield self.complete(prompt, timeout=timeout)
+
+    def close(self):
+        pass
+
+
+class GeminiCLIBackend(LLMBackend):
+    """Runs the Gemini CLI as a subprocess for every call."""
+    name = "gemini_cli"
+
+    def __init__(self, gemini_cmd: str = "gemini"):
+        self.gemini_cmd = gemini_cmd
+
+    def complete(self, prompt: str, timeout: Optional[float] = None) -> str:
+        try:
+            result = subprocess.run(
+                [self.gemini_cmd, "prompt", prompt],
+                capture_output=True, text=True, check=True, timeout=timeout
+            )
+        except subprocess.TimeoutExpired as e:
+            raise LLMTimeoutError(f"{self.gemini_cmd} timed out after {timeout}s") from e
+        return result.stdout.strip()
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        proc = subprocess.Popen([self.gemini_cmd, "prompt", prompt], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL)
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            proc.kill()
+
+        timer = threading.Timer(timeout, kill) if timeout else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        try:
+            while True:
+                data = proc.stdout.read1(4096)
+                if not data:
+                    break
+                text = decoder.decode(data)
+                if text:
+                    yield text
+            if timed_out.is_set():
+                raise LLMTimeoutError(f"{self.gemini_cmd} timed out after {timeout}s")
+            if proc.wait() != 0:
+                raise subprocess.CalledProcessError(proc.returncode, self.gemini_cmd)
+        finally:
+            # Also runs when the consumer stops early: kill the CLI instead of letting it keep generating.
+            if timer:
+                timer.cancel()
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
+
+class GeminiAPIBackend(LLMBackend):
+    """
+    In-process Gemini client using the OpenAI-compatible endpoint.
+    The underlying HTTP client keeps connections alive across calls, so there is
+    no per-call process startup, CLI boot or auth handshake.
+    """
+    name = "gemini_api"
+    DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+
+    def __init__(self, model: str = "gemini-1.5-flash", api_key: Optional[str] = None,
+                 base_url: Optional[str] = None, max_retries: int = 2):
+        from openai import OpenAI
+        self.model = model
+        self.name = f"gemini_api:{model}"
+        self.client = OpenAI(
+            api_key=api_key or os.getenv("GEMINI_API_KEY"),
+            base_url=base_url or self.DEFAULT_BASE_URL,
+            max_retries=max_retries,
+        )
+
+    def complete(self, prompt: str, timeout: Optional[float] = None) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            timeout=timeout,
+        )
+        return (response.choices[0].message.content or "").strip()
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            timeout=timeout,
+            stream=True,
+        )
+        try:
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            response.close()  # closes the HTTP stream, so the server stops generating
+
+    def close(self):
+        self.client.close()
+
+
+class FakeLLMBackend(LLMBackend):
+    """
+    Local stand-in for offline tests and benchmarks.
+    `response` is a fixed string or a callable taking the prompt. `cold_start` is
+    paid once per worker thread when `reuse_workers` is True (a warm pool), or on
+    every call when False (per-call process spawning). `latency` is the time to
+    the first chunk; each further `chunk_chars` of the response takes `chunk_delay`.
+    """
+    name = "fake"
+
+    def __init__(self, response: Union[str, Callable[[str], str]] = "other",
+                 latency: float = 0.0, cold_start: float = 0.0, reuse_workers: bool = True,
+                 chunk_chars: int = 16, chunk_delay: float = 0.0):
+        self.response = response
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.latency = latency
+        self.cold_start = cold_start
+        self.reuse_workers = reuse_workers
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._warm = threading.local()
+
+    def complete(self, prompt: str, timeout: Optional[float] = None) -> str:
+        return "".join(self.stream(prompt, timeout=timeout))
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        with self._lock:
+            self.calls += 1
+        started = time.monotonic()
+        delay = self.latency
+        if self.cold_start and not (self.reuse_workers and getattr(self._warm, "ready", False)):
+            delay += self.cold_start
+            self._warm.ready = True
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise LLMTimeoutError(f"fake backend timed out after {timeout}s")
+        if delay:
+            time.sleep(delay)
+        response = self.response(prompt) if callable(self.response) else self.response
+        for i in range(0, len(response), self.chunk_chars):
+            if i and self.chunk_delay:
+                if timeout is not None and time.monotonic() - started + self.chunk_delay > timeout:
+                    raise LLMTimeoutError(f"fake backend timed out after {timeout}s")
+                time.sleep(self.chunk_delay)
+            yield response[i:i + self.chunk_chars]
+
+
+class LLMPool:
+    """
+    Bounded worker pool in front of an LLMBackend.
+    At most `max_concurrency` calls are in flight; each call is bounded by a
+    per-call timeout (falling back to the pool default). Every call is counted
+    once: as completed, failed or timed out by its worker, or as timed out if the
+    caller gave up while it was still queued.
+    """
+    def __init__(self, backend: LLMBackend, max_concurrency: int = 8, timeout: float = 60.0):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-worker")
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "in_flight": 0}
+        watch_queue(f"llm_pool:{backend.name}", self, lambda pool: pool._stats["in_flight"])
+
+    def submit(self, prompt: str, timeout: Optional[float] = None) -> Future:
+        timeout = self.timeout if timeout is None else timeout
+        return self._submit(self._run, prompt, timeout)
+
+    def _submit(self, fn, *args) -> Future:
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["in_flight"] += 1
+        future = self._executor.submit(fn, *args)
+        # Also runs for calls cancelled before a worker picked them up
+        future.add_done_callback(self._call_done)
+        return future
+
+    def _call_done(self, future: Future):
+        with self._lock:
+            self._stats["in_flight"] -= 1
+            if future.cancelled():
+                self._stats["timeouts"] += 1
+
+    def complete(self, prompt: str, timeout: Optional[float] = None) -> str:
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(prompt, timeout)
+        try:
+            # Allow for queueing time behind other calls before giving up.
+            return future.result(timeout=timeout * 2 if timeout else None)
+        except FutureTimeoutError as e:
+            # Counted by _call_done if still queued, else by the worker when its call ends
+            future.cancel()
+            raise LLMTimeoutError(f"LLM call timed out after {timeout}s") from e
+
+    def stream(self, prompt: str, on_chunk: Callable[[str], bool], timeout: Optional[float] = None) -> str:
+        """
+        Stream the response to `on_chunk`, stopping generation as soon as it
+        returns True. Exceptions from `on_chunk` abort the call and propagate.
+        Returns the text received.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        future = self._submit(self._run_stream, prompt, on_chunk, timeout)
+        try:
+            return future.result(timeout=timeout * 2 if timeout else None)
+        except FutureTimeoutError as e:
+            future.cancel()
+            raise LLMTimeoutError(f"LLM call timed out after {timeout}s") from e
+
+    async def acomplete(self, prompt: str, timeout: Optional[float] = None) -> str:
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(prompt, timeout)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout * 2 if timeout else None)
+        except asyncio.TimeoutError as e:
+            # wait_for cancels the wrapped future; counted like complete()
+            raise LLMTimeoutError(f"LLM call timed out after {timeout}s") from e
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, max_concurrency=self.max_concurrency)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.backend.close()
+
+    def _run(self, prompt: str, timeout: Optional[float]) -> str:
+        backend = self.backend.name
+        started = time.perf_counter()
+        LLM_TOKENS.inc(estimate_tokens(prompt), backend=backend, kind="prompt")
+        try:
+            response = self.backend.complete(prompt, timeout=timeout)
+        except LLMTimeoutError:
+            self._record("timeouts")
+            LLM_DURATION.observe(time.perf_counter() - started, backend=backend, outcome="timeout")
+            raise
+        except Exception:
+            self._record("failed")
+            LLM_DURATION.observe(time.perf_counter() - started, backend=backend, outcome="error")
+            raise
+        self._record("completed")
+        LLM_DURATION.observe(time.perf_counter() - started, backend=backend, outcome="ok")
+        LLM_TOKENS.inc(estimate_tokens(response), backend=backend, kind="completion")
+        return response
+
+    def _run_stream(self, prompt: str, on_chunk: Callable[[str], bool], timeout: Optional[float]) -> str:
+        backend = self.backend.name
+        started = time.perf_counter()
+        LLM_TOKENS.inc(estimate_tokens(prompt), backend=backend, kind="prompt")
+        received = []
+        outcome = "ok"
+        chunks = self.backend.stream(prompt, timeout=timeout)
+        try:
+            for chunk in chunks:
+                received.append(chunk)
+                if on_chunk(chunk):
+                    outcome = "early_stop"
+                    break
+        except LLMTimeoutError:
+            self._record("timeouts")
+            outcome = "timeout"
+            raise
+        except Exception:
+            self._record("failed")
+            outcome = "error"
+            raise
+        finally:
+            chunks.close()
+            LLM_DURATION.observe(time.perf_counter() - started, backend=backend, outcome=outcome)
+            LLM_TOKENS.inc(estimate_tokens("".join(received)), backend=backend, kind="completion")
+        self._record("completed")
+        return "".join(received)
+
+    def _record(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+
+def build_backend(kind: Optional[str] = None, gemini_cmd: str = "gemini") -> LLMBackend:
+    # The in-process API client is the default once it has credentials; without a key,
+    # the CLI (which brings its own auth) keeps working as before.
+    kind = kind or os.getenv("LLM_BACKEND") or ("gemini_api" if os.getenv("GEMINI_API_KEY") else "gemini_cli")
+    if kind == "gemini_cli":
+        return GeminiCLIBackend(gemini_cmd=os.getenv("GEMINI_CMD", gemini_cmd))
+    if kind == "gemini_api":
+        return GeminiAPIBackend(model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"))
+    if kind == "fake":
+        return FakeLLMBackend(latency=float(os.getenv("LLM_FAKE_LATENCY", "0")))
+    raise ValueError(f"Unknown LLM backend: {kind}")
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> LLMPool:
+    """Process-wide LLMPool shared by all co-located agents, configured from the environment."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = LLMPool(
+                build_backend(),
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+                timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "60")),
+            )
+            logging.getLogger("llm").info(
+                f"LLM pool started: backend={_default_pool.backend.name} "
+                f"max_concurrency={_default_pool.max_concurrency}"
+            )
+        return _default_pool
@@ -0,0 +1,416 @@
+"""
+In-process metrics and optional tracing for the agents.
+
+Counters, gauges and histograms with labels live in a process-wide registry
+and are exported in the Prometheus text format on /metrics (served by
+src/runtime.py and src/app.py). Point-in-time values owned by other components
+(cache hit rates, queue depths, LLM calls in flight) are read by collectors at
+scrape time, so the hot path only pays for its own counters. Each watched
+instance gets its own series (a second cache or queue with a taken name is
+exported as "name#2", ...) and is unregistered once it is garbage collected.
+
+`@observed` wraps an agent method with a latency histogram, call and in-flight
+metrics and, when opentelemetry-api is installed, a span. The trace context is
+carried between agents inside the MCP envelope under payload["trace"], so
+spans of remote hops join the same trace.
+"""
+import bisect
+import functools
+import inspect
+import threading
+import time
+import uuid
+import weakref
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.trace import NonRecordingSpan, SpanContext, TraceFlags
+except ImportError:  # tracing is optional
+    otel_trace = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (metric name, type, help, labels, value) produced by collectors at scrape time
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+
+def _label_key(labelnames: Tuple[str, ...], labels: Dict[str, Any]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def total(self, **labels) -> float:
+        """Sum over every series matching the given labels (e.g. all methods of one agent)."""
+        positions = [(self.labelnames.index(name), str(value)) for name, value in labels.items()]
+        with self._lock:
+            return sum(v for k, v in self._values.items() if all(k[i] == value for i, value in positions))
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(self.labelnames, labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None without observations)."""
+        with self._lock:
+            state = self._values.get(_label_key(self.labelnames, labels))
+            if not state or not state[2]:
+                return None
+            counts, total = list(state[0]), state[2]
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            if running >= q * total:
+                return bound
+        return float("inf")
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(s[0]), s[1], s[2]) for k, s in self._values.items()]
+        lines = self.header()
+        for key, counts, total, count in items:
+            running = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                running += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[Sample]]] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help_text: str, labelnames, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, help_text, tuple(labelnames), **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def register_collector(self, key: str, collect: Callable[[], Iterable[Sample]]):
+        """Register (or replace, by key) a callback producing samples at scrape time."""
+        with self._lock:
+            self._collectors[key] = collect
+
+    def unregister_collector(self, key: str):
+        with self._lock:
+            self._collectors.pop(key, None)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        grouped: Dict[str, Tuple[str, str, List[str]]] = {}
+        for collect in collectors:
+            try:
+                samples = list(collect())
+            except Exception:
+                continue
+            for name, kind, help_text, labels, value in samples:
+                entry = grouped.setdefault(name, (kind, help_text, []))
+                entry[2].append(f"{name}{_format_labels(labels.keys(), labels.values())} {value}")
+        for name, (kind, help_text, sample_lines) in grouped.items():
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"] + sample_lines)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+METHOD_DURATION = REGISTRY.histogram(
+    "agent_method_duration_seconds", "Latency of agent methods", ("agent", "method", "outcome"))
+METHOD_IN_FLIGHT = REGISTRY.gauge("agent_method_in_flight", "Agent method calls in progress", ("agent", "method"))
+LLM_DURATION = REGISTRY.histogram(
+    "llm_request_duration_seconds", "Latency of LLM backend calls", ("backend", "outcome"))
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "LLM tokens (estimated at ~4 chars/token)", ("backend", "kind"))
+PIPELINE_STAGE_DURATION = REGISTRY.histogram(
+    "pipeline_stage_duration_seconds", "Incident pipeline stage latency", ("stage", "status"))
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4) if text else 0
+
+
+_watched = set()
+_watched_lock = threading.Lock()
+
+
+def _watch(kind: str, name: str, owner, collect: Callable[[Any, str], List[Sample]]) -> str:
+    """
+    Register `collect(owner, label)` for as long as `owner` lives, under a label
+    unique among live instances of `kind`; returns the label.
+    """
+    with _watched_lock:
+        label, n = name, 1
+        while (kind, label) in _watched:
+            n += 1
+            label = f"{name}#{n}"
+        _watched.add((kind, label))
+    owner_ref = weakref.ref(owner)
+    key = f"{kind}:{label}"
+
+    def collector():
+        target = owner_ref()
+        return [] if target is None else collect(target, label)
+
+    REGISTRY.register_collector(key, collector)
+    weakref.finalize(owner, _unwatch, kind, label)
+    return label
+
+
+def _unwatch(kind: str, label: str):
+    REGISTRY.unregister_collector(f"{kind}:{label}")
+    with _watched_lock:
+        _watched.discard((kind, label))
+
+
+def watch_cache(name: str, cache) -> str:
+    """Export a cache's stats() (hits, misses, hit_rate, entries) at scrape time."""
+    def collect(cache, label):
+        stats = cache.stats()
+        labels = {"cache": label}
+        return [
+            ("cache_hits_total", "counter", "Cache hits", labels, stats.get("hits", 0)),
+            ("cache_misses_total", "counter", "Cache misses", labels, stats.get("misses", 0)),
+            ("cache_hit_ratio", "gauge", "Cache hit ratio since start", labels, stats.get("hit_rate", 0.0)),
+            ("cache_entries", "gauge", "Entries held by the cache", labels, stats.get("entries", 0)),
+        ]
+    return _watch("cache", name, cache, collect)
+
+
+def watch_queue(name: str, owner, depth: Callable[[Any], float],
+                dropped: Optional[Callable[[Any], float]] = None) -> str:
+    """
+    Export the current depth (and optionally the drop counter) of a queue held by
+    `owner` at scrape time; `depth`/`dropped` are called with the owner, so the
+    registry does not keep it alive.
+    """
+    def collect(owner, label):
+        labels = {"queue": label}
+        samples = [("queue_depth", "gauge", "Items waiting in an in-process queue", labels, depth(owner))]
+        if dropped is not None:
+            samples.append(("queue_dropped_total", "counter", "Items dropped by an in-process queue", labels,
+                            dropped(owner)))
+        return samples
+    return _watch("queue", name, owner, collect)
+
+
+class _Activity:
+    __slots__ = ("calls", "errors", "error_ewma", "last_call", "last_error")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.error_ewma = 0.0
+        self.last_call = None
+        self.last_error = None
+
+
+_activity: Dict[str, _Activity] = {}
+_activity_lock = threading.Lock()
+
+
+def _record_activity(agent: str, failed: bool):
+    now = time.time()
+    with _activity_lock:
+        activity = _activity.get(agent)
+        if activity is None:
+            activity = _activity[agent] = _Activity()
+        activity.calls += 1
+        activity.last_call = now
+        activity.error_ewma = 0.9 * activity.error_ewma + (0.1 if failed else 0.0)
+        if failed:
+            activity.errors += 1
+            activity.last_error = now
+
+
+def agent_status(agent: str, idle_after_seconds: float = 300.0, degraded_error_ratio: float = 0.25) -> Dict[str, Any]:
+    """
+    Live status from this process's metrics: "unknown" (never called here),
+    "active", "degraded" (recent error ratio above threshold) or "idle".
+    """
+    with _activity_lock:
+        activity = _activity.get(agent)
+        if activity is None:
+            return {"status": "unknown"}
+        snapshot = {
+            "calls": activity.calls,
+            "errors": activity.errors,
+            "recent_error_ratio": round(activity.error_ewma, 3),
+            "last_call_at": activity.last_call,
+            "last_error_at": activity.last_error,
+        }
+    if activity.error_ewma >= degraded_error_ratio:
+        status = "degraded"
+    elif time.time() - snapshot["last_call_at"] > idle_after_seconds:
+        status = "idle"
+    else:
+        status = "active"
+    in_flight = METHOD_IN_FLIGHT.total(agent=agent)
+    return dict(snapshot, status=status, in_flight=in_flight)
+
+
+def new_trace_context() -> Dict[str, str]:
+    """The current OpenTelemetry span's ids, or fresh ids when tracing is off."""
+    if otel_trace is not None:
+        context = otel_trace.get_current_span().get_span_context()
+        if context.is_valid:
+            return {"trace_id": format(context.trace_id, "032x"), "span_id": format(context.span_id, "016x")}
+    return {"trace_id": uuid.uuid4().hex, "span_id": uuid.uuid4().hex[:16]}
+
+
+def trace_context_of(value) -> Optional[Dict[str, str]]:
+    """Trace context carried by an MCP envelope (model or dict), if any."""
+    payload = getattr(value, "payload", None)
+    if payload is None and isinstance(value, dict):
+        payload = value.get("payload")
+    trace = payload.get("trace") if isinstance(payload, dict) else None
+    return trace if isinstance(trace, dict) and trace.get("trace_id") else None
+
+
+def _parent_context(args, kwargs):
+    if otel_trace is None:
+        return None
+    for value in list(args) + list(kwargs.values()):
+        trace = trace_context_of(value)
+        if trace:
+            try:
+                span_context = SpanContext(trace_id=int(trace["trace_id"], 16), span_id=int(trace["span_id"], 16),
+                                           is_remote=True, trace_flags=TraceFlags(TraceFlags.SAMPLED))
+            except (KeyError, ValueError):
+                return None
+            return otel_trace.set_span_in_context(NonRecordingSpan(span_context))
+    return None
+
+
+_agent_ids: Dict[type, str] = {}
+
+
+def _agent_id(agent) -> str:
+    cls = type(agent)
+    if cls not in _agent_ids:
+        try:
+            _agent_ids[cls] = cls.get_agent_card()["id"]
+        except Exception:
+            _agent_ids[cls] = cls.__name__
+    return _agent_ids[cls]
+
+
+def observed(method: Optional[str] = None):
+    """
+    Instrument an agent method: latency histogram by outcome, in-flight gauge,
+    live-status activity and, with OpenTelemetry installed, a span parented to
+    the trace carried in an MCP envelope argument. `method` overrides the metric
+    label (e.g. ReasoningAgent.propose reports as "reason").
+    """
+    def decorate(fn):
+        name = method or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            agent = _agent_id(self)
+            METHOD_IN_FLIGHT.inc(agent=agent, method=name)
+            started = time.perf_counter()
+            outcome = "ok"
+            try:
+                if otel_trace is not None:
+                    tracer = otel_trace.get_tracer("x-sre-agents")
+                    with tracer.start_as_current_span(f"{agent}.{name}", context=_parent_context(args, kwargs)):
+                        return fn(self, *args, **kwargs)
+                return fn(self, *args, **kwargs)
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                METHOD_IN_FLIGHT.dec(agent=agent, method=name)
+                METHOD_DURATION.observe(time.perf_counter() - started, agent=agent, method=name, outcome=outcome)
+                _record_activity(agent, outcome == "error")
+
+        wrapper.__signature__ = inspect.signature(fn)
+        return wrapper
+    return decorate
@@ -0,0 +1,307 @@
+"""
+Durable, rate-limited outbound queue for Slack webhook delivery.
+
+Messages are appended to a local JSONL journal before being acknowledged, so
+undelivered messages survive a restart. A background thread coalesces queued
+messages per (channel, incident) into digest posts, paces them with a token
+bucket and backs off on HTTP 429 for the duration given by `Retry-After`.
+
+A group whose coalescing window is still open does not hold up groups behind it,
+and a failed group is retried after the others. Messages that still fail after
+`max_attempts` deliveries (429s do not count) are moved to a dead-letter JSONL
+file (`<journal>.dead`). The journal is compacted every `compact_every` records.
+By default each webhook gets its own journal; an instance holds an exclusive
+lock on it, and a second instance for the same webhook uses "-2", "-3", ...
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.metrics import watch_queue
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` posts per second with bursts up to `capacity`."""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, stop: Optional[threading.Event] = None) -> bool:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            if stop is not None and stop.wait(wait):
+                return False
+            if stop is None:
+                time.sleep(wait)
+
+    def block_for(self, seconds: float):
+        """Pause all sends, e.g. for a server-provided Retry-After."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class SlackOutbox:
+    def __init__(self, webhook_url: str, journal_path: Optional[str] = None, logger=None,
+                 rate_per_second: float = 1.0, burst: int = 3, coalesce_window: float = 2.0,
+                 max_digest_messages: int = 20, timeout: float = 5.0, max_attempts: int = 5,
+                 compact_every: int = 1000):
+        self.webhook_url = webhook_url
+        self.logger = logger or logging.getLogger("slack-outbox")
+        webhook_id = hashlib.sha256(webhook_url.encode()).hexdigest()[:12]
+        self.journal_path, self._lock_file = self._claim_journal(
+            journal_path or os.getenv("SLACK_OUTBOX_PATH", f"/tmp/x-sre-agents/slack_outbox-{webhook_id}.jsonl"))
+        self.dead_letter_path = f"{self.journal_path}.dead"
+        self.max_attempts = max_attempts
+        self.compact_every = compact_every
+        self.coalesce_window = coalesce_window
+        self.max_digest_messages = max_digest_messages
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.stats = {"enqueued": 0, "posted": 0, "digests": 0, "rate_limited": 0, "failed": 0, "dropped": 0,
+                      "dead_lettered": 0}
+        # (channel, incident_id) -> list of pending entries, in arrival order
+        self._pending: "OrderedDict[Tuple[str, str], List[Dict[str, Any]]]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._journal_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._journal_records = 0
+        self._recover()
+        watch_queue("slack_outbox", self, lambda outbox: outbox.pending(), lambda outbox: outbox.stats["dropped"])
+        self._thread = threading.Thread(target=self._run, name="slack-outbox", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, text: str, incident_id: Optional[str] = None, channel: str = "default") -> str:
+        """Persist and queue a message; returns its id immediately."""
+        entry = {"id": uuid.uuid4().hex, "text": text, "incident_id": incident_id or "",
+                 "channel": channel, "queued_at": time.time(), "attempts": 0}
+        with self._cond:
+            self._journal({"op": "add", **entry})
+            self._add(entry)
+            self.stats["enqueued"] += 1
+        return entry["id"]
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(len(v) for v in self._pending.values())
+
+    def close(self, timeout: float = 10.0):
+        """Stop the sender; undelivered messages stay in the journal for the next start."""
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify()
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._lock_file.close()  # releases the journal for the next instance
+
+    def _claim_journal(self, path: str):
+        """Lock `path` for this instance, or the first free "-2", "-3", ... variant of it."""
+        root, ext = os.path.splitext(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        for n in range(1, 100):
+            candidate = path if n == 1 else f"{root}-{n}{ext}"
+            lock_file = open(f"{candidate}.lock", "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            if n > 1:
+                self.logger.warning(f"Slack outbox journal {path} is in use, using {candidate}")
+            return candidate, lock_file
+        raise RuntimeError(f"No free Slack outbox journal next to {path}")
+
+    def _add(self, entry: Dict[str, Any]):
+        with self._cond:
+            self._pending.setdefault((entry["channel"], entry["incident_id"]), []).append(entry)
+            self._cond.notify()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            group = self._next_group()
+            if group is None:
+                continue
+            key, entries = group
+            if not self.bucket.acquire(self._stopped):
+                self._requeue(key, entries)
+                return
+            delivered = self._post(entries)
+            if delivered is None:
+                self._requeue(key, entries)  # rate limited; not an attempt
+            elif delivered:
+                self._finish(entries)
+            else:
+                self._failed(key, entries)
+
+    def _finish(self, entries: List[Dict[str, Any]]):
+        # Only this thread takes entries out of _pending, so the journal can be rewritten from it here
+        with self._cond:
+            if not self._pending:
+                self._rewrite_journal([])
+            elif self._journal_records >= self.compact_every:
+                self._rewrite_journal([e for group in self._pending.values() for e in group])
+            else:
+                self._journal({"op": "done", "ids": [e["id"] for e in entries]})
+
+    def _failed(self, key, entries: List[Dict[str, Any]]):
+        for entry in entries:
+            entry["attempts"] = entry.get("attempts", 0) + 1
+        if entries[0]["attempts"] < self.max_attempts:
+            entries[0]["retry_at"] = time.time() + min(60.0, 2.0 ** entries[0]["attempts"])
+            with self._cond:
+                self._journal({"op": "failed", "ids": [e["id"] for e in entries]})
+                # Behind the other groups, so one failing message does not stall them
+                self._pending[key] = entries + self._pending.get(key, [])
+                self._pending.move_to_end(key)
+            return
+        try:
+            with self._journal_lock, open(self.dead_letter_path, "a") as f:
+                for entry in entries:
+                    f.write(json.dumps(dict(entry, dead_lettered_at=time.time())) + "\n")
+        except OSError as e:
+            self.logger.error(f"Slack outbox dead-letter write failed, dropping {len(entries)} messages: {e}")
+        self.stats["dead_lettered"] += len(entries)
+        self.logger.error(f"Slack delivery failed {self.max_attempts} times, moved {len(entries)} messages "
+                          f"to {self.dead_letter_path}")
+        self._finish(entries)
+
+    def _next_group(self) -> Optional[Tuple[Tuple[str, str], List[Dict[str, Any]]]]:
+        with self._cond:
+            while not self._pending and not self._stopped.is_set():
+                self._cond.wait()
+            if not self._pending:
+                return None
+            # The first group that is due. Messages for the same incident accumulate
+            # briefly into one digest, and failed groups back off, without holding up
+            # other groups meanwhile.
+            now, next_due = time.time(), None
+            for key, entries in self._pending.items():
+                if entries[0].get("attempts"):
+                    due = entries[0].get("retry_at", 0)
+                else:
+                    due = entries[0]["queued_at"] + self.coalesce_window
+                    if len(entries) >= self.max_digest_messages:
+                        due = now
+                if due <= now:
+                    break
+                next_due = due if next_due is None else min(next_due, due)
+            else:
+                self._cond.wait(next_due - now)
+                return None
+            batch, rest = entries[:self.max_digest_messages], entries[self.max_digest_messages:]
+            if rest:
+                self._pending[key] = rest
+            else:
+                del self._pending[key]
+            return key, batch
+
+    def _requeue(self, key, entries):
+        with self._cond:
+            self._pending[key] = entries + self._pending.get(key, [])
+            self._pending.move_to_end(key, last=False)
+
+    def _post(self, entries: List[Dict[str, Any]]) -> Optional[bool]:
+        """
+        Returns True when the entries are finished with, False when delivery failed
+        and None when rate limited; both of the latter are retried.
+        """
+        if len(entries) == 1:
+            text = entries[0]["text"]
+        else:
+            header = f"*{len(entries)} updates for incident {entries[0]['incident_id'] or 'N/A'}*"
+            text = "\n\n".join([header] + [e["text"] for e in entries])
+        try:
+            response = self.session.post(self.webhook_url, json={"text": text}, timeout=self.timeout)
+            if response.status_code == 429:
+                retry_after = float(response.headers.get("Retry-After", 1))
+                self.bucket.block_for(retry_after)
+                self.stats["rate_limited"] += 1
+                self.logger.warning(f"Slack rate limited, retrying after {retry_after}s")
+                return None
+            if 400 <= response.status_code < 500:
+                # Not retryable (bad webhook, payload rejected): drop rather than block the queue.
+                self.stats["dropped"] += len(entries)
+                self.logger.error(f"Slack rejected {len(entries)} messages: {response.status_code} {response.text}")
+                return True
+            response.raise_for_status()
+        except Exception as e:
+            self.stats["failed"] += 1
+            self.bucket.block_for(1.0)
+            self.logger.error(f"Slack delivery failed, will retry: {e}")
+            return False
+        self.stats["posted"] += len(entries)
+        if len(entries) > 1:
+            self.stats["digests"] += 1
+        return True
+
+    def _journal(self, record: Dict[str, Any]):
+        try:
+            with self._journal_lock:
+                os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+                with open(self.journal_path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+                self._journal_records += 1
+        except OSError as e:
+            self.logger.error(f"Slack outbox journal write failed: {e}")
+
+    def _rewrite_journal(self, entries: List[Dict[str, Any]]):
+        """Replace the journal with just `entries`, the messages still undelivered."""
+        try:
+            with self._journal_lock:
+                tmp_path = f"{self.journal_path}.tmp"
+                with open(tmp_path, "w") as f:
+                    for entry in entries:
+                        f.write(json.dumps({"op": "add", **entry}) + "\n")
+                os.replace(tmp_path, self.journal_path)
+                self._journal_records = len(entries)
+        except OSError as e:
+            self.logger.error(f"Slack outbox journal compaction failed: {e}")
+
+    def _recover(self):
+        """Re-queue messages journaled but not delivered, then compact the journal."""
+        if not os.path.exists(self.journal_path):
+            return
+        entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        with open(self.journal_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("op") == "add":
+                    entries[record["id"]] = {k: v for k, v in record.items() if k != "op"}
+                elif record.get("op") == "done":
+                    for entry_id in record["ids"]:
+                        entries.pop(entry_id, None)
+                elif record.get("op") == "failed":
+                    for entry_id in record["ids"]:
+                        if entry_id in entries:
+                            entries[entry_id]["attempts"] = entries[entry_id].get("attempts", 0) + 1
+        self._rewrite_journal(list(entries.values()))
+        for entry in entries.values():
+            self._add(entry)
+        if entries:
+            self.logger.info(f"Recovered {len(entries)} undelivered Slack messages")
@@ -0,0 +1,303 @@
+"""
+DAG-based incident pipeline built around the agents.
+
+Stages declare their dependencies and run on one asyncio event loop as soon as
+those dependencies finish; blocking agent calls are moved to worker threads.
+A pipeline-wide deadline bounds every stage's timeout and is handed on to the
+agents: remote calls time out at it, the envelope carries it as
+payload["deadline_at"] (the ReasoningAgent caps its LLM calls by it) and the
+validator is given what is left. Per-stage timings go to the
+pipeline_stage_duration_seconds histogram and, once the incident has run, into
+the envelope under payload["timings"]; the OrchestratorAgent re-signs it and
+persists the timings next to the envelope row, keyed by envelope_id.
+
+Agents are called through an AgentRegistry: co-located agents exchange
+validated Signal/Context/MCPEnvelope/ActionProposal models directly, while
+agents given by id may be remote and are reached over JSON-RPC.
+
+Default incident flow:
+
+    classify ──┬── ground ───────┐
+               ├── personalize ──┼── reason ── policy ──┬── execute ── validate ──┬── remember
+               └── envelope ─────┘                      └──────────────────────────┴── notify
+
+`remember` reports each executed proposal and its validation outcome back to the
+ReasoningAgent's past-incident memory, so validated remediations can be reused.
+It is skipped when validation did not verify anything (it failed, or the
+validator has no checks configured and reports "healthy": None).
+"""
+import asyncio
+import inspect
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from src.metrics import PIPELINE_STAGE_DURATION
+from src.registry import AgentRegistry, get_default_registry
+from src.schemas import ActionProposal, Context, MCPEnvelope, Signal, as_model, thaw, to_wire
+
+# Stage statuses
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+TIMEOUT = "timeout"
+UPSTREAM_FAILED = "upstream_failed"
+
+
+class Stage:
+    """
+    A pipeline step. `fn` receives a dict of the pipeline inputs plus the results
+    of every completed stage so far, and may be sync or async. When `when` returns
+    False the stage is skipped (dependents still run). Stages with `run_on_failure`
+    run even when a dependency failed or the deadline passed (e.g. escalation
+    notifications), bounded only by their own timeout.
+    """
+    def __init__(self, name: str, fn: Callable[[Dict[str, Any]], Any], deps: Iterable[str] = (),
+                 timeout: Optional[float] = None, when: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                 run_on_failure: bool = False):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.when = when
+        self.run_on_failure = run_on_failure
+
+
+class PipelineResult:
+    def __init__(self, results: Dict[str, Any], timings: Dict[str, Dict[str, Any]], total_ms: float):
+        self.results = results
+        self.timings = timings
+        self.total_ms = total_ms
+
+    @property
+    def success(self) -> bool:
+        return all(t["status"] in (OK, SKIPPED) for t in self.timings.values())
+
+    def dict(self) -> Dict[str, Any]:
+        return {"results": self.results, "timings": self.timings, "total_ms": self.total_ms, "success": self.success}
+
+
+class DAGPipeline:
+    """Runs independent stages concurrently in dependency order."""
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [d for d in stage.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {missing}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a cycle through stage {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    async def run(self, inputs: Dict[str, Any], deadline_seconds: Optional[float] = None) -> PipelineResult:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + deadline_seconds if deadline_seconds else None
+        results: Dict[str, Any] = dict(inputs)
+        # Wall-clock deadline visible to stage functions, so they can pass it on downstream.
+        results["deadline_at"] = time.time() + deadline_seconds if deadline_seconds else None
+        timings: Dict[str, Dict[str, Any]] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage) -> str:
+            dep_statuses = await asyncio.gather(*(tasks[d] for d in stage.deps))
+            stage_start = loop.time()
+            timing = {"start_ms": round((stage_start - started) * 1000, 2)}
+            timings[stage.name] = timing
+            if not stage.run_on_failure and any(s not in (OK, SKIPPED) for s in dep_statuses):
+                status = UPSTREAM_FAILED
+            elif stage.when is not None and not stage.when(results):
+                status = SKIPPED
+            else:
+                status = await self._call(stage, results, deadline, loop)
+            elapsed = loop.time() - stage_start
+            timing["duration_ms"] = round(elapsed * 1000, 2)
+            timing["status"] = status
+            PIPELINE_STAGE_DURATION.observe(elapsed, stage=stage.name, status=status)
+            if status not in (OK, SKIPPED):
+                results.setdefault(stage.name, None)
+            return status
+
+        for name in self.order:
+            tasks[name] = asyncio.ensure_future(run_stage(self.stages[name]))
+        await asyncio.gather(*tasks.values())
+        return PipelineResult(
+            {name: results.get(name) for name in self.order},
+            timings,
+            round((loop.time() - started) * 1000, 2),
+        )
+
+    @staticmethod
+    async def _call(stage: Stage, results: Dict[str, Any], deadline: Optional[float], loop) -> str:
+        timeout = stage.timeout
+        if deadline is not None and not stage.run_on_failure:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                results[stage.name] = {"error": "pipeline deadline exceeded"}
+                return TIMEOUT
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        if inspect.iscoroutinefunction(stage.fn):
+            call = stage.fn(results)
+        else:
+            call = asyncio.to_thread(stage.fn, results)
+        try:
+            results[stage.name] = await asyncio.wait_for(call, timeout)
+            return OK
+        except asyncio.TimeoutError:
+            results[stage.name] = {"error": f"stage timed out after {timeout:.3f}s"}
+            return TIMEOUT
+        except Exception as e:
+            results[stage.name] = {"error": str(e)}
+            return FAILED
+
+
+def proposal_to_action(action_proposal) -> Dict[str, Any]:
+    """Map a ReasoningAgent ActionProposal (model or dict) onto an ExecutorAgent action dict."""
+    if isinstance(action_proposal, ActionProposal):
+        action, metadata = action_proposal.action, action_proposal.metadata or {}
+    else:
+        action, metadata = action_proposal.get("action"), action_proposal.get("metadata") or {}
+    # Proposal fields are read-only; handlers get their own copy of the params
+    return {"type": action, "params": thaw(metadata.get("params", {}))}
+
+
+class IncidentPipeline:
+    """
+    The incident flow as a DAG over in-process agent instances. Grounding,
+    personalization and envelope creation all start as soon as classification
+    finishes; personalization therefore runs without grounding snippets.
+
+    Each agent is an instance (registered as co-located) or the id of an agent in
+    `registry`, which defaults to the process-wide one.
+    """
+    def __init__(self, classifier, grounding, personalization, orchestrator, reasoning,
+                 policy, executor, validator, notification, stage_timeouts: Optional[Dict[str, float]] = None,
+                 registry: Optional[AgentRegistry] = None):
+        timeouts = stage_timeouts or {}
+        self.registry = registry or get_default_registry()
+        ids = {name: self.registry.resolve(agent) for name, agent in {
+            "classifier": classifier, "grounding": grounding, "personalization": personalization,
+            "orchestrator": orchestrator, "reasoning": reasoning, "policy": policy, "executor": executor,
+            "validator": validator, "notification": notification,
+        }.items()}
+        self.orchestrator_id = ids["orchestrator"]
+
+        def call(r, agent, method, *args, **kwargs):
+            return self.registry.call(ids[agent], method, *args, deadline_at=r["deadline_at"], **kwargs)
+
+        admitted = lambda r: bool(isinstance(r.get("policy"), dict) and r["policy"].get("admit"))
+
+        def verified(r):
+            # "success" only means the checks ran; "healthy" is None when there were none
+            validation = r.get("validate")
+            return bool(isinstance(validation, dict) and validation.get("success")
+                        and validation.get("healthy") is not None)
+
+        def remediated(r):
+            return verified(r) and r["validate"]["healthy"] is True
+
+        def classify(r):
+            query_class, meta = call(r, "classifier", "classify", r["signal_model"], r["context_model"])
+            return {"query_class": query_class, **meta}
+
+        def envelope(r):
+            return call(r, "orchestrator", "orchestrate", {
+                "agent": "incident-pipeline",
+                "payload": {
+                    "signal": r["signal"],
+                    "context": r["context"],
+                    "query_class": r["classify"]["query_class"],
+                    "deadline_at": r["deadline_at"],
+                },
+            }, returns=MCPEnvelope)
+
+        def reason(r):
+            return call(r, "reasoning", "reason", r["envelope"], r["ground"] or [], r["personalize"] or [],
+                        returns=ActionProposal)
+
+        def execute(r):
+            return call(r, "executor", "execute", proposal_to_action(r["reason"]))
+
+        def validate(r):
+            if r["deadline_at"] is None:
+                return call(r, "validator", "validate", incident=r["context"])
+            return call(r, "validator", "validate", incident=r["context"],
+                        deadline_seconds=max(r["deadline_at"] - time.time(), 0))
+
+        def remember(r):
+            return call(r, "reasoning", "record_outcome", r["envelope"], r["reason"], remediated(r))
+
+        def notify(r):
+            incident = dict(r["signal"], **r["context"])
+            proposal = to_wire(r.get("reason") or {})
+            if admitted(r):
+                if remediated(r):
+                    outcome = "succeeded"
+                elif verified(r):
+                    outcome = "needs attention"
+                else:
+                    outcome = "ran but could not be verified"
+                return call(r, "notification", "notify", incident,
+                            f"Auto-remediation '{proposal.get('action')}' {outcome}")
+            return call(r, "notification", "notify_with_solution", incident, proposal, r.get("policy") or {})
+
+        self.dag = DAGPipeline([
+            Stage("classify", classify, timeout=timeouts.get("classify")),
+            Stage("ground", lambda r: call(r, "grounding", "ground", r["signal"], r["classify"]["query_class"]),
+                  deps=["classify"], timeout=timeouts.get("ground")),
+            Stage("personalize", lambda r: call(r, "personalization", "personalize", r["context"], []),
+                  deps=["classify"], timeout=timeouts.get("personalize")),
+            Stage("envelope", envelope, deps=["classify"], timeout=timeouts.get("envelope")),
+            Stage("reason", reason, deps=["envelope", "ground", "personalize"], timeout=timeouts.get("reason")),
+            Stage("policy", lambda r: call(r, "policy", "policy_check", r["reason"]),
+                  deps=["reason"], timeout=timeouts.get("policy")),
+            Stage("execute", execute, deps=["policy"], when=admitted, timeout=timeouts.get("execute")),
+            Stage("validate", validate, deps=["execute"], when=admitted, timeout=timeouts.get("validate")),
+            Stage("remember", remember, deps=["validate"], when=verified, timeout=timeouts.get("remember")),
+            Stage("notify", notify, deps=["policy", "validate"], timeout=timeouts.get("notify"),
+                  run_on_failure=True),
+        ])
+
+    async def run(self, signal, context, deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Run one incident. `signal`/`context` may be dicts or models; they are
+        validated once here. The envelope and proposal results are models.
+        Once every stage has finished, the envelope is finalized with the timings.
+        """
+        inputs = {
+            "signal": to_wire(signal),
+            "context": to_wire(context),
+            "signal_model": as_model(Signal, signal),
+            "context_model": as_model(Context, context),
+        }
+        result = await self.dag.run(inputs, deadline_seconds)
+        envelope = result.results.get("envelope")
+        if not isinstance(envelope, MCPEnvelope):
+            return result.dict()
+        try:
+            result.results["envelope"] = await asyncio.to_thread(
+                self.registry.call, self.orchestrator_id, "finalize", envelope, result.timings,
+                result.total_ms, returns=MCPEnvelope)
+        except Exception as e:
+            # The incident itself has run; only the persisted copy lacks its timings
+            return dict(result.dict(), finalize_error=str(e))
+        return result.dict()
+
+    def run_sync(self, signal, context, deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
+        return asyncio.run(self.run(signal, context, deadline_seconds))
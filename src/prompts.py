@@ -0,0 +1,166 @@
+"""
+Token-budgeted prompt assembly for the ReasoningAgent.
+
+A prompt is a stable prefix (role, instructions and response schema, identical
+for every incident) followed by a per-incident suffix, so backends with
+prompt/prefix caching can reuse the prefix. The suffix always carries the
+incident, its context and query class; grounding snippets and personalization
+examples fill whatever remains of the token budget:
+
+- near-duplicate snippets (mostly the same words) are dropped;
+- snippets are ranked by score and each is capped at `max_snippet_tokens`;
+- the last snippet that only partly fits is truncated, the rest are dropped.
+
+Token counts are estimates (~4 characters per token), see src/metrics.py. Section
+headers and list markers count against the budget, and snippets are counted
+rounded up, so the estimate for the whole prompt stays within `max_tokens`.
+"""
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.metrics import estimate_tokens
+from src.schemas import to_wire
+
+CHARS_PER_TOKEN = 4
+
+REASONING_PREFIX = (
+    "You are an SRE agent.\n\n"
+    "Propose a safe, minimal action for the incident below. Use the relevant docs and\n"
+    "examples where they apply; they are ranked most relevant first.\n\n"
+    "Respond as JSON matching schema:\n"
+    '{ "action": "...", "reason": "...", "confidence": 0-100 }\n\n'
+)
+
+_WORD = re.compile(r"\w+")
+DOCS_HEADER = "Relevant Docs:\n"
+EXAMPLES_HEADER = "Examples:\n"
+
+
+def _tokens_up(text: str) -> int:
+    """Token estimate rounded up, so the costs of a prompt's parts add up to at least the whole's."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class AssembledPrompt:
+    def __init__(self, prefix: str, suffix: str, stats: Dict[str, Any]):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.text = prefix + suffix
+        self.stats = stats
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class PromptAssembler:
+    """
+    Builds reasoning prompts within `max_tokens`. `examples_share` of the budget
+    left after the fixed sections is reserved for personalization examples;
+    whatever either side leaves unused goes to the other.
+    """
+    def __init__(self, max_tokens: int = 2000, max_snippet_tokens: int = 300, min_snippet_tokens: int = 24,
+                 examples_share: float = 0.25, dedup_threshold: float = 0.8, prefix: str = REASONING_PREFIX):
+        self.max_tokens = max_tokens
+        self.max_snippet_tokens = max_snippet_tokens
+        self.min_snippet_tokens = min_snippet_tokens
+        self.examples_share = examples_share
+        self.dedup_threshold = dedup_threshold
+        self.prefix = prefix
+        self.prefix_tokens = estimate_tokens(prefix)
+
+    def assemble(self, signal: Any, context: Any, query_class: str,
+                 grounding_snippets: Optional[list] = None,
+                 personalization_examples: Optional[list] = None) -> AssembledPrompt:
+        started = time.perf_counter()
+        fixed = (
+            f"Incident: {json.dumps(to_wire(signal or {}))}\n\n"
+            f"Context: {json.dumps(to_wire(context or {}))}\n\n"
+            f"Query Class: {query_class or ''}\n\n"
+        )
+        budget = max(self.max_tokens - self.prefix_tokens - estimate_tokens(fixed), 0)
+        docs = self._rank(self._dedup([self._doc_text(s) for s in grounding_snippets or []]))
+        examples = self._dedup([(self._example_text(e), 0.0) for e in personalization_examples or []])
+
+        example_need = sum(min(estimate_tokens(text), self.max_snippet_tokens) for text, _ in examples)
+        doc_budget = budget - min(int(budget * self.examples_share), example_need)
+        doc_lines, doc_used, docs_truncated = self._fill(docs, doc_budget, DOCS_HEADER)
+        example_lines, example_used, examples_truncated = self._fill(examples, budget - doc_used, EXAMPLES_HEADER)
+
+        suffix = fixed
+        if doc_lines:
+            suffix += DOCS_HEADER + "\n".join(f"- {line}" for line in doc_lines) + "\n\n"
+        if example_lines:
+            suffix += EXAMPLES_HEADER + "\n".join(f"- {line}" for line in example_lines) + "\n\n"
+        stats = {
+            "prompt_tokens": self.prefix_tokens + estimate_tokens(suffix),
+            "prefix_tokens": self.prefix_tokens,
+            "budget_tokens": self.max_tokens,
+            "snippets_used": len(doc_lines),
+            "snippets_dropped": len(grounding_snippets or []) - len(doc_lines),
+            "examples_used": len(example_lines),
+            "examples_dropped": len(personalization_examples or []) - len(example_lines),
+            "truncated": docs_truncated + examples_truncated,
+            "assembly_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+        return AssembledPrompt(self.prefix, suffix, stats)
+
+    def _fill(self, items: List[Tuple[str, float]], budget: int, header: str) -> Tuple[List[str], int, int]:
+        # The section costs its header and blank line, plus "- " and a newline per line
+        lines, used, truncated = [], _tokens_up(header + "\n"), 0
+        for text, _ in items:
+            remaining = budget - used - 1
+            if remaining < self.min_snippet_tokens:
+                break
+            limit = min(self.max_snippet_tokens, remaining)
+            if _tokens_up(text) > limit:
+                text = self._truncate(text, limit)
+                truncated += 1
+            lines.append(text)
+            used += _tokens_up(text) + 1
+        return lines, used if lines else 0, truncated
+
+    @staticmethod
+    def _truncate(text: str, tokens: int) -> str:
+        cut = text[:max(tokens * CHARS_PER_TOKEN - 3, 0)]
+        space = cut.rfind(" ")
+        return (cut[:space] if space > len(cut) // 2 else cut).rstrip() + "..."
+
+    @staticmethod
+    def _rank(items: List[Tuple[str, float]]) -> List[Tuple[str, float]]:
+        return sorted(items, key=lambda item: item[1], reverse=True)
+
+    def _dedup(self, items: List[Tuple[str, float]]) -> List[Tuple[str, float]]:
+        """
+        Drop items whose word sets are near-identical (Jaccard similarity at or above
+        dedup_threshold) to a higher-scored (or earlier) item. A short item contained
+        in a longer one is kept, since the union counts the longer item's extra words.
+        """
+        kept: List[Tuple[str, float, frozenset]] = []
+        for text, score in self._rank(items):
+            words = frozenset(_WORD.findall(text.lower()))
+            duplicate = False
+            for _, _, other in kept:
+                union = len(words | other)
+                if not union or len(words & other) / union >= self.dedup_threshold:
+                    duplicate = True
+                    break
+            if not duplicate:
+                kept.append((text, score, words))
+        return [(text, score) for text, score, _ in kept]
+
+    @staticmethod
+    def _doc_text(snippet: Any) -> Tuple[str, float]:
+        if isinstance(snippet, dict):
+            text = snippet.get("snippet") or snippet.get("text") or json.dumps(snippet)
+            doc_id = snippet.get("doc_id")
+            score = snippet.get("score")
+            return (f"[{doc_id}] {text}" if doc_id else text), float(score) if score is not None else 0.0
+        return str(snippet), 0.0
+
+    @staticmethod
+    def _example_text(example: Any) -> str:
+        if isinstance(example, dict):
+            return str(example.get("example") or example.get("text") or json.dumps(example))
+        return str(example)
@@ -0,0 +1,178 @@
+"""
+Agent registry with an in-process fast path for co-located agents.
+
+Agents hosted in this process (by src.runtime, or registered directly) are
+invoked as plain method calls: already-validated Signal/Context/MCPEnvelope/
+ActionProposal instances are handed over as-is, skipping JSON-RPC encoding and
+re-validation on the receiving side. Agents registered by endpoint keep the
+normal JSON-RPC wire path, with models converted to JSON-compatible dicts.
+
+An agent may map an exposed method to a model-returning variant in its
+`local_methods` (e.g. ReasoningAgent maps "reason" to "propose"), so in-process
+callers also get a model back instead of a dict. Remote endpoints can be
+configured as A2A_ENDPOINTS="policy-agent=http://policy:8006/jsonrpc,...".
+`statuses()` reports live agent status: from this process's metrics for
+co-located agents, and from the /agents endpoint of the runtime hosting each
+remote one.
+"""
+import itertools
+import re
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.metrics import agent_status
+from src.schemas import to_wire
+
+
+# Fields agent_status() adds to the cards served on a runtime's /agents
+STATUS_FIELDS = ("status", "calls", "errors", "recent_error_ratio", "last_call_at", "last_error_at", "in_flight")
+
+
+class AgentCallError(Exception):
+    """A remote agent returned a JSON-RPC error."""
+    def __init__(self, agent_id: str, method: str, error: Dict[str, Any]):
+        super().__init__(f"{agent_id}.{method} failed: {error.get('message')} ({error.get('code')})")
+        self.code = error.get("code")
+        self.data = error.get("data")
+
+
+class AgentRegistry:
+    def __init__(self, timeout: float = 30.0, pool_size: int = 20, logger=None):
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger("agent-registry")
+        self.local: Dict[str, Any] = {}
+        self.remote: Dict[str, str] = {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats = {"local_calls": 0, "remote_calls": 0}
+        self._ids = itertools.count(1)
+
+    def register(self, agent, agent_id: Optional[str] = None) -> str:
+        """Register a co-located agent instance; it takes precedence over a remote endpoint."""
+        agent_id = agent_id or agent.get_agent_card()["id"]
+        self.local[agent_id] = agent
+        return agent_id
+
+    def register_remote(self, agent_id: str, endpoint: str):
+        self.remote[agent_id] = endpoint
+
+    def unregister(self, agent_id: str):
+        self.local.pop(agent_id, None)
+        self.remote.pop(agent_id, None)
+
+    def is_local(self, agent_id: str) -> bool:
+        return agent_id in self.local
+
+    def resolve(self, agent) -> str:
+        """Accept an agent instance (registered as local) or an agent id; returns the id."""
+        if isinstance(agent, str):
+            if agent not in self.local and agent not in self.remote:
+                raise KeyError(f"Unknown agent: {agent}")
+            return agent
+        agent_id = agent.get_agent_card()["id"]
+        if self.local.get(agent_id) is not agent:
+            self.register(agent, agent_id)
+        return agent_id
+
+    def call(self, agent_id: str, method: str, *args, returns=None, deadline_at: Optional[float] = None,
+             **kwargs) -> Any:
+        """
+        Invoke `method` on an agent. Co-located agents receive the arguments
+        untouched; remote ones get them over JSON-RPC. When `returns` is a model
+        class, dict results are validated into it so both paths return the same type.
+        `deadline_at` (wall-clock seconds) caps the HTTP timeout of remote calls.
+        """
+        agent = self.local.get(agent_id)
+        if agent is not None:
+            self.stats["local_calls"] += 1
+            fn = getattr(agent, getattr(agent, "local_methods", {}).get(method, method))
+            result = fn(*args, **kwargs)
+        elif agent_id in self.remote:
+            self.stats["remote_calls"] += 1
+            timeout = self.timeout
+            if deadline_at is not None:
+                timeout = max(min(timeout, deadline_at - time.time()), 0.001)
+            result = self._call_remote(agent_id, method, args, kwargs, timeout)
+        else:
+            raise KeyError(f"Unknown agent: {agent_id}")
+        if returns is not None and isinstance(result, dict):
+            result = returns(**result)
+        return result
+
+    def statuses(self, agent_ids: Iterable[str], timeout: float = 2.0) -> Dict[str, Dict[str, Any]]:
+        """
+        Live status per agent id. Each remote runtime is asked once, however many of
+        the agents it hosts; unreachable or unconfigured agents report "unknown".
+        """
+        agent_ids = list(agent_ids)
+        statuses = {agent_id: {"status": "unknown", "reason": "no endpoint configured"} for agent_id in agent_ids}
+        runtimes: Dict[str, list] = {}
+        for agent_id in agent_ids:
+            if agent_id in self.local:
+                statuses[agent_id] = agent_status(agent_id)
+            elif agent_id in self.remote:
+                # http://host:port/jsonrpc or http://host:port/agents/<id>/jsonrpc -> http://host:port
+                base = re.sub(r"(/agents/[^/]+)?/jsonrpc/?$", "", self.remote[agent_id])
+                runtimes.setdefault(base, []).append(agent_id)
+        if not runtimes:
+            return statuses
+
+        def fetch(base):
+            try:
+                response = self.session.get(f"{base}/agents", timeout=timeout)
+                response.raise_for_status()
+                return {card.get("id"): card for card in response.json().get("agents", [])}, None
+            except Exception as e:
+                return {}, str(e)
+
+        with ThreadPoolExecutor(max_workers=min(len(runtimes), 8)) as pool:
+            for (base, hosted), (cards, error) in zip(runtimes.items(), pool.map(fetch, runtimes)):
+                for agent_id in hosted:
+                    card = cards.get(agent_id)
+                    if card is None:
+                        statuses[agent_id] = {"status": "unknown", "reason": error or f"not hosted at {base}"}
+                    else:
+                        statuses[agent_id] = {k: card[k] for k in STATUS_FIELDS if k in card}
+        return statuses
+
+    def _call_remote(self, agent_id: str, method: str, args, kwargs, timeout: float) -> Any:
+        if args and kwargs:
+            raise ValueError("JSON-RPC calls take either positional or keyword arguments, not both")
+        request = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": to_wire(kwargs) if kwargs else to_wire(list(args)),
+            "id": next(self._ids),
+        }
+        response = self.session.post(self.remote[agent_id], json=request, timeout=timeout)
+        response.raise_for_status()
+        body = response.json()
+        if "error" in body:
+            raise AgentCallError(agent_id, method, body["error"])
+        return body.get("result")
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_default_registry() -> AgentRegistry:
+    """Process-wide registry; remote endpoints come from A2A_ENDPOINTS."""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = AgentRegistry()
+            for entry in os.getenv("A2A_ENDPOINTS", "").split(","):
+                if "=" in entry:
+                    agent_id, endpoint = entry.split("=", 1)
+                    _default_registry.register_remote(agent_id.strip(), endpoint.strip())
+        return _default_registry
@@ -0,0 +1,263 @@
+"""
+Declarative, compiled rule engine for the ClassifierAgent.
+
+Rules are loaded from YAML/JSON (or given as dicts) and look like:
+
+    - id: cpu-critical-scale
+      result: scale
+      priority: 10                 # lower runs first; ties keep file order
+      match:
+        message_contains: [cpu]    # any of, case-insensitive
+        message_regex: ["oom.*killed"]
+        severity: [critical]
+        labels: {cluster: [prod-1, prod-2]}
+        resource: [my-node-pool]
+        resource_regex: ["^gke-"]
+
+All matchers present on a rule must match. At compile time every keyword is
+folded into one Aho-Corasick automaton, and rules are indexed by keyword,
+severity or label so each alert only verifies a handful of candidate rules.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import ahocorasick  # Optional: pyahocorasick C implementation
+except ImportError:
+    ahocorasick = None
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from src.schemas import Signal, Context
+
+DEFAULT_RULES = [
+    {"id": "cpu-critical-scale", "result": "scale",
+     "match": {"message_contains": ["cpu"], "severity": ["critical"]}},
+    {"id": "unhealthy-restart", "result": "restart",
+     "match": {"message_contains": ["unhealthy"]}},
+    {"id": "warning-investigate", "result": "investigate",
+     "match": {"severity": ["warning"]}},
+]
+
+
+class _KeywordAutomaton:
+    """Multi-keyword matcher returning the set of keywords found in a text."""
+    def __init__(self, keywords: List[str]):
+        self.keywords = sorted(set(keywords))
+        if ahocorasick is not None:
+            self._native = ahocorasick.Automaton()
+            for kw in self.keywords:
+                self._native.add_word(kw, kw)
+            if self.keywords:
+                self._native.make_automaton()
+            return
+        self._native = None
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[str, ...]] = [()]
+        for kw in self.keywords:
+            state = 0
+            for ch in kw:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] = self._out[state] + (kw,)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def search(self, text: str) -> set:
+        if not self.keywords:
+            return set()
+        if self._native is not None:
+            return {kw for _, kw in self._native.iter(text)}
+        found = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class _CompiledRule:
+    __slots__ = ("id", "result", "order", "keywords", "regexes", "severities",
+                 "labels", "resources", "resource_regexes")
+
+    def __init__(self, spec: Dict[str, Any], order: int):
+        match = spec.get("match", {})
+        self.id = spec.get("id") or f"rule-{order}"
+        self.result = spec["result"]
+        self.order = order
+        self.keywords = frozenset(kw.lower() for kw in _as_list(match.get("message_contains")))
+        self.regexes = [re.compile(p, re.IGNORECASE) for p in _as_list(match.get("message_regex"))]
+        self.severities = frozenset(_as_list(match.get("severity")))
+        self.labels = {k: frozenset(str(v) for v in _as_list(vals))
+                       for k, vals in (match.get("labels") or {}).items()}
+        self.resources = frozenset(_as_list(match.get("resource")))
+        self.resource_regexes = [re.compile(p) for p in _as_list(match.get("resource_regex"))]
+
+    def matches(self, message: str, hits: set, signal: Signal, context: Context) -> bool:
+        if self.keywords and not (self.keywords & hits):
+            return False
+        if self.severities and context.severity not in self.severities:
+            return False
+        if self.labels:
+            labels = signal.labels or {}
+            for key, allowed in self.labels.items():
+                if key not in labels or str(labels[key]) not in allowed:
+                    return False
+        if self.resources and signal.resource not in self.resources:
+            return False
+        if self.resource_regexes and not any(r.search(signal.resource or "") for r in self.resource_regexes):
+            return False
+        if self.regexes and not any(r.search(message) for r in self.regexes):
+            return False
+        return True
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+class RuleSet:
+    """An immutable, compiled and indexed set of rules."""
+    def __init__(self, specs: List[Dict[str, Any]]):
+        ordered = sorted(enumerate(specs), key=lambda item: (item[1].get("priority", 100), item[0]))
+        self.rules = [_CompiledRule(spec, order) for order, (_, spec) in enumerate(ordered)]
+        self.by_keyword: Dict[str, List[int]] = {}
+        self.by_severity: Dict[str, List[int]] = {}
+        self.by_label: Dict[Tuple[str, str], List[int]] = {}
+        self.always: List[int] = []
+        for rule in self.rules:
+            # Index each rule under its most selective matcher; the rest is verified per candidate.
+            if rule.keywords:
+                for kw in rule.keywords:
+                    self.by_keyword.setdefault(kw, []).append(rule.order)
+            elif rule.severities:
+                for sev in rule.severities:
+                    self.by_severity.setdefault(sev, []).append(rule.order)
+            elif rule.labels:
+                key, values = next(iter(rule.labels.items()))
+                for value in values:
+                    self.by_label.setdefault((key, value), []).append(rule.order)
+            else:
+                self.always.append(rule.order)
+        self.automaton = _KeywordAutomaton(list(self.by_keyword))
+
+    def match(self, signal: Signal, context: Context) -> Optional[_CompiledRule]:
+        message = (signal.message or "").lower()
+        hits = self.automaton.search(message)
+        candidates = set(self.always)
+        for kw in hits:
+            candidates.update(self.by_keyword[kw])
+        candidates.update(self.by_severity.get(context.severity, ()))
+        if self.by_label and signal.labels:
+            for key, value in signal.labels.items():
+                candidates.update(self.by_label.get((key, str(value)), ()))
+        for order in sorted(candidates):
+            rule = self.rules[order]
+            if rule.matches(message, hits, signal, context):
+                return rule
+        return None
+
+
+def load_rule_specs(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise ImportError("PyYAML is required to load YAML rule files")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    return data.get("rules", []) if isinstance(data, dict) else data
+
+
+class RuleEngine:
+    """
+    Thread-safe holder of the active RuleSet with hot reload and per-rule hit counters.
+    When `path` is set, the file is re-read whenever its mtime changes (checked at
+    most every `reload_interval` seconds).
+    """
+    def __init__(self, specs: Optional[List[Dict[str, Any]]] = None, path: Optional[str] = None,
+                 reload_interval: float = 5.0, logger=None):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.logger = logger or logging.getLogger("rule-engine")
+        self.hits = Counter()
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._next_check = 0.0
+        if path:
+            self._mtime = os.path.getmtime(path)
+            specs = load_rule_specs(path)
+        self.ruleset = RuleSet(specs if specs is not None else DEFAULT_RULES)
+
+    def match(self, signal: Signal, context: Context) -> Optional[_CompiledRule]:
+        self.maybe_reload()
+        rule = self.ruleset.match(signal, context)
+        with self._lock:
+            if rule:
+                self.hits[rule.id] += 1
+            else:
+                self.misses += 1
+        return rule
+
+    def maybe_reload(self):
+        if not self.path or time.monotonic() < self._next_check:
+            return
+        self._next_check = time.monotonic() + self.reload_interval
+        try:
+            if os.path.getmtime(self.path) != self._mtime:
+                self.reload()
+        except Exception as e:
+            # A bad edit must not break classification; keep serving the previous rules
+            self.logger.error(f"Rule reload from {self.path} failed, keeping {len(self.ruleset.rules)} "
+                              f"active rules: {e}")
+
+    def reload(self, specs: Optional[List[Dict[str, Any]]] = None) -> int:
+        """
+        Compile new rules (from `specs` or the rule file) and swap them in atomically.
+        Raises if the rules cannot be loaded or compiled; the active rules are kept.
+        """
+        mtime = None
+        if specs is None and self.path:
+            mtime = os.path.getmtime(self.path)
+            specs = load_rule_specs(self.path)
+        ruleset = RuleSet(specs if specs is not None else DEFAULT_RULES)
+        self.ruleset = ruleset
+        if mtime is not None:
+            self._mtime = mtime
+        self.logger.info(f"Loaded {len(ruleset.rules)} classification rules")
+        return len(ruleset.rules)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"rules": len(self.ruleset.rules), "hits": dict(self.hits), "misses": self.misses}
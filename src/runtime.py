@@ -0,0 +1,340 @@
+"""
+Shared asyncio A2A server runtime.
+
+Hosts any number of agents in one ASGI app (FastAPI on uvicorn) behind a single
+listener, replacing the per-agent stdlib HTTP card server plus separate
+JSON-RPC port:
+
+    GET  /agent_card                    card of the single hosted agent, or all cards
+    GET  /agents                        all hosted agent cards, with live status
+    GET  /agents/{agent_id}/agent_card  one agent's card
+    POST /jsonrpc                       JSON-RPC 2.0 (single agent, or "agent_id.method")
+    POST /agents/{agent_id}/jsonrpc     JSON-RPC 2.0 for one agent
+    GET  /metrics                       Prometheus metrics (see src/metrics.py)
+    GET  /healthz                       readiness; 503 while draining
+
+Only methods marked with `expose` (a2a_sdk's decorator, re-exported here so the
+runtime can recognise it) are reachable over JSON-RPC. Blocking agent methods
+run on a bounded thread pool behind a concurrency limit. Agents' start hooks
+(e.g. the watcher's Pub/Sub listener) run when serving begins. On SIGTERM
+/healthz turns 503 for `drain_delay_seconds` so load balancers stop routing
+here, then uvicorn stops accepting connections and drains in-flight requests
+before agents' shutdown hooks (e.g. sink and outbox flushes) run.
+Hosted agents are also registered with the process-wide agent registry, so
+co-located agents call each other in-process (see src/registry.py).
+
+Run several agents in one process:
+
+    python -m src.runtime --agents classifier,grounding,reasoning --port 8080
+"""
+import argparse
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import uvicorn
+from a2a_sdk import expose as _sdk_expose
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+from src.metrics import REGISTRY, agent_status
+from src.registry import get_default_registry
+
+logger = logging.getLogger("agent-runtime")
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+def expose(fn):
+    """a2a_sdk's expose, additionally marking `fn` as reachable through the runtime."""
+    fn.__a2a_exposed__ = True
+    exposed = _sdk_expose(fn)
+    try:
+        exposed.__a2a_exposed__ = True
+    except AttributeError:
+        pass
+    return exposed
+
+
+def _is_exposed(attr) -> bool:
+    return getattr(getattr(attr, "__func__", attr), "__a2a_exposed__", False)
+
+
+def exposed_methods(agent) -> Dict[str, Callable]:
+    """
+    The agent's `expose`-marked methods, plus the JSON-RPC names in its
+    `local_methods` (see src/registry.py).
+    """
+    methods = {}
+    for cls in type(agent).__mro__:
+        if cls is object or cls.__module__.startswith("a2a_sdk"):
+            break
+        for name, attr in vars(cls).items():
+            if name not in methods and _is_exposed(attr):
+                methods[name] = getattr(agent, name)
+    for name in getattr(agent, "local_methods", {}):
+        if name not in methods and callable(getattr(agent, name, None)):
+            methods[name] = getattr(agent, name)
+    return methods
+
+
+class AgentRuntime:
+    def __init__(self, agents: Dict[str, Any], max_concurrency: int = 64):
+        self.agents = agents
+        self.methods = {agent_id: exposed_methods(agent) for agent_id, agent in agents.items()}
+        self.max_concurrency = max_concurrency
+        self.draining = False
+        self.in_flight = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.app = self._build_app()
+        registry = get_default_registry()
+        for agent_id, agent in agents.items():
+            registry.register(agent, agent_id)
+
+    async def call(self, agent_id: str, method: str, params: Any = None) -> Any:
+        """Invoke an agent method in-process, without JSON-RPC encoding."""
+        fn = self.methods[agent_id][method]
+        args, kwargs = (params, {}) if isinstance(params, list) else ((), params or {})
+        if self._semaphore is None:  # in-process calls before serving starts
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                if inspect.iscoroutinefunction(fn):
+                    return await fn(*args, **kwargs)
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+            finally:
+                self.in_flight -= 1
+
+    async def dispatch(self, agent_id: Optional[str], message: Any) -> Any:
+        if isinstance(message, list):
+            if not message:
+                return _error(None, INVALID_REQUEST, "Empty batch")
+            responses = await asyncio.gather(*(self._dispatch_one(agent_id, m) for m in message))
+            return [r for r in responses if r is not None]
+        return await self._dispatch_one(agent_id, message)
+
+    async def _dispatch_one(self, agent_id: Optional[str], message: Any) -> Optional[Dict[str, Any]]:
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0" or "method" not in message:
+            return _error(message.get("id") if isinstance(message, dict) else None, INVALID_REQUEST, "Invalid request")
+        request_id = message.get("id")
+        method = message["method"]
+        target = agent_id
+        if target is None:
+            if "." in method:
+                target, method = method.split(".", 1)
+            elif len(self.agents) == 1:
+                target = next(iter(self.agents))
+        if target not in self.methods or method not in self.methods[target]:
+            return _error(request_id, METHOD_NOT_FOUND, f"Method not found: {message['method']}")
+        params = message.get("params")
+        if params is not None and not isinstance(params, (dict, list)):
+            return _error(request_id, INVALID_PARAMS, "params must be an object or array")
+        try:
+            fn = self.methods[target][method]
+            if isinstance(params, list):
+                inspect.signature(fn).bind(*params)
+            else:
+                inspect.signature(fn).bind(**(params or {}))
+        except TypeError as e:
+            return _error(request_id, INVALID_PARAMS, str(e))
+        try:
+            result = await self.call(target, method, params)
+        except Exception as e:
+            logger.error(f"{target}.{method} failed: {e}")
+            return _error(request_id, INTERNAL_ERROR, str(e))
+        if "id" not in message:
+            return None  # notification
+        return {"jsonrpc": "2.0", "result": jsonable_encoder(result), "id": request_id}
+
+    def cards(self) -> List[Dict[str, Any]]:
+        return [agent.get_agent_card() for agent in self.agents.values()]
+
+    def _build_app(self) -> FastAPI:
+        @asynccontextmanager
+        async def lifespan(app):
+            loop = asyncio.get_running_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="agent"))
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            for agent in self.agents.values():
+                if callable(getattr(agent, "start", None)):
+                    agent.start()
+            logger.info(f"Agent runtime serving: {', '.join(self.agents)}")
+            yield
+            self.draining = True
+            for agent_id, agent in self.agents.items():
+                for hook in ("shutdown", "close"):
+                    if callable(getattr(agent, hook, None)):
+                        await loop.run_in_executor(None, getattr(agent, hook))
+                outbox = getattr(agent, "outbox", None)
+                if outbox is not None:
+                    await loop.run_in_executor(None, outbox.close)
+            logger.info("Agent runtime drained")
+
+        app = FastAPI(title="x-sre-agents runtime", lifespan=lifespan)
+
+        @app.get("/healthz")
+        async def healthz():
+            status = 503 if self.draining else 200
+            return JSONResponse({"status": "draining" if self.draining else "ok", "in_flight": self.in_flight},
+                                status_code=status)
+
+        @app.get("/agents")
+        async def list_cards():
+            return {"agents": [dict(card, **agent_status(card["id"])) for card in self.cards()]}
+
+        @app.get("/metrics")
+        async def metrics():
+            return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+        @app.get("/agent_card")
+        async def agent_card():
+            cards = self.cards()
+            return cards[0] if len(cards) == 1 else {"agents": cards}
+
+        @app.get("/agents/{agent_id}/agent_card")
+        async def one_card(agent_id: str):
+            if agent_id not in self.agents:
+                return JSONResponse({"error": f"Unknown agent: {agent_id}"}, status_code=404)
+            return self.agents[agent_id].get_agent_card()
+
+        async def handle(request: Request, agent_id: Optional[str]):
+            try:
+                message = await request.json()
+            except ValueError:
+                return JSONResponse(_error(None, PARSE_ERROR, "Parse error"))
+            response = await self.dispatch(agent_id, message)
+            if response is None or response == []:
+                return Response(status_code=204)
+            return JSONResponse(response)
+
+        @app.post("/jsonrpc")
+        async def jsonrpc(request: Request):
+            return await handle(request, None)
+
+        @app.post("/agents/{agent_id}/jsonrpc")
+        async def agent_jsonrpc(agent_id: str, request: Request):
+            if agent_id not in self.agents:
+                return JSONResponse(_error(None, METHOD_NOT_FOUND, f"Unknown agent: {agent_id}"), status_code=404)
+            return await handle(request, agent_id)
+
+        return app
+
+
+def _error(request_id, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "error": {"code": code, "message": message}, "id": request_id}
+
+
+class _DrainingServer(uvicorn.Server):
+    """
+    Marks the runtime as draining on the first SIGTERM/SIGINT and keeps serving
+    for `drain_delay_seconds` before uvicorn's own shutdown; a second signal
+    exits immediately.
+    """
+    def __init__(self, config: uvicorn.Config, runtime: AgentRuntime, drain_delay_seconds: float):
+        super().__init__(config)
+        self.runtime = runtime
+        self.drain_delay_seconds = drain_delay_seconds
+
+    def handle_exit(self, sig, frame):
+        if self.runtime.draining or self.drain_delay_seconds <= 0:
+            self.runtime.draining = True
+            return super().handle_exit(sig, frame)
+        self.runtime.draining = True
+        logger.info(f"Draining: failing readiness for {self.drain_delay_seconds}s before shutdown")
+        timer = threading.Timer(self.drain_delay_seconds, super().handle_exit, (sig, frame))
+        timer.daemon = True
+        timer.start()
+
+
+def serve(agents: Dict[str, Any], host: str = "0.0.0.0", port: int = 8080, max_concurrency: int = 64,
+          keep_alive_seconds: int = 75, drain_timeout_seconds: int = 30,
+          drain_delay_seconds: float = float(os.getenv("DRAIN_DELAY_SECONDS", "5"))):
+    """Serve agents on one listener with HTTP keep-alive and graceful drain on SIGTERM."""
+    runtime = AgentRuntime(agents, max_concurrency=max_concurrency)
+    print(f"Agent runtime listening on http://{host}:{port} ({', '.join(agents)})")
+    config = uvicorn.Config(
+        runtime.app,
+        host=host,
+        port=port,
+        timeout_keep_alive=keep_alive_seconds,
+        timeout_graceful_shutdown=drain_timeout_seconds,
+        limit_concurrency=max_concurrency * 4,
+    )
+    _DrainingServer(config, runtime, drain_delay_seconds).run()
+
+
+def _executor_agent():
+    from src.agents import executor_agent as m
+    return m.ExecutorAgent(toolset={
+        "gke_scale": m.gke_scale_tool,
+        "cloudrun_deploy": m.cloudrun_deploy_tool,
+        "spanner_admin": m.spanner_admin_tool,
+        "kafka_action": m.kafka_tool,
+    })
+
+
+def _watcher_agent():
+    from src.agents.watcher_agent import WatcherAgent
+    return WatcherAgent(
+        subscription_name=os.environ["PUBSUB_SUBSCRIPTION"],
+        project_id=os.environ["GCP_PROJECT"],
+        downstream_callback=lambda signal, context: print(f"Downstream: {signal}, {context}"),
+    )
+
+
+def _factory(module: str, cls: str, **kwargs):
+    def build():
+        mod = __import__(f"src.agents.{module}", fromlist=[cls])
+        return getattr(mod, cls)(**{k: v() if callable(v) else v for k, v in kwargs.items()})
+    return build
+
+
+# Agent ids (as in their agent cards, minus "-agent") to constructors configured from the environment
+AGENT_FACTORIES: Dict[str, Callable[[], Any]] = {
+    "watcher": _watcher_agent,
+    "classifier": _factory("classifier_agent", "ClassifierAgent"),
+    "grounding": _factory("grounding_agent", "GroundingAgent"),
+    "personalization": _factory("personalization_agent", "PersonalizationAgent"),
+    "orchestrator": _factory("orchestrator_agent", "OrchestratorAgent"),
+    "reasoning": _factory("reasoning_agent", "ReasoningAgent"),
+    "policy": _factory("policy_agent", "PolicyAgent",
+                       opa_url=lambda: os.getenv("OPA_URL", "http://opa-gatekeeper/v1/data/sre/policy")),
+    "executor": _executor_agent,
+    "notification": _factory("notification_agent", "NotificationAgent",
+                             slack_webhook_url=lambda: os.environ["SLACK_WEBHOOK_URL"]),
+    "validator": _factory("validator_agent", "ValidatorAgent"),
+    "llmjudge": _factory("llmjudge_agent", "LLMJudgeAgent"),
+}
+
+
+def build_agents(names: List[str]) -> Dict[str, Any]:
+    agents = {}
+    for name in names:
+        agent = AGENT_FACTORIES[name]()
+        agents[agent.get_agent_card()["id"]] = agent
+    return agents
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host several A2A agents in one process")
+    parser.add_argument("--agents", default=os.getenv("AGENTS", ",".join(n for n in AGENT_FACTORIES if n != "watcher")))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8080)))
+    parser.add_argument("--max-concurrency", type=int, default=int(os.getenv("MAX_CONCURRENCY", 64)))
+    args = parser.parse_args()
+    serve(build_agents([n.strip() for n in args.agents.split(",") if n.strip()]),
+          host=args.host, port=args.port, max_concurrency=args.max_concurrency)
@@ -0,0 +1,161 @@
+"""
+Write-behind sinks that keep persistence off the request path.
+
+BigQueryRowSink buffers rows in a bounded in-memory queue and a background
+thread streams them to BigQuery in batches (by size or time), retrying with
+exponential backoff. Rows that overflow the queue or exhaust their retries are
+appended to a local JSONL spool and replayed on the next start. `close()`
+(also registered with atexit) drains the queue on graceful shutdown; once it is
+called, failed writes are spooled instead of retried, and rows still queued when
+its timeout expires are spooled too. A spool is renamed to a unique replay file
+that is only removed once all its rows are written or spooled again, so a crash
+during replay loses nothing (rows may then be written twice).
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.metrics import watch_queue
+
+
+class BigQueryRowSink:
+    def __init__(self, bq_client, table_id: str, logger=None, batch_size: int = 500,
+                 flush_interval: float = 1.0, max_queue: int = 10000, max_retries: int = 5,
+                 spool_dir: Optional[str] = None):
+        self.bq_client = bq_client
+        self.table_id = table_id
+        self.logger = logger or logging.getLogger("bigquery-sink")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.spool_dir = spool_dir or os.getenv("BQ_SPOOL_DIR", "/tmp/x-sre-agents/spool")
+        self.spool_path = os.path.join(self.spool_dir, f"{table_id.replace('.', '_')}.jsonl")
+        self.stats = {"enqueued": 0, "written": 0, "spooled": 0, "retries": 0, "replayed": 0}
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._table = None
+        self._spool_lock = threading.Lock()
+        self._stopped = threading.Event()
+        watch_queue(f"bq_sink:{table_id}", self, lambda sink: sink._queue.qsize(),
+                    lambda sink: sink.stats["spooled"])
+        self._thread = threading.Thread(target=self._run, name="bq-sink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, row: Dict[str, Any]) -> bool:
+        """Queue a row without blocking; returns False if it had to be spooled to disk."""
+        try:
+            self._queue.put_nowait(row)
+            self.stats["enqueued"] += 1
+            return True
+        except queue.Full:
+            self._spool([row])
+            return False
+
+    def close(self, timeout: float = 10.0):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            rows = []
+            while True:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if rows:
+                self.logger.warning(f"BigQuery sink did not drain within {timeout}s, spooling {len(rows)} rows")
+                self._spool(rows)
+
+    def _run(self):
+        self._replay_spool()
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            elif self._stopped.is_set():
+                return
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if self._stopped.is_set():
+                remaining = 0
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _table_ref(self):
+        # Table metadata is fetched once and reused for every insert.
+        if self._table is None:
+            self._table = self.bq_client.get_table(self.table_id)
+        return self._table
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        pending = rows
+        for attempt in range(self.max_retries + 1):
+            try:
+                errors = self.bq_client.insert_rows_json(self._table_ref(), pending)
+                failed = sorted({e["index"] for e in errors or [] if "index" in e})
+                if errors and not failed:
+                    failed = list(range(len(pending)))
+                self.stats["written"] += len(pending) - len(failed)
+                if not failed:
+                    return
+                pending = [pending[i] for i in failed]
+                error = errors
+            except Exception as e:
+                error = e
+                if attempt == 0:
+                    self._table = None
+            if attempt < self.max_retries:
+                # Shutting down: spool now rather than outlive close() in a backoff sleep
+                if self._stopped.wait(min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random() / 2)):
+                    break
+                self.stats["retries"] += 1
+        self.logger.error(f"BigQuery persistence failed for {len(pending)} rows, spooling: {error}")
+        self._spool(pending)
+
+    def _spool(self, rows: List[Dict[str, Any]]):
+        try:
+            with self._spool_lock:
+                os.makedirs(self.spool_dir, exist_ok=True)
+                with open(self.spool_path, "a") as f:
+                    for row in rows:
+                        f.write(json.dumps(row, default=str) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.stats["spooled"] += len(rows)
+        except OSError as e:
+            self.logger.error(f"Spooling {len(rows)} rows failed, dropping them: {e}")
+
+    def _replay_spool(self):
+        with self._spool_lock:
+            if os.path.exists(self.spool_path):
+                os.replace(self.spool_path, f"{self.spool_path}.replay-{time.time_ns()}")
+        # Includes replay files left by a crash during an earlier replay
+        for replay_path in sorted(glob.glob(f"{glob.escape(self.spool_path)}.replay*")):
+            rows = []
+            with open(replay_path) as f:
+                for line in f:
+                    try:
+                        if line.strip():
+                            rows.append(json.loads(line))
+                    except ValueError:
+                        self.logger.error(f"Skipping corrupt spooled row in {replay_path}")
+            for i in range(0, len(rows), self.batch_size):
+                self._write(rows[i:i + self.batch_size])
+            # Every row is now in BigQuery or back in the spool
+            os.remove(replay_path)
+            self.stats["replayed"] += len(rows)
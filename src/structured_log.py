@@ -0,0 +1,264 @@
+"""
+Non-blocking, sampled structured logging shared by all agents.
+
+`get_logger(name)` returns a logger with the `log_struct` / `info` / `error`
+interface the agents already use. On the request path a call makes the
+sampling decision, shapes the entry into a private copy (truncating long
+strings and lists, replacing bulky fields such as prompts with a hash and
+preview) and puts it on a bounded in-memory queue; when the queue is full the
+entry is dropped and counted rather than blocking. A background thread writes
+entries in batches to stdout as JSON lines or to Cloud Logging.
+
+Configured from the environment:
+
+    LOG_BACKEND=stdout|cloud
+    LOG_SAMPLE_RATES="grounding_retrieved=0.1,personalization_injected=0.1"
+    LOG_QUEUE_SIZE=10000
+    LOG_MAX_FIELD_CHARS=2048
+
+WARNING and above are never sampled out. Sampling is keyed on the entry's
+incident or envelope id when present, so an incident's events are kept or
+dropped together. The copy is taken before the call returns, so callers may
+keep using (and mutating) a logged dict. `get_logger(name, backend=...)`
+overrides LOG_BACKEND for one logger; each backend gets its own pipeline.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from google.cloud import logging as gcp_logging
+except ImportError:  # only needed for LOG_BACKEND=cloud
+    gcp_logging = None
+
+from src.metrics import watch_queue
+
+SEVERITY_LEVELS = {"DEBUG": 10, "INFO": 20, "NOTICE": 25, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+SAMPLE_KEYS = ("incident_id", "envelope_id")
+
+
+class StdoutWriter:
+    """JSON lines on stdout, picked up as structured logs on GKE and Cloud Run."""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def write(self, batch: List[Tuple[str, Dict[str, Any], str]]):
+        lines = []
+        for name, entry, severity in batch:
+            lines.append(json.dumps(dict(entry, severity=severity, logger=name), default=str))
+        self.stream.write("\n".join(lines) + "\n")
+        self.stream.flush()
+
+
+class CloudLoggingWriter:
+    """Writes each batch with a single Cloud Logging API call."""
+    def __init__(self, client=None):
+        if client is None and gcp_logging is None:
+            raise RuntimeError("google-cloud-logging is not installed")
+        self.client = client or gcp_logging.Client()
+        self._loggers = {}
+
+    def write(self, batch: List[Tuple[str, Dict[str, Any], str]]):
+        by_logger = {}
+        for name, entry, severity in batch:
+            by_logger.setdefault(name, []).append((entry, severity))
+        for name, entries in by_logger.items():
+            if name not in self._loggers:
+                self._loggers[name] = self.client.logger(name)
+            cloud_batch = self._loggers[name].batch()
+            for entry, severity in entries:
+                cloud_batch.log_struct(entry, severity=severity)
+            cloud_batch.commit()
+
+
+class LogPipeline:
+    def __init__(self, writer=None, max_queue: int = 10000, batch_size: int = 200, flush_interval: float = 1.0,
+                 sample_rates: Optional[Dict[str, float]] = None, max_field_chars: int = 2048,
+                 max_list_items: int = 10, hash_fields: Iterable[str] = ("prompt", "llm_response")):
+        self.writer = writer or StdoutWriter()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # event name -> fraction of entries kept (1.0 when unlisted)
+        self.sample_rates = dict(sample_rates or {})
+        self.max_field_chars = max_field_chars
+        self.max_list_items = max_list_items
+        self.hash_fields = frozenset(hash_fields)
+        self.stats = {"enqueued": 0, "written": 0, "sampled_out": 0, "dropped": 0, "write_errors": 0, "batches": 0}
+        self._queue: "queue.Queue[Tuple[str, Dict[str, Any], str]]" = queue.Queue(maxsize=max_queue)
+        self._idle = threading.Condition()
+        self._stopped = threading.Event()
+        watch_queue("log_pipeline", self, lambda p: p._queue.qsize(), lambda p: p.stats["dropped"])
+        self._thread = threading.Thread(target=self._run, name="log-pipeline", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, name: str, entry: Dict[str, Any], severity: str = "INFO") -> bool:
+        """Queue an entry without blocking; returns False if it was sampled out or dropped."""
+        if not self._sampled_in(entry, severity):
+            self.stats["sampled_out"] += 1
+            return False
+        try:
+            # Shaped here, on the caller's thread, while nothing else can be changing the entry
+            self._queue.put_nowait((name, self._shape(entry), severity))
+            self.stats["enqueued"] += 1
+            return True
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far has been written."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._idle.wait(remaining):
+                    return False
+        return True
+
+    def close(self, timeout: float = 5.0):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._thread.join(timeout)
+
+    def _sampled_in(self, entry: Dict[str, Any], severity: str) -> bool:
+        rate = self.sample_rates.get(entry.get("event")) if isinstance(entry, dict) else None
+        if rate is None or rate >= 1.0 or SEVERITY_LEVELS.get(severity, 20) >= 30:
+            return True
+        key = next((entry[k] for k in SAMPLE_KEYS if entry.get(k)), None)
+        if key is None:
+            return random.random() < rate
+        return zlib.crc32(f"{entry.get('event')}:{key}".encode()) % 10000 < rate * 10000
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            elif self._stopped.is_set():
+                return
+
+    def _next_batch(self) -> List[Tuple[str, Dict[str, Any], str]]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = 0 if self._stopped.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Tuple[str, Dict[str, Any], str]]):
+        try:
+            self.writer.write(batch)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            self.stats["write_errors"] += 1
+            print(f"log pipeline: dropping {len(batch)} entries after write failure: {e}", file=sys.stderr)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+            with self._idle:
+                self._idle.notify_all()
+
+    def _shape(self, value: Any, key: Optional[str] = None, depth: int = 0) -> Any:
+        """Copy an entry, truncating long strings/lists and hashing bulky fields."""
+        if key in self.hash_fields and value is not None:
+            text = value if isinstance(value, str) else json.dumps(value, default=str)
+            return {
+                "sha256": hashlib.sha256(text.encode()).hexdigest(),
+                "chars": len(text),
+                "preview": text[:200],
+            }
+        if isinstance(value, str):
+            if len(value) > self.max_field_chars:
+                return f"{value[:self.max_field_chars]}...[{len(value) - self.max_field_chars} chars truncated]"
+            return value
+        if depth >= 8:
+            return str(value)[:self.max_field_chars]
+        if isinstance(value, dict):
+            return {k: self._shape(v, k, depth + 1) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            shaped = [self._shape(v, None, depth + 1) for v in value[:self.max_list_items]]
+            if len(value) > self.max_list_items:
+                shaped.append(f"...[{len(value) - self.max_list_items} more items]")
+            return shaped
+        if hasattr(value, "model_dump"):
+            return self._shape(value.model_dump(), key, depth + 1)
+        return value
+
+
+class StructLogger:
+    """Agent-facing logger bound to a LogPipeline; never blocks the caller."""
+    def __init__(self, name: str, pipeline: LogPipeline):
+        self.name = name
+        self.pipeline = pipeline
+
+    def log_struct(self, info: Dict[str, Any], severity: str = "INFO") -> bool:
+        return self.pipeline.submit(self.name, info, severity)
+
+    def _log(self, severity: str, msg: Any):
+        self.pipeline.submit(self.name, msg if isinstance(msg, dict) else {"message": str(msg)}, severity)
+
+    def debug(self, msg: Any):
+        self._log("DEBUG", msg)
+
+    def info(self, msg: Any):
+        self._log("INFO", msg)
+
+    def warning(self, msg: Any):
+        self._log("WARNING", msg)
+
+    def error(self, msg: Any):
+        self._log("ERROR", msg)
+
+    def exception(self, msg: Any):
+        self._log("ERROR", msg)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for part in spec.split(","):
+        if "=" in part:
+            event, rate = part.split("=", 1)
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+_default_pipelines: Dict[str, LogPipeline] = {}
+_default_pipeline_lock = threading.Lock()
+
+
+def get_default_pipeline(backend: Optional[str] = None) -> LogPipeline:
+    """
+    Process-wide LogPipeline for `backend` (LOG_BACKEND when not given), shared by
+    all co-located agents and configured from the environment.
+    """
+    backend = backend or os.getenv("LOG_BACKEND", "stdout")
+    with _default_pipeline_lock:
+        pipeline = _default_pipelines.get(backend)
+        if pipeline is None:
+            pipeline = _default_pipelines[backend] = LogPipeline(
+                writer=CloudLoggingWriter() if backend == "cloud" else StdoutWriter(),
+                max_queue=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+                sample_rates=parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+                max_field_chars=int(os.getenv("LOG_MAX_FIELD_CHARS", "2048")),
+            )
+            logging.getLogger("structured-log").info(f"Log pipeline started: backend={backend}")
+        return pipeline
+
+
+def get_logger(name: str, backend: Optional[str] = None) -> StructLogger:
+    return StructLogger(name, get_default_pipeline(backend))
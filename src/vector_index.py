@@ -0,0 +1,350 @@
+"""
+In-process runbook/KB vector index for the GroundingAgent.
+
+Documents are chunked, embedded with a pluggable local embedder and stored in a
+contiguous, L2-normalized float32 matrix so cosine top-k is one matrix multiply
+(batched across queries). Indexes persist as `<path>.npy` (memory-mappable) plus
+`<path>.json` metadata, so replicas can start without re-embedding.
+
+For large corpora, IVFIndex (NumPy inverted file lists) and HNSWIndex (optional
+hnswlib) trade a little recall for much lower query latency.
+
+Build an index from a directory of docs:
+
+    python -m src.vector_index build runbooks/ /var/lib/x-sre/runbooks [exact|ivf|hnsw]
+"""
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import hnswlib  # Optional: HNSW graph index
+except ImportError:
+    hnswlib = None
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+
+class HashingEmbedder:
+    """
+    Dependency-free local embedder: hashed unigrams and bigrams with sublinear TF.
+    Any callable mapping a list of texts to an (n, dim) array can replace it.
+    """
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = _TOKEN_RE.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        return np.sign(out) * np.log1p(np.abs(out))
+
+
+def chunk_text(text: str, max_chars: int = 800, overlap: int = 100) -> List[str]:
+    """Split text on paragraph boundaries into chunks of at most `max_chars`."""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    chunks, current = [], ""
+    for para in paragraphs:
+        while len(para) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(para[:max_chars])
+            para = para[max_chars - overlap:]
+        if current and len(current) + len(para) + 2 > max_chars:
+            chunks.append(current)
+            current = current[-overlap:] + "\n\n" + para if overlap else para
+        else:
+            current = f"{current}\n\n{para}" if current else para
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    """Exact cosine-similarity index over document chunks."""
+    def __init__(self, embedder: Optional[Callable[[Sequence[str]], np.ndarray]] = None, dim: Optional[int] = None):
+        self.embedder = embedder or HashingEmbedder()
+        self.dim = dim or getattr(self.embedder, "dim", None)
+        self.metadata: List[Dict[str, Any]] = []
+        self._vectors = np.zeros((0, self.dim or 0), dtype=np.float32)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self._size]
+
+    def add_documents(self, documents: List[Dict[str, Any]], max_chars: int = 800, overlap: int = 100) -> int:
+        """
+        Chunk, embed and add documents of the form {"doc_id": ..., "text": ..., **extra}.
+        Returns the number of chunks added.
+        """
+        texts, metadata = [], []
+        for doc in documents:
+            extra = {k: v for k, v in doc.items() if k != "text"}
+            for i, chunk in enumerate(chunk_text(doc["text"], max_chars, overlap)):
+                texts.append(chunk)
+                metadata.append(dict(extra, chunk_id=i, snippet=chunk))
+        if texts:
+            self.add_vectors(self.embedder(texts), metadata)
+        return len(texts)
+
+    def add_vectors(self, vectors: np.ndarray, metadata: List[Dict[str, Any]]):
+        vectors = _normalize(vectors)
+        with self._lock:
+            if self.dim is None or self._vectors.shape[1] == 0:
+                self.dim = vectors.shape[1]
+                self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+            needed = self._size + len(vectors)
+            if needed > len(self._vectors) or not self._vectors.flags.writeable:
+                # Grow geometrically so appends stay amortized O(1) and storage stays contiguous.
+                grown = np.empty((max(needed, 2 * len(self._vectors), 64), self.dim), dtype=np.float32)
+                grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+            self._vectors[self._size:needed] = vectors
+            self.metadata.extend(metadata)
+            self._size = needed
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        return self.search_batch([query], k)[0]
+
+    def search_batch(self, queries: Sequence[str], k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Score all queries against all chunks in one matrix multiply."""
+        if not queries:
+            return []
+        if self._size == 0:
+            return [[] for _ in queries]
+        return self.search_vectors(_normalize(self.embedder(list(queries))), k)
+
+    def search_vectors(self, query_vectors: np.ndarray, k: int = 5) -> List[List[Dict[str, Any]]]:
+        matrix = self.vectors
+        k = min(k, len(matrix))
+        scores = query_vectors @ matrix.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        results = []
+        for row in range(len(query_vectors)):
+            hits = []
+            for col in order[row]:
+                idx = int(top[row, col])
+                hits.append(dict(self.metadata[idx], score=round(float(top_scores[row, col]), 4)))
+            results.append(hits)
+        return results
+
+    def save(self, path: str):
+        """Write `<path>.npy` and `<path>.json`."""
+        with self._lock:
+            np.save(f"{path}.npy", np.ascontiguousarray(self.vectors))
+            with open(f"{path}.json", "w") as f:
+                json.dump({"dim": self.dim, "metadata": self.metadata}, f)
+
+    @classmethod
+    def load(cls, path: str, embedder: Optional[Callable] = None, mmap: bool = True) -> "VectorIndex":
+        """Load an index; with mmap=True the matrix is memory-mapped read-only and shared via the page cache."""
+        with open(f"{path}.json") as f:
+            meta = json.load(f)
+        index = cls(embedder=embedder or HashingEmbedder(meta["dim"]), dim=meta["dim"])
+        index._vectors = np.load(f"{path}.npy", mmap_mode="r" if mmap else None)
+        index._size = len(index._vectors)
+        index.metadata = meta["metadata"]
+        return index
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file ANN index: chunks are assigned to the nearest of `n_lists`
+    k-means centroids and a query only scores the `nprobe` closest lists.
+    Raise `nprobe` for recall, lower it for latency. Until `train` is called
+    (or after fewer than `n_lists` vectors) searches fall back to exact scoring.
+    New vectors are assigned to their nearest centroid without a rebuild.
+    """
+    def __init__(self, embedder: Optional[Callable] = None, dim: Optional[int] = None,
+                 n_lists: int = 256, nprobe: int = 8):
+        super().__init__(embedder, dim)
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self._lists: List[np.ndarray] = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, iterations: int = 10, sample_size: int = 50000, seed: int = 0):
+        """Fit centroids with spherical k-means on a sample, then (re)assign all vectors."""
+        data = self.vectors
+        if len(data) < self.n_lists:
+            return
+        rng = np.random.default_rng(seed)
+        sample = data[rng.choice(len(data), min(sample_size, len(data)), replace=False)]
+        centroids = sample[rng.choice(len(sample), self.n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(self.n_lists):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = _normalize(centroids)
+        with self._lock:
+            self.centroids = centroids
+            self.assignments = self._assign(data)
+            self._rebuild_lists()
+
+    def add_vectors(self, vectors: np.ndarray, metadata: List[Dict[str, Any]]):
+        start = self._size
+        super().add_vectors(vectors, metadata)
+        if self.is_trained:
+            with self._lock:
+                new = self._assign(self._vectors[start:self._size])
+                self.assignments = np.concatenate([self.assignments, new])
+                for c in np.unique(new):
+                    ids = np.arange(start, self._size, dtype=np.int64)[new == c]
+                    self._lists[c] = np.concatenate([self._lists[c], ids])
+
+    def search_vectors(self, query_vectors: np.ndarray, k: int = 5) -> List[List[Dict[str, Any]]]:
+        if not self.is_trained:
+            return super().search_vectors(query_vectors, k)
+        matrix = self.vectors
+        nprobe = min(self.nprobe, self.n_lists)
+        probes = np.argpartition(-(query_vectors @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for q, lists in zip(query_vectors, probes):
+            ids = np.concatenate([self._lists[c] for c in lists])
+            if not len(ids):
+                results.append([])
+                continue
+            scores = matrix[ids] @ q
+            kk = min(k, len(ids))
+            top = np.argpartition(-scores, kk - 1)[:kk]
+            top = top[np.argsort(-scores[top])]
+            results.append([dict(self.metadata[int(ids[i])], score=round(float(scores[i]), 4)) for i in top])
+        return results
+
+    def save(self, path: str):
+        super().save(path)
+        if self.is_trained:
+            np.savez(f"{path}.ivf.npz", centroids=self.centroids, assignments=self.assignments,
+                     nprobe=self.nprobe)
+
+    @classmethod
+    def load(cls, path: str, embedder: Optional[Callable] = None, mmap: bool = True) -> "IVFIndex":
+        index = super().load(path, embedder, mmap)
+        if os.path.exists(f"{path}.ivf.npz"):
+            data = np.load(f"{path}.ivf.npz")
+            index.centroids = data["centroids"]
+            index.n_lists = len(index.centroids)
+            index.nprobe = int(data["nprobe"])
+            index.assignments = data["assignments"]
+            index._rebuild_lists()
+        return index
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def _rebuild_lists(self):
+        order = np.argsort(self.assignments, kind="stable")
+        bounds = np.searchsorted(self.assignments[order], np.arange(self.n_lists + 1))
+        self._lists = [order[bounds[c]:bounds[c + 1]].astype(np.int64) for c in range(self.n_lists)]
+
+
+class HNSWIndex(VectorIndex):
+    """
+    HNSW graph index backed by the optional `hnswlib` package. `ef_search` is the
+    recall/latency knob at query time; `m` and `ef_construction` tune the graph.
+    Inserts are incremental.
+    """
+    def __init__(self, embedder: Optional[Callable] = None, dim: Optional[int] = None,
+                 m: int = 16, ef_construction: int = 200, ef_search: int = 64):
+        if hnswlib is None:
+            raise ImportError("hnswlib is required for HNSWIndex")
+        super().__init__(embedder, dim)
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._graph = None
+
+    def add_vectors(self, vectors: np.ndarray, metadata: List[Dict[str, Any]]):
+        start = self._size
+        super().add_vectors(vectors, metadata)
+        with self._lock:
+            if self._graph is None:
+                self._graph = hnswlib.Index(space="ip", dim=self.dim)
+                self._graph.init_index(max_elements=max(1024, self._size), ef_construction=self.ef_construction, M=self.m)
+            elif self._size > self._graph.get_max_elements():
+                self._graph.resize_index(max(self._size, 2 * self._graph.get_max_elements()))
+            self._graph.add_items(self._vectors[start:self._size], np.arange(start, self._size))
+
+    def search_vectors(self, query_vectors: np.ndarray, k: int = 5) -> List[List[Dict[str, Any]]]:
+        k = min(k, self._size)
+        self._graph.set_ef(max(self.ef_search, k))
+        labels, distances = self._graph.knn_query(query_vectors, k=k)
+        # hnswlib "ip" distance is 1 - inner product
+        return [[dict(self.metadata[int(i)], score=round(float(1 - d), 4)) for i, d in zip(row_ids, row_d)]
+                for row_ids, row_d in zip(labels, distances)]
+
+    def save(self, path: str):
+        super().save(path)
+        self._graph.save_index(f"{path}.hnsw")
+
+    @classmethod
+    def load(cls, path: str, embedder: Optional[Callable] = None, mmap: bool = True) -> "HNSWIndex":
+        index = super().load(path, embedder, mmap)
+        index._graph = hnswlib.Index(space="ip", dim=index.dim)
+        index._graph.load_index(f"{path}.hnsw", max_elements=max(1024, index._size))
+        return index
+
+
+def load_index(path: str, embedder: Optional[Callable] = None, mmap: bool = True) -> VectorIndex:
+    """Load whichever index type was saved at `path`."""
+    if os.path.exists(f"{path}.hnsw"):
+        return HNSWIndex.load(path, embedder, mmap)
+    if os.path.exists(f"{path}.ivf.npz"):
+        return IVFIndex.load(path, embedder, mmap)
+    return VectorIndex.load(path, embedder, mmap)
+
+
+def load_documents(root: str, patterns: Sequence[str] = ("**/*.md", "**/*.txt")) -> List[Dict[str, Any]]:
+    documents = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(root, pattern), recursive=True)):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                documents.append({"doc_id": os.path.relpath(path, root), "text": f.read()})
+    return documents
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (4, 5) or sys.argv[1] != "build":
+        print("usage: python -m src.vector_index build <docs_dir> <index_path> [exact|ivf|hnsw]")
+        sys.exit(1)
+    kind = sys.argv[4] if len(sys.argv) == 5 else "exact"
+    index = {"exact": VectorIndex, "ivf": IVFIndex, "hnsw": HNSWIndex}[kind]()
+    chunks = index.add_documents(load_documents(sys.argv[2]))
+    if kind == "ivf":
+        index.n_lists = max(1, min(index.n_lists, int(np.sqrt(chunks))))
+        index.train()
+    index.save(sys.argv[3])
+    print(f"Indexed {chunks} chunks into {sys.argv[3]}.npy/.json")
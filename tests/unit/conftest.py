@@ -0,0 +1,23 @@
+"""
+The agents subclass a2a_sdk.Agent and mark their RPC methods with a2a_sdk.expose.
+When the SDK is not installed, a minimal stand-in with just those two names is
+registered so the agents' own logic can still be unit tested.
+"""
+import sys
+import types
+
+try:
+    import a2a_sdk  # noqa: F401
+except ImportError:
+    a2a_sdk = types.ModuleType("a2a_sdk")
+
+    class Agent:
+        def __init__(self):
+            pass
+
+    def expose(fn):
+        return fn
+
+    Agent.__module__ = "a2a_sdk"
+    a2a_sdk.Agent, a2a_sdk.expose = Agent, expose
+    sys.modules["a2a_sdk"] = a2a_sdk
@@ -0,0 +1,59 @@
+import time
+
+from src.cache import SQLiteCache, TieredCache, TTLCache, fingerprint, normalize_message
+
+
+def test_normalize_message_masks_volatile_tokens():
+    a = normalize_message("Pod web-7d9f8b6c5d-x2k4p OOMKilled at 2024-01-01T10:00:00Z on 10.0.0.12:8080")
+    b = normalize_message("pod web-5c6d7e8f9a-q8r7s OOMKilled at 2024-02-03T11:22:33Z on 10.0.3.4:9090")
+    assert a == b
+    assert "<pod>" in a and "<ts>" in a and "<ip>" in a
+
+
+def test_fingerprint_is_order_independent_for_dict_keys():
+    assert fingerprint("scale", {"a": 1, "b": 2}) == fingerprint("scale", {"b": 2, "a": 1})
+    assert fingerprint("scale", {"a": 1}) != fingerprint("restart", {"a": 1})
+
+
+def test_ttl_cache_expiry_and_stats():
+    cache = TTLCache(ttl_seconds=0.05)
+    cache.set("k", "v")
+    cache.set("short", "v", ttl_seconds=0)
+    assert cache.get("k") == "v"
+    assert cache.get("short") is None
+    time.sleep(0.1)
+    assert cache.get("k", "default") == "default"
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 2, "hit_rate": 0.3333}
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_sqlite_cache(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path)
+    cache.set("k", {"value": [1, 2]})
+    assert SQLiteCache(path).get("k") == {"value": [1, 2]}
+    cache.set("expired", 1, ttl_seconds=-1)
+    assert cache.get("expired", "default") == "default"
+    cache.delete("k")
+    assert cache.get("k") is None
+
+
+def test_tiered_cache_promotes_shared_hits(tmp_path):
+    shared = SQLiteCache(str(tmp_path / "cache.db"))
+    shared.set("k", "v")
+    cache = TieredCache(shared=shared)
+    assert cache.get("k") == "v"
+    assert cache.local.get("k") == "v"
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert stats["shared_hits"] == 1
+    assert stats["hits"] == 2
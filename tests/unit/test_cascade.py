@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from src.cascade import ACCEPTED, ERROR, ESCALATED, CascadeTier, ModelCascade, _parse_costs
+from src.llm import FakeLLMBackend, LLMPool
+
+
+def tier(name, confidence=None, fail=False, cost=(0.0, 0.0)):
+    def respond(prompt):
+        if fail:
+            raise RuntimeError(f"{name} unavailable")
+        return json.dumps({"answer": name, "confidence": confidence})
+    return CascadeTier(name, LLMPool(FakeLLMBackend(response=respond), max_concurrency=1, timeout=5), *cost)
+
+
+def ask(pool, prompt):
+    response = pool.complete(prompt)
+    data = json.loads(response)
+    return data["answer"], data["confidence"], response
+
+
+@pytest.fixture
+def tiers():
+    tiers = []
+    yield tiers
+    for t in tiers:
+        t.pool.close()
+
+
+def test_confident_first_tier_is_accepted(tiers):
+    tiers += [tier("small", 90), tier("large", 99)]
+    cascade = ModelCascade(tiers, threshold=70)
+    result, attempts = cascade.run("prompt", ask)
+    assert result == "small"
+    assert [(a["tier"], a["outcome"]) for a in attempts] == [("small", ACCEPTED)]
+    assert tiers[1].pool.backend.calls == 0
+
+
+def test_low_confidence_escalates_and_last_tier_is_always_accepted(tiers):
+    tiers += [tier("small", 40), tier("large", 10)]
+    cascade = ModelCascade(tiers, threshold=70)
+    result, attempts = cascade.run("prompt", ask)
+    assert result == "large"
+    assert [(a["tier"], a["outcome"], a["confidence"]) for a in attempts] == [
+        ("small", ESCALATED, 40), ("large", ACCEPTED, 10)]
+    assert cascade.stats()["small"]["escalation_rate"] == 1.0
+
+
+def test_failing_tier_escalates_and_last_tier_error_propagates(tiers):
+    tiers += [tier("small", fail=True), tier("large", 80)]
+    result, attempts = ModelCascade(tiers).run("prompt", ask)
+    assert result == "large"
+    assert attempts[0]["outcome"] == ERROR and "small unavailable" in attempts[0]["error"]
+    with pytest.raises(Exception, match="small unavailable"):
+        ModelCascade(tiers[:1]).run("prompt", ask)
+
+
+def test_tier_range(tiers):
+    tiers += [tier("small", 10), tier("medium", 10), tier("large", 10)]
+    cascade = ModelCascade(tiers)
+    assert cascade.run("prompt", ask, first=1)[0] == "large"
+    assert cascade.run("prompt", ask, last=1)[0] == "medium"
+    assert tiers[0].pool.backend.calls == 1
+
+
+def test_cost_accounting(tiers):
+    tiers += [tier("small", 90, cost=(1.0, 2.0))]
+    cascade = ModelCascade(tiers)
+    _, attempts = cascade.run("x" * 4000, ask)
+    response_tokens = len(json.dumps({"answer": "small", "confidence": 90})) // 4
+    expected = (1000 * 1.0 + response_tokens * 2.0) / 1_000_000
+    assert attempts[0]["cost_usd"] == pytest.approx(expected)
+    assert cascade.stats()["small"]["cost_usd"] == pytest.approx(expected, abs=1e-6)
+
+
+def test_parse_costs():
+    assert _parse_costs("0.0375/0.15, 1.25/5.0,") == [(0.0375, 0.15), (1.25, 5.0)]
+    assert _parse_costs("2") == [(2.0, 0.0)]
+    assert _parse_costs("") == []
+
+
+def test_cascade_needs_a_tier():
+    with pytest.raises(ValueError):
+        ModelCascade([])
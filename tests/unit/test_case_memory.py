@@ -0,0 +1,79 @@
+from src.case_memory import CaseMemory
+from src.schemas import ActionProposal, Context, Signal
+
+
+def incident(resource="projects/p1/clusters/prod-1/nodePools/pool-a", cluster="prod-1", environment="prod",
+             message=None):
+    message = message or f"CPU usage 97% on {resource.rsplit('/', 1)[-1]}"
+    signal = Signal(source="monitoring", type="cpu", message=message, timestamp="2024-01-01T00:00:00Z",
+                    resource=resource, labels={"cluster": cluster})
+    context = Context(incident_id="inc-1", severity="critical", environment=environment,
+                      detected_at="2024-01-01T00:00:00Z")
+    return signal, context
+
+
+def proposal(node_pool="pool-a", cluster="prod-1", confidence=80):
+    return ActionProposal(action="scale", reason="cpu saturated", confidence=confidence,
+                          metadata={"params": {"cluster": cluster, "node_pool": node_pool, "replicas": 5}})
+
+
+def test_reuse_requires_min_successes():
+    memory = CaseMemory(min_successes=2)
+    memory.record(*incident(), "capacity", proposal(), validated=True)
+    assert memory.lookup(*incident(), "capacity") is None
+    case = memory.record(*incident(), "capacity", proposal(), validated=True)
+    assert case["successes"] == 2 and case["failures"] == 0
+    match = memory.lookup(*incident(), "capacity")
+    assert match["case_id"] == case["case_id"]
+    assert match["proposal"]["action"] == "scale"
+    assert memory.stats() == {"cases": 1, "reusable": 1}
+
+
+def test_proposal_is_retargeted_to_the_new_resource():
+    memory = CaseMemory(min_successes=1)
+    memory.record(*incident(), "capacity", proposal(), validated=True)
+    match = memory.lookup(*incident(resource="projects/p1/clusters/prod-2/nodePools/pool-b", cluster="prod-2"),
+                          "capacity")
+    assert match is not None
+    assert match["proposal"]["metadata"]["params"] == {"cluster": "prod-2", "node_pool": "pool-b", "replicas": 5}
+
+
+def test_placeholders_the_incident_cannot_fill_are_not_reused():
+    memory = CaseMemory(min_successes=1)
+    memory.record(*incident(), "capacity", proposal(), validated=True)
+    signal, context = incident(resource="pool-b")
+    signal.labels = None
+    assert memory.lookup(signal, context, "capacity") is None
+
+
+def test_last_failure_stops_reuse():
+    memory = CaseMemory(min_successes=1)
+    memory.record(*incident(), "capacity", proposal(), validated=True)
+    memory.record(*incident(), "capacity", proposal(), validated=False)
+    assert memory.lookup(*incident(), "capacity") is None
+
+
+def test_outcomes_are_counted_per_remediation():
+    memory = CaseMemory(min_successes=2)
+    memory.record(*incident(), "capacity", proposal(), validated=True)
+    case = memory.record(*incident(), "capacity", proposal(node_pool="other-pool"), validated=True)
+    assert case["successes"] == 1
+    assert memory.lookup(*incident(), "capacity") is None
+
+
+def test_query_class_and_environment_must_match():
+    memory = CaseMemory(min_successes=1)
+    memory.record(*incident(), "capacity", proposal(), validated=True)
+    assert memory.lookup(*incident(), "availability") is None
+    assert memory.lookup(*incident(environment="staging"), "capacity") is None
+    assert memory.lookup(*incident(message="certificate for api expired"), "capacity") is None
+
+
+def test_journal_replay(tmp_path):
+    path = str(tmp_path / "cases.jsonl")
+    memory = CaseMemory(min_successes=2, path=path)
+    memory.record(*incident(), "capacity", proposal(), validated=True)
+    memory.record(*incident(), "capacity", proposal(), validated=True)
+    replayed = CaseMemory(min_successes=2, path=path)
+    assert replayed.stats() == {"cases": 1, "reusable": 1}
+    assert replayed.lookup(*incident(), "capacity")["successes"] == 2
@@ -0,0 +1,71 @@
+import json
+import logging
+
+import pytest
+
+from src.agents.policy_agent import PolicyAgent, admit_proven_cases
+from src.agents.reasoning_agent import ReasoningAgent
+from src.case_memory import CaseMemory
+from src.llm import FakeLLMBackend, LLMPool
+from src.schemas import ActionProposal
+
+LOGGER = logging.getLogger("test-case-reuse")
+SIGNAL = {"source": "monitoring", "type": "cpu", "message": "CPU usage 97% on pool-a",
+          "timestamp": "2024-01-01T00:00:00Z", "resource": "pool-a", "labels": {"cluster": "prod-1"}}
+CONTEXT = {"incident_id": "inc-1", "severity": "critical", "environment": "prod",
+           "detected_at": "2024-01-01T00:00:00Z"}
+ENVELOPE = {"envelope_id": "env-1", "created_at": "2024-01-01T00:00:00Z", "agent": "orchestrator-agent",
+            "payload": {"signal": SIGNAL, "context": CONTEXT, "query_class": "capacity"}}
+
+
+def wire(value):
+    """What a remote caller receives over JSON-RPC."""
+    return json.loads(json.dumps(value))
+
+
+@pytest.fixture
+def llm_response():
+    response = {"text": json.dumps({"action": "restart", "reason": "llm", "confidence": 50})}
+    pool = LLMPool(FakeLLMBackend(response=lambda prompt: response["text"]), max_concurrency=1, timeout=5)
+    yield pool, response
+    pool.close()
+
+
+def agents(pool):
+    memory = CaseMemory(min_successes=1)
+    proposal = ActionProposal(action="scale", reason="cpu saturated", confidence=80,
+                              metadata={"params": {"cluster": "prod-1", "replicas": 5}})
+    memory.record(SIGNAL, CONTEXT, "capacity", proposal, validated=True)
+    reasoning = ReasoningAgent(logger=LOGGER, llm_pool=pool, case_memory=memory)
+    policy = PolicyAgent(opa_url="http://opa.invalid/v1/data/sre/policy", logger=LOGGER,
+                         embedded_rules=[admit_proven_cases(["scale", "restart"], min_successes=1)])
+    return reasoning, policy
+
+
+def test_reuse_mark_reaches_policy_over_the_wire(llm_response):
+    reasoning, policy = agents(llm_response[0])
+    proposal = wire(reasoning.reason(wire(ENVELOPE), [], []))
+    assert proposal["action"] == "scale"
+    assert proposal["metadata"]["case_reuse"]["successes"] == 1
+    assert llm_response[0].backend.calls == 0
+    verdict = wire(policy.policy_check(proposal))
+    assert verdict["admit"] is True
+    assert verdict["reason"].startswith("Reuses case")
+
+
+def test_llm_output_cannot_claim_reuse(llm_response):
+    pool, response = llm_response
+    reasoning, policy = agents(pool)
+    envelope = wire(ENVELOPE)
+    envelope["payload"]["signal"] = dict(SIGNAL, type="disk", message="certificate expired")
+    response["text"] = json.dumps({"action": "restart", "reason": "llm", "confidence": 90,
+                                   "case_reuse": {"case_id": "forged", "successes": 99}})
+    proposal = wire(reasoning.reason(envelope, [], []))
+    assert proposal["action"] == "restart"
+    assert "case_reuse" not in proposal["metadata"]
+
+    def opa_unreachable(*args, **kwargs):
+        raise ConnectionError("no OPA")
+    policy.session.post = opa_unreachable
+    # Not admitted by the proven-case rule, so it falls through to OPA
+    assert policy.policy_check(proposal)["admit"] is False
@@ -0,0 +1,34 @@
+import logging
+
+from src.agents.classifier_agent import ClassifierAgent
+from src.cascade import CascadeTier, ModelCascade
+from src.llm import FakeLLMBackend, LLMPool
+from src.schemas import Context, Signal
+
+SIGNAL = Signal(source="monitoring", type="latency", message="p99 latency above SLO", timestamp="2024-01-01T00:00:00Z")
+CONTEXT = Context(incident_id="inc-1", severity="info", environment="prod", detected_at="2024-01-01T00:00:00Z")
+
+
+def unavailable(prompt):
+    raise RuntimeError("model unavailable")
+
+
+def classifier(*responses):
+    pools = [LLMPool(FakeLLMBackend(response=response), max_concurrency=2, timeout=5) for response in responses]
+    cascade = ModelCascade([CascadeTier(f"tier-{i}", pool) for i, pool in enumerate(pools)], name="test")
+    agent = ClassifierAgent(logger=logging.getLogger("test-classifier"), cascade=cascade, batch_window_seconds=0.05)
+    return agent, [pool.backend for pool in pools]
+
+
+def test_failed_lone_alert_tries_each_tier_once():
+    agent, backends = classifier(unavailable, unavailable)
+    assert agent.classify(SIGNAL, CONTEXT) == ("other", {"method": "llm", "cache_hit": False, "tier": None})
+    assert [backend.calls for backend in backends] == [1, 1]
+
+
+def test_unsure_lone_alert_escalates_once():
+    agent, backends = classifier("restart 40", "scale 95")
+    query_class, meta = agent.classify(SIGNAL, CONTEXT)
+    assert (query_class, meta["tier"]) == ("scale", "tier-1")
+    assert [backend.calls for backend in backends] == [1, 1]
+    assert agent.classify(SIGNAL, CONTEXT)[1]["cache_hit"] is True
@@ -0,0 +1,76 @@
+import time
+
+from src.dedup import AlertDeduplicator
+from src.schemas import Context, Signal
+
+LABELS = {"cluster": "prod-1", "namespace": "default"}
+
+
+def alert(message="CPU usage 97% on node", resource="gke-prod-pool", severity="critical",
+          labels=LABELS, incident_id="inc-1"):
+    signal = Signal(source="monitoring", type="cpu", message=message, timestamp="2024-01-01T00:00:00Z",
+                    resource=resource, labels=labels)
+    context = Context(incident_id=incident_id, severity=severity, environment="prod",
+                      detected_at="2024-01-01T00:00:00Z")
+    return signal, context
+
+
+def test_repeats_collapse_into_first_incident():
+    dedup = AlertDeduplicator()
+    is_new, record = dedup.observe(*alert(incident_id="inc-1"))
+    assert is_new and record["occurrences"] == 1
+    is_new, record = dedup.observe(*alert(message="CPU usage 99% on node", incident_id="inc-2"))
+    assert not is_new
+    assert record["incident_id"] == "inc-1"
+    assert record["occurrences"] == 2
+    assert dedup.stats() == {"seen": 2, "forwarded": 1, "collapsed": 1, "evicted": 0, "active": 1}
+
+
+def test_severity_change_is_forwarded():
+    dedup = AlertDeduplicator()
+    assert dedup.observe(*alert(severity="warning"))[0]
+    assert dedup.observe(*alert(severity="critical"))[0]
+
+
+def test_unkeyed_alerts_are_keyed_on_normalized_message():
+    dedup = AlertDeduplicator()
+    assert dedup.observe(*alert(message="disk full on 10.0.0.1", resource=None, labels={}))[0]
+    assert not dedup.observe(*alert(message="disk full on 10.0.0.2", resource=None, labels={}))[0]
+    assert dedup.observe(*alert(message="certificate expired", resource=None, labels={}))[0]
+
+
+def test_entries_expire_after_ttl():
+    dedup = AlertDeduplicator(ttl_seconds=0.05)
+    assert dedup.observe(*alert())[0]
+    time.sleep(0.1)
+    assert dedup.observe(*alert())[0]
+    assert dedup.stats()["evicted"] == 1
+
+
+def test_storm_is_reforwarded_after_max_window():
+    dedup = AlertDeduplicator(ttl_seconds=0.05, max_window_seconds=0.15)
+    assert dedup.observe(*alert())[0]
+    forwarded = 0
+    deadline = time.monotonic() + 0.4
+    while time.monotonic() < deadline:
+        forwarded += dedup.observe(*alert())[0]
+        time.sleep(0.01)
+    # Repeats every 10ms keep extending the TTL, but the window cap still re-forwards
+    assert forwarded >= 1
+
+
+def test_lru_eviction_beyond_max_entries():
+    dedup = AlertDeduplicator(max_entries=2)
+    for resource in ("a", "b", "c"):
+        dedup.observe(*alert(resource=resource))
+    assert dedup.stats()["active"] == 2
+    assert dedup.observe(*alert(resource="a"))[0]
+
+
+def test_collapse_annotates_final_counts():
+    dedup = AlertDeduplicator()
+    batch = [alert(incident_id=f"inc-{i}") for i in range(3)] + [alert(resource="other", incident_id="inc-9")]
+    incidents = dedup.collapse(batch)
+    assert [context.incident_id for _, context in incidents] == ["inc-0", "inc-9"]
+    assert incidents[0][1].additional_info["dedup"]["occurrences"] == 3
+    assert incidents[1][1].additional_info["dedup"]["occurrences"] == 1
@@ -0,0 +1,126 @@
+import logging
+import threading
+import time
+
+from src.agents.executor_agent import ExecutorAgent
+
+
+def make_agent(**handlers):
+    return ExecutorAgent(logger=logging.getLogger("test-executor"), toolset=handlers)
+
+
+def action(action_id, action_type="noop", depends_on=(), timeout=None, **params):
+    spec = {"id": action_id, "type": action_type, "params": dict(params, step=action_id),
+            "depends_on": list(depends_on)}
+    if timeout is not None:
+        spec["timeout"] = timeout
+    return spec
+
+
+def test_dependencies_run_in_order():
+    order = []
+    agent = make_agent(noop=lambda params: order.append(params["step"]))
+    plan = {"actions": [action("c", depends_on=["a", "b"]), action("a"), action("b", depends_on=["a"])]}
+    summary = agent.execute_plan(plan)
+    assert summary["success"]
+    assert order == ["a", "b", "c"]
+    assert {a: r["status"] for a, r in summary["results"].items()} == {"a": "succeeded", "b": "succeeded",
+                                                                      "c": "succeeded"}
+
+
+def test_dependents_of_failed_actions_are_skipped():
+    def fail(params):
+        raise RuntimeError("boom")
+    agent = make_agent(noop=lambda params: "ok", fail=fail)
+    plan = {"actions": [action("a", "fail"), action("b", depends_on=["a"]), action("c", depends_on=["b"]),
+                        action("d")]}
+    summary = agent.execute_plan(plan)
+    assert not summary["success"]
+    assert summary["failed"] == ["a"]
+    assert sorted(summary["skipped"]) == ["b", "c"]
+    assert summary["results"]["d"]["status"] == "succeeded"
+
+
+def test_unknown_dependencies_and_cycles():
+    agent = make_agent(noop=lambda params: "ok")
+    summary = agent.execute_plan({"actions": [action("a", depends_on=["missing"])]})
+    assert not summary["success"] and "missing" in summary["error"]
+    summary = agent.execute_plan({"actions": [action("a", depends_on=["b"]), action("b", depends_on=["a"])]})
+    assert summary["results"]["a"] == {"status": "skipped", "reason": "dependency cycle"}
+
+
+def test_independent_actions_run_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+    agent = make_agent(noop=lambda params: barrier.wait())
+    summary = agent.execute_plan({"actions": [action(str(i), cluster=f"c{i}") for i in range(3)]})
+    assert summary["success"]
+
+
+def max_overlap(actions):
+    """Run the plan; returns the most actions that were running at once."""
+    active, overlaps = [], []
+    lock = threading.Lock()
+
+    def touch(params):
+        with lock:
+            active.append(params["step"])
+            overlaps.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(params["step"])
+    summary = make_agent(noop=touch).execute_plan({"actions": actions})
+    assert summary["success"]
+    return max(overlaps)
+
+
+def test_actions_on_one_resource_are_serialized():
+    assert max_overlap([action(str(i), cluster="prod-1", node_pool="pool-a") for i in range(4)]) == 1
+
+
+def test_one_target_described_in_different_detail_is_serialized():
+    assert max_overlap([
+        action("cluster", cluster="prod-1"),
+        action("node-pool", cluster="prod-1", node_pool="pool-a"),
+        action("with-project", project="p1", region="us-central1", cluster="prod-1", node_pool="pool-b"),
+    ]) == 1
+
+
+def test_action_waiting_past_its_timeout_never_runs():
+    ran = []
+
+    def handler(params):
+        ran.append(params["step"])
+        if params["step"] == "slow":
+            time.sleep(0.3)
+    agent = make_agent(noop=handler)
+    plan = {"actions": [action("slow", timeout=5), action("queued", timeout=0.1)], "max_concurrency": 1}
+    summary = agent.execute_plan(plan)
+    # "slow" holds the only worker, so "queued" times out before it starts
+    assert summary["results"]["queued"]["status"] == "timeout"
+    assert summary["results"]["queued"]["started"] is False
+    assert summary["results"]["slow"]["status"] == "succeeded"
+    time.sleep(0.1)
+    assert ran == ["slow"]
+
+
+def test_overrunning_action_times_out_and_skips_dependents():
+    release = threading.Event()
+    agent = make_agent(noop=lambda params: release.wait(5))
+    plan = {"actions": [action("a", timeout=0.1), action("b", depends_on=["a"])]}
+    try:
+        summary = agent.execute_plan(plan)
+    finally:
+        release.set()
+    assert summary["results"]["a"]["status"] == "timeout" and summary["results"]["a"]["started"] is True
+    assert summary["skipped"] == ["b"]
+
+
+def test_identical_actions_are_executed_once():
+    calls = []
+    agent = make_agent(noop=lambda params: calls.append(params) or "done")
+    first = agent.execute({"type": "noop", "params": {"cluster": "prod-1"}})
+    second = agent.execute({"type": "noop", "params": {"cluster": "prod-1"}})
+    assert len(calls) == 1
+    assert not first["replayed"] and second["replayed"]
+    agent.execute({"type": "noop", "params": {"cluster": "prod-1"}, "idempotent": False})
+    assert len(calls) == 2
@@ -0,0 +1,58 @@
+import pytest
+
+from src.jsonstream import JSONObjectStream, StreamParseError
+
+
+def feed_all(stream, text, size=3):
+    for i in range(0, len(text), size):
+        if stream.feed(text[i:i + size]):
+            return True
+    return False
+
+
+def test_members_are_reported_as_they_complete():
+    seen = []
+    stream = JSONObjectStream(on_member=lambda key, value, partial: seen.append((key, dict(partial))))
+    assert not stream.feed('Sure! {"action": "scale", "rea')
+    assert seen == [("action", {"action": "scale"})]
+    assert stream.feed('son": "cpu {high}, \\"quoted\\"", "confidence": 90} trailing prose')
+    assert stream.result == {"action": "scale", "reason": 'cpu {high}, "quoted"', "confidence": 90}
+    assert [key for key, _ in seen] == ["action", "reason", "confidence"]
+    assert stream.close() == stream.result
+
+
+def test_nested_values():
+    stream = JSONObjectStream()
+    assert feed_all(stream, '{"action": "x", "metadata": {"params": [1, {"a": "]"}]}, "n": null}')
+    assert stream.result["metadata"] == {"params": [1, {"a": "]"}]}
+    assert stream.feed("more") is True
+
+
+def test_missing_required_key():
+    stream = JSONObjectStream(required=("action", "reason"))
+    with pytest.raises(StreamParseError, match="missing"):
+        feed_all(stream, '{"action": "x"}')
+
+
+def test_malformed_member_fails_early():
+    stream = JSONObjectStream()
+    with pytest.raises(StreamParseError, match="malformed"):
+        stream.feed('{"action": scale, ')
+
+
+def test_limits():
+    with pytest.raises(StreamParseError, match="no JSON object"):
+        JSONObjectStream(max_preamble_chars=10).feed("x" * 11)
+    with pytest.raises(StreamParseError, match="not complete"):
+        JSONObjectStream(max_chars=20).feed('{"reason": "' + "x" * 20)
+
+
+def test_close_before_complete():
+    stream = JSONObjectStream()
+    stream.feed("no object here")
+    with pytest.raises(StreamParseError, match="no JSON object"):
+        stream.close()
+    stream = JSONObjectStream()
+    stream.feed('{"action": "x"')
+    with pytest.raises(StreamParseError, match="ended before"):
+        stream.close()
@@ -0,0 +1,31 @@
+import logging
+
+from src.agents.orchestrator_agent import OrchestratorAgent
+
+
+class Sink:
+    def __init__(self):
+        self.rows = []
+
+    def enqueue(self, row):
+        self.rows.append(row)
+        return True
+
+
+def test_envelope_is_persisted_once_and_timings_separately():
+    envelopes, timings = Sink(), Sink()
+    signatures = iter(["sig-created", "sig-final"])
+    agent = OrchestratorAgent(logger=logging.getLogger("test-orchestrator"), bq_client=object(),
+                              signer_fn=lambda envelope: next(signatures), sink=envelopes, timings_sink=timings)
+    envelope = agent.orchestrate({"envelope_id": "env-1", "agent": "pipeline", "payload": {"query_class": "cpu"}})
+    assert envelope["signature"] == "sig-created"
+
+    final = agent.finalize(envelope, {"classify": {"status": "ok", "ms": 1.5}}, 12.5)
+    assert final["signature"] == "sig-final"
+    assert final["payload"]["timings"] == {"classify": {"status": "ok", "ms": 1.5}}
+    assert [row["envelope_id"] for row in envelopes.rows] == ["env-1"]
+    assert envelopes.rows[0]["signature"] == "sig-created"
+    assert len(timings.rows) == 1
+    assert timings.rows[0]["envelope_id"] == "env-1"
+    assert timings.rows[0]["total_ms"] == 12.5
+    assert timings.rows[0]["signature"] == "sig-final"
@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from src.outbox import SlackOutbox
+
+
+class Response:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+
+    def raise_for_status(self):
+        if self.status_code >= 500:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class Session:
+    """Stands in for requests.Session; `fail` decides per posted text whether Slack returns a 500."""
+    def __init__(self, fail=lambda text: False):
+        self.fail = fail
+        self.posts = []
+        self.lock = threading.Lock()
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def post(self, url, json=None, timeout=None):
+        with self.lock:
+            self.posts.append(json["text"])
+        return Response(500 if self.fail(json["text"]) else 200)
+
+    def delivered(self):
+        with self.lock:
+            return [text for text in self.posts if not self.fail(text)]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def make_outbox(tmp_path, monkeypatch):
+    outboxes = []
+
+    def make(session=None, journal="outbox.jsonl", **kwargs):
+        kwargs.setdefault("rate_per_second", 1000)
+        kwargs.setdefault("burst", 1000)
+        kwargs.setdefault("coalesce_window", 0)
+        # In place before the sender thread starts, which may deliver recovered messages right away
+        monkeypatch.setattr(requests, "Session", lambda: session or Session())
+        outbox = SlackOutbox("https://hooks.example.com/x", journal_path=str(tmp_path / journal), **kwargs)
+        outboxes.append(outbox)
+        return outbox
+
+    yield make
+    for outbox in outboxes:
+        outbox.close()
+
+
+def test_messages_for_one_incident_are_coalesced(make_outbox):
+    outbox = make_outbox(coalesce_window=0.2)
+    for i in range(3):
+        outbox.enqueue(f"update {i}", incident_id="inc-1")
+    wait_for(lambda: outbox.stats["posted"] == 3)
+    assert outbox.session.posts == ["*3 updates for incident inc-1*\n\nupdate 0\n\nupdate 1\n\nupdate 2"]
+    assert outbox.stats["digests"] == 1
+
+
+def test_failing_group_does_not_block_others(make_outbox):
+    outbox = make_outbox(Session(fail=lambda text: text == "broken"), max_attempts=3)
+    broken_id = outbox.enqueue("broken", incident_id="inc-1")
+    outbox.enqueue("fine", incident_id="inc-2")
+    wait_for(lambda: outbox.stats["posted"] == 1)
+    assert outbox.session.delivered() == ["fine"]
+    assert outbox.pending() == 1
+    assert {"op": "failed", "ids": [broken_id]} in records(outbox.journal_path)
+
+
+def test_exhausted_messages_are_dead_lettered(make_outbox):
+    outbox = make_outbox(Session(fail=lambda text: True), max_attempts=1)
+    message_id = outbox.enqueue("broken", incident_id="inc-1")
+    wait_for(lambda: outbox.stats["dead_lettered"] == 1)
+    dead = records(outbox.dead_letter_path)
+    assert [(d["id"], d["attempts"]) for d in dead] == [(message_id, 1)]
+    assert outbox.pending() == 0
+    assert records(outbox.journal_path) == []
+
+
+def test_client_errors_are_dropped_not_retried(make_outbox):
+    session = Session()
+    session.post = lambda url, json=None, timeout=None: Response(400)
+    outbox = make_outbox(session)
+    outbox.enqueue("rejected")
+    wait_for(lambda: outbox.stats["dropped"] == 1)
+    assert outbox.pending() == 0
+
+
+def test_journal_is_compacted(make_outbox):
+    outbox = make_outbox(compact_every=4)
+    for i in range(10):
+        outbox.enqueue(f"message {i}", incident_id=f"inc-{i}")
+    wait_for(lambda: outbox.stats["posted"] == 10)
+    wait_for(lambda: len(records(outbox.journal_path)) == 0)
+
+
+def test_undelivered_messages_are_recovered(make_outbox):
+    outbox = make_outbox(Session(fail=lambda text: True), max_attempts=5)
+    outbox.enqueue("first", incident_id="inc-1")
+    wait_for(lambda: outbox.stats["failed"] == 1)
+    outbox.close()
+    outbox = make_outbox()
+    wait_for(lambda: outbox.stats["posted"] == 1)
+    assert outbox.session.posts == ["first"]
+
+
+def test_second_instance_claims_its_own_journal(make_outbox):
+    first = make_outbox()
+    second = make_outbox()
+    assert first.journal_path.endswith("outbox.jsonl")
+    assert second.journal_path.endswith("outbox-2.jsonl")
+    first.close()
+    assert make_outbox().journal_path == first.journal_path
@@ -0,0 +1,95 @@
+import logging
+from types import SimpleNamespace
+
+from src.agents.validator_agent import ValidatorAgent
+from src.pipeline import IncidentPipeline
+from src.registry import AgentRegistry
+from src.schemas import ActionProposal, MCPEnvelope
+
+SIGNAL = {"source": "monitoring", "type": "cpu", "message": "CPU usage 97%", "timestamp": "2024-01-01T00:00:00Z",
+          "resource": "pool-a"}
+CONTEXT = {"incident_id": "inc-1", "severity": "critical", "environment": "prod",
+           "detected_at": "2024-01-01T00:00:00Z"}
+
+
+class StubAgent:
+    def __init__(self, agent_id, **methods):
+        self.agent_id = agent_id
+        self.calls = []
+        for name, fn in methods.items():
+            setattr(self, name, self._recorded(name, fn))
+
+    def _recorded(self, name, fn):
+        def method(*args, **kwargs):
+            self.calls.append((name, args))
+            return fn(*args, **kwargs)
+        return method
+
+    def get_agent_card(self):
+        return {"id": self.agent_id}
+
+
+def envelope(request):
+    return MCPEnvelope.trusted(envelope_id="env-1", created_at="2024-01-01T00:00:00Z", agent=request["agent"],
+                               payload=dict(request["payload"]))
+
+
+def run(validator):
+    reasoning = StubAgent(
+        "reasoning-agent",
+        reason=lambda env, snippets, examples: ActionProposal(action="scale", reason="cpu", confidence=90,
+                                                              metadata={"params": {"cluster": "prod-1"}}),
+        record_outcome=lambda env, proposal, validated: {"recorded": True})
+    notification = StubAgent("notification-agent", notify=lambda incident, text: {"sent": text})
+    pipeline = IncidentPipeline(
+        classifier=StubAgent("classifier-agent", classify=lambda signal, context: ("capacity", {})),
+        grounding=StubAgent("grounding-agent", ground=lambda signal, query_class: []),
+        personalization=StubAgent("personalization-agent", personalize=lambda context, examples: []),
+        orchestrator=StubAgent("orchestrator-agent", orchestrate=envelope,
+                               finalize=lambda env, timings, total_ms: env),
+        reasoning=reasoning,
+        policy=StubAgent("policy-agent", policy_check=lambda proposal: {"admit": True}),
+        executor=StubAgent("executor-agent", execute=lambda action: {"success": True}),
+        validator=validator,
+        notification=notification,
+        registry=AgentRegistry(),
+    )
+    result = pipeline.run_sync(SIGNAL, CONTEXT, deadline_seconds=10)
+    return result, reasoning, notification
+
+
+def pod(name, ready):
+    return SimpleNamespace(metadata=SimpleNamespace(name=name), status=SimpleNamespace(
+        phase="Running", conditions=[SimpleNamespace(type="Ready", status="True" if ready else "False")]))
+
+
+def kube(*pods):
+    return SimpleNamespace(list_namespaced_pod=lambda namespace, label_selector: SimpleNamespace(items=list(pods)))
+
+
+def validator(kube_client=None):
+    return ValidatorAgent(logger=logging.getLogger("test-validator"), kube_client=kube_client)
+
+
+def test_validator_without_checks_verifies_nothing():
+    assert validator().validate(CONTEXT) == {"success": True, "healthy": None, "results": {}}
+
+
+def test_unverified_remediation_is_not_remembered_or_reported_as_success():
+    result, reasoning, notification = run(validator())
+    assert result["timings"]["remember"]["status"] == "skipped"
+    assert not any(name == "record_outcome" for name, _ in reasoning.calls)
+    assert notification.calls[0][1][1] == "Auto-remediation 'scale' ran but could not be verified"
+
+
+def test_healthy_remediation_is_remembered_as_validated():
+    result, reasoning, notification = run(validator(kube(pod("web-1", True))))
+    assert result["timings"]["remember"]["status"] == "ok"
+    assert [args[2] for name, args in reasoning.calls if name == "record_outcome"] == [True]
+    assert notification.calls[0][1][1] == "Auto-remediation 'scale' succeeded"
+
+
+def test_unhealthy_remediation_is_remembered_as_failed():
+    result, reasoning, notification = run(validator(kube(pod("web-1", False))))
+    assert [args[2] for name, args in reasoning.calls if name == "record_outcome"] == [False]
+    assert notification.calls[0][1][1] == "Auto-remediation 'scale' needs attention"
@@ -0,0 +1,56 @@
+from src.prompts import REASONING_PREFIX, PromptAssembler
+from src.schemas import Signal
+
+SIGNAL = Signal(source="monitoring", type="cpu", message="CPU usage 97%", timestamp="2024-01-01T00:00:00Z")
+CONTEXT = {"incident_id": "inc-1", "severity": "critical"}
+
+
+def test_prefix_is_stable_and_suffix_carries_the_incident():
+    assembler = PromptAssembler()
+    a = assembler.assemble(SIGNAL, CONTEXT, "capacity")
+    b = assembler.assemble(SIGNAL, dict(CONTEXT, incident_id="inc-2"), "capacity")
+    assert a.prefix == b.prefix == REASONING_PREFIX
+    assert a.text == a.prefix + a.suffix
+    assert '"message": "CPU usage 97%"' in a.suffix and "Query Class: capacity" in a.suffix
+    assert a.suffix != b.suffix
+
+
+def test_dedup_uses_jaccard_similarity():
+    assembler = PromptAssembler(dedup_threshold=0.8)
+    items = [
+        ("scale the node pool when cpu is saturated for ten minutes", 0.9),
+        ("Scale the node pool when CPU is saturated for ten minutes!", 0.5),
+        ("scale the node pool", 0.4),
+        ("restart the unhealthy pod", 0.3),
+        ("", 0.2),
+        ("...", 0.1),
+    ]
+    kept = [text for text, _ in assembler._dedup(items)]
+    # A short snippet contained in a longer one shares under 80% of their combined words
+    assert kept == [items[0][0], "scale the node pool", "restart the unhealthy pod", ""]
+
+
+def test_snippets_ranked_and_capped():
+    assembler = PromptAssembler(max_snippet_tokens=10)
+    snippets = [
+        {"doc_id": "low", "snippet": "drain the node before upgrading", "score": 0.1},
+        {"doc_id": "high", "snippet": "word " * 100, "score": 0.9},
+    ]
+    prompt = assembler.assemble(SIGNAL, CONTEXT, "capacity", grounding_snippets=snippets)
+    docs = prompt.suffix.split("Relevant Docs:\n")[1].splitlines()
+    assert docs[0].startswith("- [high] word") and docs[0].endswith("...")
+    assert docs[1] == "- [low] drain the node before upgrading"
+    assert prompt.stats["truncated"] == 1 and prompt.stats["snippets_used"] == 2
+
+
+def test_budget_drops_what_does_not_fit():
+    assembler = PromptAssembler(max_tokens=400, max_snippet_tokens=100, min_snippet_tokens=24)
+    snippets = [{"snippet": f"runbook {i} " + "step " * 80, "score": 1 - i / 10} for i in range(10)]
+    examples = [f"example {i} " + "detail " * 40 for i in range(5)]
+    prompt = assembler.assemble(SIGNAL, CONTEXT, "capacity", grounding_snippets=snippets,
+                                personalization_examples=examples)
+    stats = prompt.stats
+    assert stats["prompt_tokens"] <= 400
+    assert 0 < stats["snippets_used"] < 10 and stats["snippets_dropped"] == 10 - stats["snippets_used"]
+    assert stats["examples_used"] > 0
+    assert "runbook 0 " in prompt.suffix and "runbook 9 " not in prompt.suffix
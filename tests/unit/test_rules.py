@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+from src.rules import RuleEngine, RuleSet, _KeywordAutomaton
+from src.schemas import Context, Signal
+
+
+def alert(message, severity="critical", resource="gke-prod-pool", labels=None):
+    signal = Signal(source="monitoring", type="alert", message=message, timestamp="2024-01-01T00:00:00Z",
+                    resource=resource, labels=labels)
+    context = Context(incident_id="inc-1", severity=severity, environment="prod",
+                      detected_at="2024-01-01T00:00:00Z")
+    return signal, context
+
+
+def test_keyword_automaton_finds_overlapping_keywords():
+    automaton = _KeywordAutomaton(["he", "she", "his", "hers"])
+    assert automaton.search("ushers") == {"he", "she", "hers"}
+    assert automaton.search("nothing") == set()
+    assert _KeywordAutomaton([]).search("anything") == set()
+
+
+def test_default_rules():
+    engine = RuleEngine()
+    assert engine.match(*alert("CPU usage 97%")).result == "scale"
+    assert engine.match(*alert("Pod is Unhealthy", severity="warning")).result == "restart"
+    assert engine.match(*alert("disk almost full", severity="warning")).result == "investigate"
+    assert engine.match(*alert("disk almost full", severity="info")) is None
+    assert engine.stats() == {"rules": 3, "hits": {"cpu-critical-scale": 1, "unhealthy-restart": 1,
+                                                   "warning-investigate": 1}, "misses": 1}
+
+
+def test_priority_then_file_order():
+    ruleset = RuleSet([
+        {"id": "first", "result": "a", "match": {"message_contains": ["oom"]}},
+        {"id": "second", "result": "b", "match": {"message_contains": ["oom"]}},
+        {"id": "urgent", "result": "c", "priority": 1, "match": {"severity": ["critical"]}},
+    ])
+    assert ruleset.match(*alert("OOM killed")).id == "urgent"
+    assert ruleset.match(*alert("OOM killed", severity="warning")).id == "first"
+
+
+def test_all_matchers_must_match():
+    ruleset = RuleSet([{"id": "r", "result": "restart", "match": {
+        "message_contains": ["crash"], "message_regex": ["crash ?loop"], "severity": ["critical"],
+        "labels": {"cluster": ["prod-1", "prod-2"]}, "resource_regex": ["^gke-"],
+    }}])
+    labels = {"cluster": "prod-2"}
+    assert ruleset.match(*alert("CrashLoop in pod", labels=labels)).id == "r"
+    assert ruleset.match(*alert("crash reported", labels=labels)) is None
+    assert ruleset.match(*alert("CrashLoop in pod", labels={"cluster": "dev"})) is None
+    assert ruleset.match(*alert("CrashLoop in pod", labels=labels, resource="vm-1")) is None
+    assert ruleset.match(*alert("CrashLoop in pod", labels=labels, severity="warning")) is None
+
+
+def test_label_and_catch_all_rules():
+    ruleset = RuleSet([
+        {"id": "prod", "result": "page", "match": {"labels": {"cluster": ["prod-1"]}}},
+        {"id": "fallback", "result": "investigate"},
+    ])
+    assert ruleset.match(*alert("anything", labels={"cluster": "prod-1"})).id == "prod"
+    assert ruleset.match(*alert("anything")).id == "fallback"
+
+
+def write_rules(path, rules, mtime):
+    path.write_text(json.dumps({"rules": rules}))
+    os.utime(path, (mtime, mtime))
+
+
+def test_hot_reload(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, [{"id": "old", "result": "a", "match": {"message_contains": ["cpu"]}}], 1000)
+    engine = RuleEngine(path=str(path), reload_interval=0)
+    assert engine.match(*alert("cpu high")).id == "old"
+    write_rules(path, [{"id": "new", "result": "b", "match": {"message_contains": ["cpu"]}}], 2000)
+    assert engine.match(*alert("cpu high")).id == "new"
+
+
+def test_failed_reload_keeps_active_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, [{"id": "old", "result": "a", "match": {"message_contains": ["cpu"]}}], 1000)
+    engine = RuleEngine(path=str(path), reload_interval=0)
+    path.write_text("{not json")
+    os.utime(path, (2000, 2000))
+    assert engine.match(*alert("cpu high")).id == "old"
+    write_rules(path, [{"id": "bad-regex", "result": "a", "match": {"message_regex": ["("]}}], 3000)
+    assert engine.match(*alert("cpu high")).id == "old"
+    with pytest.raises(Exception):
+        engine.reload()
+    assert engine.match(*alert("cpu high")).id == "old"
@@ -0,0 +1,42 @@
+import threading
+import time
+
+from src.agents.watcher_agent import _MessageBatcher
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+        self.flushed = threading.Event()
+
+    def __call__(self, batch):
+        self.batches.append((time.monotonic(), list(batch)))
+        self.flushed.set()
+
+
+def test_partial_batch_flushes_when_the_window_expires():
+    recorder = Recorder()
+    batcher = _MessageBatcher(recorder, batch_size=10, window_seconds=0.2)
+    try:
+        started = time.monotonic()
+        batcher.add("m1")
+        batcher.add("m2")
+        assert recorder.flushed.wait(2)
+        flushed_at, batch = recorder.batches[0]
+        assert batch == ["m1", "m2"]
+        assert 0.15 <= flushed_at - started < 1.0
+    finally:
+        batcher.stop()
+
+
+def test_full_batch_flushes_immediately():
+    recorder = Recorder()
+    batcher = _MessageBatcher(recorder, batch_size=3, window_seconds=10)
+    try:
+        for i in range(4):
+            batcher.add(i)
+        assert recorder.flushed.wait(2)
+        assert recorder.batches[0][1] == [0, 1, 2]
+    finally:
+        batcher.stop()
+    assert [batch for _, batch in recorder.batches] == [[0, 1, 2], [3]]